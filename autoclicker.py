@@ -0,0 +1,319 @@
+import argparse
+import json
+import sys
+
+from backend import BACKENDS, createBackend, setDefaultBackend
+
+
+def parsePosition(text: str) -> tuple:
+    try:
+        x, y = text.split(",")
+        return (int(x), int(y))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Position must look like 100,200, got '{text}'")
+
+
+def parseScales(text: str) -> tuple:
+    try:
+        scales: tuple = tuple(float(value) for value in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Scales must look like 0.8,1,1.25, got '{text}'")
+    if not all(scale > 0 for scale in scales):
+        raise argparse.ArgumentTypeError("Scales must be positive")
+    return scales
+
+
+def buildParser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--backend", choices=sorted(BACKENDS.keys()), help="input backend, defaults to the host's native one")
+
+    parser = argparse.ArgumentParser(prog="autoclicker", description="Auto Clicker")
+    parser.set_defaults(backend=None, isolate=False)
+    commands = parser.add_subparsers(dest="command")
+
+    run = commands.add_parser("run", parents=[common], help="click headlessly")
+    run.add_argument("--cps", type=float, default=10.0, help="clicks per second, may be fractional")
+    run.add_argument("--button", choices=["left", "right", "middle"], default="left")
+    run.add_argument("--pos", type=parsePosition, default=None, help="x,y to click at instead of the current position")
+    run.add_argument("--duration", type=float, default=None, help="seconds to run, until Ctrl+C if omitted")
+    run.add_argument("--clicks", type=int, default=None, help="stop after exactly this many clicks")
+    run.add_argument("--burst", action="store_true", help="send the clicks as fast as the backend takes them, ignoring --cps")
+    run.add_argument("--hold", action="store_true", help="hold the button instead of clicking")
+    run.add_argument("--batch-size", type=int, default=1, help="clicks submitted per backend call")
+    run.add_argument("--jitter", choices=["normal", "lognormal", "uniform"], default=None, help="randomize the intervals between clicks")
+    run.add_argument("--jitter-spread", type=float, default=0.1, help="standard deviation of the intervals relative to their mean")
+    run.add_argument("--pos-jitter", type=float, default=0.0, help="standard deviation of the click position in pixels, needs --pos")
+    run.add_argument("--seed", type=int, default=None, help="seed for reproducible jitter")
+    run.add_argument("--path", default=None, help="file of points and grids to click in turn instead of one position")
+    run.add_argument("--interpolate", type=float, default=None, help="move through the path in steps of at most this many pixels")
+    run.add_argument("--stats", action="store_true", help="print timing statistics as JSON when done")
+
+    press = commands.add_parser("press", parents=[common], help="press keys headlessly")
+    press.add_argument("keys", help="key, chord or sequence to press, e.g. space, ctrl+c or a,b,c")
+    press.add_argument("--rate", type=float, default=10.0, help="presses per second, may be fractional")
+    press.add_argument("--duration", type=float, default=None, help="seconds to run, until Ctrl+C if omitted")
+    press.add_argument("--presses", type=int, default=None, help="stop after exactly this many presses")
+    press.add_argument("--burst", action="store_true", help="send the presses as fast as the backend takes them, ignoring --rate")
+    press.add_argument("--hold", action="store_true", help="hold the keys down instead of pressing them")
+    press.add_argument("--batch-size", type=int, default=1, help="presses submitted per backend call")
+    press.add_argument("--stats", action="store_true", help="print timing statistics as JSON when done")
+
+    sequence = commands.add_parser("sequence", parents=[common], help="run a click sequence file")
+    sequence.add_argument("path")
+    sequence.add_argument("--loops", type=int, default=1, help="0 repeats until Ctrl+C")
+    sequence.add_argument("--stats", action="store_true")
+
+    play = commands.add_parser("play", parents=[common], help="play back a recorded macro")
+    play.add_argument("path")
+    play.add_argument("--speed", type=float, default=1.0)
+    play.add_argument("--loops", type=int, default=1, help="0 repeats until Ctrl+C")
+    play.add_argument("--stats", action="store_true")
+
+    watch = commands.add_parser("watch", parents=[common], help="click while screen regions show a color")
+    watch.add_argument("--region", action="append", required=True, help="left,top,width,height of a region to watch, may be repeated")
+    watch.add_argument("--color", action="append", required=True, help="#rrggbb or r,g,b the region must show, one per --region")
+    watch.add_argument("--tolerance", type=int, default=0, help="largest difference per color channel that still matches")
+    watch.add_argument("--fraction", type=float, default=1.0, help="share of the region's pixels that must match")
+    watch.add_argument("--sample-step", type=int, default=1, help="only check every n-th pixel in each direction")
+    watch.add_argument("--poll-rate", type=float, default=60.0, help="checks per second")
+    watch.add_argument("--cps", type=float, default=10.0)
+    watch.add_argument("--button", choices=["left", "right", "middle"], default="left")
+    watch.add_argument("--pos", type=parsePosition, default=None, help="x,y to click at instead of the current position")
+    watch.add_argument("--hold", action="store_true", help="hold the button while the regions match")
+    watch.add_argument("--duration", type=float, default=None, help="seconds to run, until Ctrl+C if omitted")
+    watch.add_argument("--stats", action="store_true")
+
+    find = commands.add_parser("find", parents=[common], help="click the center of an image wherever it shows up on screen")
+    find.add_argument("images", nargs="+", help="image files to look for, the first one found is clicked")
+    find.add_argument("--threshold", type=float, default=0.8, help="normalized correlation a match needs, up to 1")
+    find.add_argument("--scales", type=parseScales, default=(1.0,), help="sizes to look for relative to the image, e.g. 0.8,1,1.25")
+    find.add_argument("--poll-rate", type=float, default=20.0, help="searches per second")
+    find.add_argument("--cps", type=float, default=10.0)
+    find.add_argument("--button", choices=["left", "right", "middle"], default="left")
+    find.add_argument("--hold", action="store_true", help="hold the button while the image is on screen")
+    find.add_argument("--duration", type=float, default=None, help="seconds to run, until Ctrl+C if omitted")
+    find.add_argument("--stats", action="store_true")
+
+    serve = commands.add_parser("serve", parents=[common], help="take start, stop and status commands from other programs")
+    serve.add_argument("--socket", default=None, help="Unix socket to listen on, autoclicker.sock by default")
+    serve.add_argument("--websocket-port", type=int, default=None, help="also accept WebSocket clients on this loopback port")
+    serve.add_argument("--telemetry-interval", type=float, default=0.1, help="seconds between telemetry updates to subscribed clients")
+    serve.add_argument("--isolate", action="store_true", help="run the click engine in its own process")
+
+    gui = commands.add_parser("gui", parents=[common], help="open the window (the default)")
+    gui.add_argument("--isolate", action="store_true", help="run the click engine in its own process, away from the window")
+    return parser
+
+
+def _runThread(thread, duration: float = None) -> None:
+    thread.start()
+    try:
+        if duration is None:
+            while thread.is_alive():
+                thread.join(0.25)
+        else:
+            thread.join(duration)
+    except KeyboardInterrupt:
+        pass
+    thread.stop()
+    thread.join()
+
+
+def _printStats(stats: dict, backend) -> None:
+    if hasattr(backend, "getStats"):
+        stats["backend"] = backend.getStats()
+    try:
+        import resource
+        stats["peakMemoryKb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        pass
+    print(json.dumps(stats))
+
+
+def runClick(args) -> int:
+    from clicker import ClickThread
+
+    jitter = None
+    if args.jitter is not None or args.pos_jitter > 0:
+        # NumPy is only needed once jitter is asked for
+        from jitter import Jitter
+        jitter = Jitter(args.jitter or "normal", args.jitter_spread if args.jitter is not None else 0.0, "normal", args.pos_jitter, args.seed)
+
+    path = None
+    if args.path is not None:
+        from paths import loadPath
+        path = loadPath(args.path, args.interpolate)
+
+    backend = createBackend(args.backend)
+    # The engine enforces both limits itself, so the thread ends on its own
+    thread = ClickThread(args.cps, args.hold, args.button, args.pos, backend, args.batch_size, jitter, path, args.clicks, args.duration, args.burst, daemon=True)
+    _runThread(thread)
+    if args.stats:
+        _printStats(thread.getStats(), backend)
+    return 0
+
+
+def runPress(args) -> int:
+    from keypress import KeyThread, parseKeys
+
+    backend = createBackend(args.backend)
+    thread = KeyThread(args.rate, parseKeys(args.keys), args.hold, backend, args.batch_size, args.presses, args.duration, args.burst, daemon=True)
+    _runThread(thread)
+    if args.stats:
+        _printStats(thread.getStats(), backend)
+    return 0
+
+
+def runSequence(args) -> int:
+    from sequence import SequenceThread, loadSequence
+
+    backend = createBackend(args.backend)
+    thread = SequenceThread(loadSequence(args.path), backend, args.loops, daemon=True)
+    _runThread(thread)
+    if args.stats:
+        _printStats(thread.getStats(), backend)
+    return 0
+
+
+def runMacro(args) -> int:
+    from macro import MacroFile, MacroPlayer
+
+    backend = createBackend(args.backend)
+    thread = MacroPlayer(MacroFile(args.path), backend, args.speed, args.loops, daemon=True)
+    _runThread(thread)
+    if args.stats:
+        _printStats(thread.getStats(), backend)
+    return 0
+
+
+def runWatch(args) -> int:
+    from clicker import ClickEngine
+    from watcher import ColorCondition, PixelWatcher, ScreenGrabber, parseColor, parseRegion
+
+    if len(args.region) != len(args.color):
+        raise ValueError("Every --region needs its own --color")
+    grabber = ScreenGrabber()
+    screenSize: tuple = grabber.size()
+    conditions: list = [ColorCondition(parseRegion(region), parseColor(color), args.tolerance, args.fraction, args.sample_step, screenSize) for region, color in zip(args.region, args.color)]
+
+    # The warm engine clicks while every region matches, so a trigger only hands it a session
+    engine = ClickEngine(createBackend(args.backend), daemon=True)
+    engine.start()
+    watcher = PixelWatcher(grabber, conditions, lambda: engine.startSession(args.cps, args.hold, args.button, args.pos), engine.stopSession, args.poll_rate, daemon=True)
+    _runThread(watcher, args.duration)
+    engine.waitIdle(1)
+    if args.stats:
+        print(json.dumps({"watcher": watcher.getStats(), "clicks": engine.getStats()}))
+    engine.shutdown()
+    return 0
+
+
+def runFind(args) -> int:
+    from clicker import ClickEngine
+    from matching import TemplateMatcher, TemplateWatcher, loadTemplate
+    from watcher import ScreenGrabber
+
+    templates: list = [loadTemplate(path, args.scales, args.threshold) for path in args.images]
+    engine = ClickEngine(createBackend(args.backend), daemon=True)
+    engine.start()
+
+    clicking: bool = False
+
+    def clickTarget(match) -> None:
+        # A moved target only moves the running session, a new one starts it
+        nonlocal clicking
+        if match is None:
+            engine.stopSession()
+        elif clicking:
+            engine.reconfigure(args.cps, match.center())
+        else:
+            engine.startSession(args.cps, args.hold, args.button, match.center())
+        clicking = match is not None
+
+    watcher = TemplateWatcher(TemplateMatcher(ScreenGrabber()), templates, clickTarget, args.poll_rate, daemon=True)
+    _runThread(watcher, args.duration)
+    engine.waitIdle(1)
+    if args.stats:
+        print(json.dumps({"finder": watcher.getStats(), "clicks": engine.getStats()}))
+    engine.shutdown()
+    return 0
+
+
+def runServe(args) -> int:
+    from clicker import Clicker
+    from controlserver import CONTROL_SOCKET_PATH, ControlServer
+
+    socketPath: str = args.socket
+    if socketPath is None and (args.websocket_port is None or sys.platform != "win32"):
+        socketPath = CONTROL_SOCKET_PATH
+    if args.isolate:
+        from engineprocess import ProcessClicker
+        clicker = ProcessClicker(args.backend)
+    else:
+        clicker = Clicker(createBackend(args.backend))
+    server = ControlServer(clicker, socketPath, args.websocket_port, args.telemetry_interval, daemon=True)
+    try:
+        _runThread(server)
+        # Raises what kept the server from listening, if anything did
+        server.waitReady(0)
+    finally:
+        clicker.stopClicking()
+        clicker.waitUntilStopped(1)
+        if args.isolate:
+            clicker.close()
+    return 0
+
+
+def runGUI(args) -> int:
+    # Tk, Pillow and pystray are only loaded once the window is actually wanted
+    from clicker import Clicker
+    from icon import Icon
+    from interface import GUI
+    from profiles import ProfileStore
+
+    if args.isolate:
+        from engineprocess import ProcessClicker
+        clicker = ProcessClicker(args.backend)
+    else:
+        if args.backend is not None:
+            setDefaultBackend(createBackend(args.backend))
+        clicker = Clicker()
+    profileStore = ProfileStore()
+    profileStore.load()
+    gui = GUI(clicker.startClicking, clicker.stopClicking, clicker.getStats, clicker.exportStats, profileStore)
+    icon = Icon(gui._tk, gui.hide, gui.show, gui.getProfileNames, gui.switchProfile, gui.getActiveProfile, gui.post)
+    gui.mainloop()
+    if args.isolate:
+        clicker.close()
+    return 0
+
+
+def main(argv: list = None) -> int:
+    parser: argparse.ArgumentParser = buildParser()
+    args = parser.parse_args(argv)
+    if args.command == "run" and args.pos_jitter > 0 and args.pos is None:
+        # Offsets are only applied around a fixed position, without one they would be silently ignored
+        parser.error("--pos-jitter needs --pos")
+    try:
+        if args.command == "run":
+            return runClick(args)
+        elif args.command == "press":
+            return runPress(args)
+        elif args.command == "sequence":
+            return runSequence(args)
+        elif args.command == "play":
+            return runMacro(args)
+        elif args.command == "watch":
+            return runWatch(args)
+        elif args.command == "find":
+            return runFind(args)
+        elif args.command == "serve":
+            return runServe(args)
+        return runGUI(args)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,512 @@
+from array import array
+import os
+import sys
+import time
+from typing import Dict
+
+from ctypes import CDLL, POINTER, Structure, Union, byref, pointer, c_char_p, c_int, c_long, c_size_t, c_uint, c_ulong, c_ushort, c_void_p, sizeof
+
+if sys.platform == "win32":
+    import win32api
+    import win32con
+    from ctypes import windll
+
+
+class Vector2:
+    __slots__ = ("x", "y")
+
+    def __init__(self, x: float, y: float) -> None:
+        self.x: float = x
+        self.y: float = y
+
+
+class POINT(Structure):
+    _fields_ = [("x", c_long), ("y", c_long)]
+
+
+# Event kinds stored in batches and by the recording backend
+EVENT_MOVE: int = 0
+EVENT_PRESS: int = 1
+EVENT_RELEASE: int = 2
+EVENT_KEY_PRESS: int = 3
+EVENT_KEY_RELEASE: int = 4
+
+BUTTON_CODES: Dict[str, int] = {"left": 0, "right": 1, "middle": 2}
+BUTTON_NAMES: list = ["left", "right", "middle"]
+
+# Clicks or key presses per backend call in a burst, enough that the call overhead all but disappears
+BURST_BATCH_SIZE: int = 64
+
+
+class EventBatch:
+    def __init__(self, capacity: int) -> None:
+        self.capacity: int = capacity
+        self.size: int = 0
+        self._kinds = array("b", bytes(capacity))
+        self._buttons = array("b", bytes(capacity))
+        self._xs = array("i", bytes(4 * capacity))
+        self._ys = array("i", bytes(4 * capacity))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def clear(self) -> None:
+        self.size = 0
+
+    def _add(self, kind: int, button: int, x: int, y: int) -> None:
+        i: int = self.size
+        self._kinds[i] = kind
+        self._buttons[i] = button
+        self._xs[i] = x
+        self._ys[i] = y
+        self.size = i + 1
+
+    def addMove(self, x: int, y: int) -> None:
+        self._add(EVENT_MOVE, -1, x, y)
+
+    def addPress(self, button: str) -> None:
+        self._add(EVENT_PRESS, BUTTON_CODES[button], 0, 0)
+
+    def addRelease(self, button: str) -> None:
+        self._add(EVENT_RELEASE, BUTTON_CODES[button], 0, 0)
+
+    def addClick(self, button: str, x: int = None, y: int = None) -> None:
+        if x is not None:
+            self.addMove(x, y)
+        self.addPress(button)
+        self.addRelease(button)
+
+    def addKeyPress(self, scanCode: int) -> None:
+        # Like recorded macros, keys keep their scan code in x
+        self._add(EVENT_KEY_PRESS, -1, scanCode, 0)
+
+    def addKeyRelease(self, scanCode: int) -> None:
+        self._add(EVENT_KEY_RELEASE, -1, scanCode, 0)
+
+
+class InputBackend:
+    name: str = ""
+
+    def createBatch(self, capacity: int) -> EventBatch:
+        return EventBatch(capacity)
+
+    def sendBatch(self, batch: EventBatch) -> None:
+        # Fallback for backends without a native bulk call
+        for i in range(batch.size):
+            kind: int = batch._kinds[i]
+            if kind == EVENT_MOVE:
+                self.move(batch._xs[i], batch._ys[i])
+            elif kind == EVENT_PRESS:
+                self.press(BUTTON_NAMES[batch._buttons[i]])
+            elif kind == EVENT_RELEASE:
+                self.release(BUTTON_NAMES[batch._buttons[i]])
+            elif kind == EVENT_KEY_PRESS:
+                self.pressKey(batch._xs[i])
+            else:
+                self.releaseKey(batch._xs[i])
+
+    def move(self, x: int, y: int) -> None:
+        raise NotImplementedError
+
+    def press(self, button: str) -> None:
+        raise NotImplementedError
+
+    def release(self, button: str) -> None:
+        raise NotImplementedError
+
+    def queryCursor(self) -> Vector2:
+        raise NotImplementedError
+
+    def pressKey(self, scanCode: int) -> None:
+        raise NotImplementedError
+
+    def releaseKey(self, scanCode: int) -> None:
+        raise NotImplementedError
+
+    def queryCursorInto(self, pos: Vector2) -> None:
+        # Backends override this to fill an existing vector without allocating a new one
+        cursor: Vector2 = self.queryCursor()
+        pos.x = cursor.x
+        pos.y = cursor.y
+
+
+class MOUSEINPUT(Structure):
+    _fields_ = [("dx", c_long), ("dy", c_long), ("mouseData", c_ulong), ("dwFlags", c_ulong), ("time", c_ulong), ("dwExtraInfo", c_size_t)]
+
+
+class KEYBDINPUT(Structure):
+    _fields_ = [("wVk", c_ushort), ("wScan", c_ushort), ("dwFlags", c_ulong), ("time", c_ulong), ("dwExtraInfo", c_size_t)]
+
+
+class _INPUTUNION(Union):
+    _fields_ = [("mi", MOUSEINPUT), ("ki", KEYBDINPUT)]
+
+
+class INPUT(Structure):
+    _fields_ = [("type", c_ulong), ("union", _INPUTUNION)]
+
+
+INPUT_MOUSE: int = 0
+INPUT_KEYBOARD: int = 1
+MOUSEEVENTF_MOVE: int = 0x0001
+MOUSEEVENTF_ABSOLUTE: int = 0x8000
+MOUSEEVENTF_VIRTUALDESK: int = 0x4000
+KEYEVENTF_KEYUP: int = 0x0002
+KEYEVENTF_SCANCODE: int = 0x0008
+
+
+class Win32EventBatch(EventBatch):
+    def __init__(self, capacity: int, backend: "Win32Backend") -> None:
+        super().__init__(capacity)
+        self._backend: Win32Backend = backend
+        self.inputs = (INPUT * capacity)()
+        for entry in self.inputs:
+            entry.type = INPUT_MOUSE
+
+    def _addMouse(self, flags: int, dx: int, dy: int) -> None:
+        entry: INPUT = self.inputs[self.size]
+        entry.type = INPUT_MOUSE
+        mi: MOUSEINPUT = entry.union.mi
+        mi.dwFlags = flags
+        mi.dx = dx
+        mi.dy = dy
+        self.size += 1
+
+    def _addKey(self, scanCode: int, flags: int) -> None:
+        entry: INPUT = self.inputs[self.size]
+        entry.type = INPUT_KEYBOARD
+        ki: KEYBDINPUT = entry.union.ki
+        ki.wVk = 0
+        ki.wScan = scanCode
+        ki.dwFlags = flags
+        self.size += 1
+
+    def addMove(self, x: int, y: int) -> None:
+        # SendInput moves take coordinates normalized to 0..65535 across the virtual desktop
+        dx, dy = self._backend.normalize(x, y)
+        self._addMouse(MOUSEEVENTF_MOVE | MOUSEEVENTF_ABSOLUTE | MOUSEEVENTF_VIRTUALDESK, dx, dy)
+
+    def addPress(self, button: str) -> None:
+        self._addMouse(self._backend._downFlags[button], 0, 0)
+
+    def addRelease(self, button: str) -> None:
+        self._addMouse(self._backend._upFlags[button], 0, 0)
+
+    def addKeyPress(self, scanCode: int) -> None:
+        self._addKey(scanCode, KEYEVENTF_SCANCODE)
+
+    def addKeyRelease(self, scanCode: int) -> None:
+        self._addKey(scanCode, KEYEVENTF_SCANCODE | KEYEVENTF_KEYUP)
+
+
+class Win32Backend(InputBackend):
+    name: str = "win32"
+
+    def __init__(self) -> None:
+        self._downFlags: Dict[str, int] = {
+            "left": win32con.MOUSEEVENTF_LEFTDOWN,
+            "right": win32con.MOUSEEVENTF_RIGHTDOWN,
+            "middle": win32con.MOUSEEVENTF_MIDDLEDOWN,
+        }
+        self._upFlags: Dict[str, int] = {
+            "left": win32con.MOUSEEVENTF_LEFTUP,
+            "right": win32con.MOUSEEVENTF_RIGHTUP,
+            "middle": win32con.MOUSEEVENTF_MIDDLEUP,
+        }
+        self._point: POINT = POINT()
+        self._pointPtr = pointer(self._point)
+        self._getCursorPos = windll.user32.GetCursorPos
+        self.refreshScreen()
+
+    def refreshScreen(self) -> None:
+        self._screenLeft: int = win32api.GetSystemMetrics(win32con.SM_XVIRTUALSCREEN)
+        self._screenTop: int = win32api.GetSystemMetrics(win32con.SM_YVIRTUALSCREEN)
+        self._screenWidth: int = max(2, win32api.GetSystemMetrics(win32con.SM_CXVIRTUALSCREEN))
+        self._screenHeight: int = max(2, win32api.GetSystemMetrics(win32con.SM_CYVIRTUALSCREEN))
+
+    def move(self, x: int, y: int) -> None:
+        win32api.SetCursorPos((x, y))
+
+    def press(self, button: str) -> None:
+        win32api.mouse_event(self._downFlags[button], 0, 0, 0, 0)
+
+    def release(self, button: str) -> None:
+        win32api.mouse_event(self._upFlags[button], 0, 0, 0, 0)
+
+    def pressKey(self, scanCode: int) -> None:
+        win32api.keybd_event(0, scanCode, KEYEVENTF_SCANCODE, 0)
+
+    def releaseKey(self, scanCode: int) -> None:
+        win32api.keybd_event(0, scanCode, KEYEVENTF_SCANCODE | KEYEVENTF_KEYUP, 0)
+
+    def queryCursor(self) -> Vector2:
+        pt = POINT()
+        windll.user32.GetCursorPos(byref(pt))
+        return Vector2(pt.x, pt.y)
+
+    def queryCursorInto(self, pos: Vector2) -> None:
+        self._getCursorPos(self._pointPtr)
+        pos.x = self._point.x
+        pos.y = self._point.y
+
+    def normalize(self, x: int, y: int) -> tuple:
+        return (x - self._screenLeft) * 65535 // (self._screenWidth - 1), (y - self._screenTop) * 65535 // (self._screenHeight - 1)
+
+    def createBatch(self, capacity: int) -> EventBatch:
+        return Win32EventBatch(capacity, self)
+
+    def sendBatch(self, batch: EventBatch) -> None:
+        windll.user32.SendInput(batch.size, batch.inputs, sizeof(INPUT))
+
+
+class XTestBackend(InputBackend):
+    name: str = "xtest"
+
+    def __init__(self) -> None:
+        import ctypes.util
+
+        self._x11 = CDLL(ctypes.util.find_library("X11"))
+        self._xtst = CDLL(ctypes.util.find_library("Xtst"))
+        self._x11.XOpenDisplay.restype = c_void_p
+        self._x11.XOpenDisplay.argtypes = [c_char_p]
+        self._x11.XDefaultRootWindow.restype = c_ulong
+        self._x11.XDefaultRootWindow.argtypes = [c_void_p]
+        self._x11.XFlush.argtypes = [c_void_p]
+        self._x11.XQueryPointer.argtypes = [c_void_p, c_ulong, POINTER(c_ulong), POINTER(c_ulong), POINTER(c_int), POINTER(c_int), POINTER(c_int), POINTER(c_int), POINTER(c_uint)]
+        self._xtst.XTestFakeMotionEvent.argtypes = [c_void_p, c_int, c_int, c_int, c_ulong]
+        self._xtst.XTestFakeButtonEvent.argtypes = [c_void_p, c_uint, c_int, c_ulong]
+        self._xtst.XTestFakeKeyEvent.argtypes = [c_void_p, c_uint, c_int, c_ulong]
+
+        self._display = self._x11.XOpenDisplay(None)
+        if not self._display:
+            raise OSError("Could not open X display")
+        self._root: int = self._x11.XDefaultRootWindow(self._display)
+
+        # Out parameters for XQueryPointer, allocated once and reused by every query
+        self._queryOut = [c_ulong(), c_ulong(), c_int(), c_int(), c_int(), c_int(), c_uint()]
+        self._queryArgs = tuple([self._display, self._root] + [byref(value) for value in self._queryOut])
+        self._buttons: Dict[str, int] = {"left": 1, "middle": 2, "right": 3}
+
+    def _move(self, x: int, y: int) -> None:
+        self._xtst.XTestFakeMotionEvent(self._display, -1, x, y, 0)
+
+    def _button(self, button: int, pressed: bool) -> None:
+        self._xtst.XTestFakeButtonEvent(self._display, button, pressed, 0)
+
+    def move(self, x: int, y: int) -> None:
+        self._move(x, y)
+        self._x11.XFlush(self._display)
+
+    def press(self, button: str) -> None:
+        self._button(self._buttons[button], True)
+        self._x11.XFlush(self._display)
+
+    def release(self, button: str) -> None:
+        self._button(self._buttons[button], False)
+        self._x11.XFlush(self._display)
+
+    def pressKey(self, scanCode: int) -> None:
+        # X keycodes are the evdev scan codes offset by 8
+        self._xtst.XTestFakeKeyEvent(self._display, scanCode + 8, True, 0)
+        self._x11.XFlush(self._display)
+
+    def releaseKey(self, scanCode: int) -> None:
+        self._xtst.XTestFakeKeyEvent(self._display, scanCode + 8, False, 0)
+        self._x11.XFlush(self._display)
+
+    def queryCursor(self) -> Vector2:
+        pos: Vector2 = Vector2(0, 0)
+        self.queryCursorInto(pos)
+        return pos
+
+    def queryCursorInto(self, pos: Vector2) -> None:
+        self._x11.XQueryPointer(*self._queryArgs)
+        pos.x = self._queryOut[2].value
+        pos.y = self._queryOut[3].value
+
+    def sendBatch(self, batch: EventBatch) -> None:
+        # Xlib buffers the fake events and writes them to the server in a single flush
+        for i in range(batch.size):
+            kind: int = batch._kinds[i]
+            if kind == EVENT_MOVE:
+                self._move(batch._xs[i], batch._ys[i])
+            elif kind == EVENT_PRESS or kind == EVENT_RELEASE:
+                self._button(self._buttons[BUTTON_NAMES[batch._buttons[i]]], kind == EVENT_PRESS)
+            else:
+                self._xtst.XTestFakeKeyEvent(self._display, batch._xs[i] + 8, kind == EVENT_KEY_PRESS, 0)
+        self._x11.XFlush(self._display)
+
+
+class RecordingBackend(InputBackend):
+    name: str = "recording"
+
+    def __init__(self, capacity: int = 1 << 16) -> None:
+        # Events are kept in preallocated columns used as a ring buffer, so recording never grows memory
+        self._capacity: int = capacity
+        self._times = array("q", bytes(8 * capacity))
+        self._kinds = array("b", bytes(capacity))
+        self._buttons = array("b", bytes(capacity))
+        self._xs = array("i", bytes(4 * capacity))
+        self._ys = array("i", bytes(4 * capacity))
+        self._count: int = 0
+        self._cursor: Vector2 = Vector2(0, 0)
+
+    def _record(self, kind: int, button: int, x: int, y: int) -> None:
+        i: int = self._count % self._capacity
+        self._times[i] = time.perf_counter_ns()
+        self._kinds[i] = kind
+        self._buttons[i] = button
+        self._xs[i] = x
+        self._ys[i] = y
+        self._count += 1
+
+    def move(self, x: int, y: int) -> None:
+        self._cursor.x = x
+        self._cursor.y = y
+        self._record(EVENT_MOVE, -1, x, y)
+
+    def press(self, button: str) -> None:
+        self._record(EVENT_PRESS, BUTTON_CODES[button], self._cursor.x, self._cursor.y)
+
+    def release(self, button: str) -> None:
+        self._record(EVENT_RELEASE, BUTTON_CODES[button], self._cursor.x, self._cursor.y)
+
+    def pressKey(self, scanCode: int) -> None:
+        self._record(EVENT_KEY_PRESS, -1, scanCode, 0)
+
+    def releaseKey(self, scanCode: int) -> None:
+        self._record(EVENT_KEY_RELEASE, -1, scanCode, 0)
+
+    def queryCursor(self) -> Vector2:
+        return Vector2(self._cursor.x, self._cursor.y)
+
+    def queryCursorInto(self, pos: Vector2) -> None:
+        pos.x = self._cursor.x
+        pos.y = self._cursor.y
+
+    def sendBatch(self, batch: EventBatch) -> None:
+        # The whole batch is submitted at once, so every event shares one timestamp
+        now: int = time.perf_counter_ns()
+        for n in range(batch.size):
+            i: int = self._count % self._capacity
+            kind: int = batch._kinds[n]
+            if kind == EVENT_MOVE:
+                self._cursor.x = batch._xs[n]
+                self._cursor.y = batch._ys[n]
+            self._times[i] = now
+            self._kinds[i] = kind
+            self._buttons[i] = batch._buttons[n]
+            if kind >= EVENT_KEY_PRESS:
+                self._xs[i] = batch._xs[n]
+                self._ys[i] = 0
+            else:
+                self._xs[i] = self._cursor.x
+                self._ys[i] = self._cursor.y
+            self._count += 1
+
+    def clear(self) -> None:
+        self._count = 0
+
+    def eventCount(self) -> int:
+        return self._count
+
+    def events(self) -> list:
+        # Returns the events still held in the ring as (timestamp_ns, kind, button, x, y), oldest first
+        held: int = min(self._count, self._capacity)
+        start: int = self._count - held
+        result: list = []
+        for n in range(start, self._count):
+            i = n % self._capacity
+            result.append((self._times[i], self._kinds[i], self._buttons[i], self._xs[i], self._ys[i]))
+        return result
+
+    def pressTimes(self) -> list:
+        return [event[0] for event in self.events() if event[1] == EVENT_PRESS]
+
+    def keyPressTimes(self) -> list:
+        return [event[0] for event in self.events() if event[1] == EVENT_KEY_PRESS]
+
+    def getStats(self, intervalNs: int = None) -> dict:
+        events: list = self.events()
+        stats: dict = {"events": self._count, "eventsPerSecond": 0.0, "meanEventGapNs": 0.0}
+        if len(events) < 2:
+            return stats
+
+        stats["firstEventNs"] = events[0][0]
+        duration: int = events[-1][0] - events[0][0]
+        if duration > 0:
+            stats["eventsPerSecond"] = (len(events) - 1) * 1e9 / duration
+        stats["meanEventGapNs"] = duration / (len(events) - 1)
+
+        # Timing error of every press against an ideal grid started at the first press
+        if intervalNs is not None:
+            presses: list = self.pressTimes()
+            if presses:
+                errors = [abs(t - (presses[0] + n * intervalNs)) for n, t in enumerate(presses)]
+                stats["meanTimingErrorNs"] = sum(errors) / len(errors)
+                stats["maxTimingErrorNs"] = max(errors)
+        return stats
+
+
+BACKENDS: Dict[str, type] = {
+    "win32": Win32Backend,
+    "xtest": XTestBackend,
+    "recording": RecordingBackend,
+}
+
+_defaultBackend: InputBackend = None
+
+
+def availableBackends() -> list:
+    names: list = []
+    if sys.platform == "win32":
+        names.append("win32")
+    elif os.environ.get("DISPLAY"):
+        # ctypes.util pulls in subprocess, so it is only loaded when an X display could be used
+        import ctypes.util
+        if ctypes.util.find_library("X11") and ctypes.util.find_library("Xtst"):
+            names.append("xtest")
+    names.append("recording")
+    return names
+
+
+def createBackend(name: str = None) -> InputBackend:
+    if name is None:
+        name = availableBackends()[0]
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown input backend '{name}'")
+    return BACKENDS[name]()
+
+
+def getDefaultBackend() -> InputBackend:
+    global _defaultBackend
+    if _defaultBackend is None:
+        _defaultBackend = createBackend()
+    return _defaultBackend
+
+
+def setDefaultBackend(backend: InputBackend) -> None:
+    global _defaultBackend
+    _defaultBackend = backend
+
+
+def measureBackend(backend: InputBackend, count: int = 10000) -> dict:
+    # Moves the cursor onto its own position so measuring a real backend doesn't disturb the desktop
+    pos: Vector2 = backend.queryCursor()
+    start: int = time.perf_counter_ns()
+    for _ in range(count):
+        backend.move(pos.x, pos.y)
+    elapsed: int = time.perf_counter_ns() - start
+    return {
+        "backend": backend.name,
+        "eventsPerSecond": count * 1e9 / elapsed if elapsed > 0 else 0.0,
+        "overheadNs": elapsed / count,
+    }
+
+
+def fastestBackend(names: list = None, count: int = 10000) -> str:
+    if names is None:
+        # The recording backend never reaches the desktop, so it only competes when nothing else is available
+        names = [name for name in availableBackends() if name != "recording"] or ["recording"]
+    results = [measureBackend(createBackend(name), count) for name in names]
+    return max(results, key=lambda result: result["eventsPerSecond"])["backend"]
@@ -0,0 +1,876 @@
+import argparse
+from collections import deque
+import json
+import gc
+import os
+import platform
+import selectors
+import socket
+import subprocess
+import sys
+import tempfile
+from threading import Event, Thread, current_thread
+import time
+import tracemalloc
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from backend import EVENT_MOVE, RecordingBackend
+from clicker import Clicker, ClickSession, ClickThread, MousePosThread
+from commandbus import CommandBus
+from jobs import JobScheduler
+from keypress import KeyThread, parseKeys
+from telemetry import LatencyHistogram
+
+
+def measureClickAllocations(clicks: int = 20_000, clickPos: tuple = (100, 100), batchSize: int = 1, jitter=None, path=None) -> dict:
+    # Runs limited sessions to their end on this thread, so nothing else allocates meanwhile. Retained blocks show
+    # memory the loop keeps per click, the tracemalloc peak what it holds at once while running.
+    def runSession(count: int, traced: bool) -> tuple:
+        backend: RecordingBackend = RecordingBackend()
+        session: ClickSession = ClickSession(10_000_000, False, "left", clickPos, backend, batchSize, jitter, path, maxClicks=count)
+        gc.collect()
+        blocks: int = sys.getallocatedblocks()
+        if traced:
+            tracemalloc.start()
+        start: int = tracemalloc.get_traced_memory()[0]
+        session.run()
+        peak: int = tracemalloc.get_traced_memory()[1] - start
+        if traced:
+            tracemalloc.stop()
+        return sys.getallocatedblocks() - blocks, peak, backend.eventCount(), session.getStats()["clicks"]
+
+    # The first run warms up every cache the loop touches
+    runSession(clicks, False)
+    retainedBlocks, _, events, done = runSession(clicks, False)
+    _, peakBytes, _, _ = runSession(clicks, True)
+    return {
+        "clicks": done,
+        "retainedBlocks": retainedBlocks,
+        "blocksPerClick": retainedBlocks / done if done else 0.0,
+        "peakBytes": peakBytes,
+        "peakBytesPerClick": peakBytes / done if done else 0.0,
+        "backendEventsPerClick": events / done if done else 0.0,
+    }
+
+
+# Modules the headless entry point must never load
+GUI_MODULES: tuple = ("tkinter", "PIL", "pystray", "pygame")
+
+
+def parseImportTime(output: str) -> dict:
+    # Lines look like "import time:   self [us] | cumulative | imported package", nested imports are indented
+    modules: dict = {}
+    totalUs: int = 0
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative)
+        if not name.startswith("  "):
+            totalUs += int(cumulative)
+    return {"totalUs": totalUs, "modules": modules}
+
+
+def measureStartup(runs: int = 5) -> dict:
+    # Times the headless entry point from process spawn to its first injected click
+    command: list = [sys.executable, "-X", "importtime", "-m", "autoclicker", "run", "--backend", "recording", "--cps", "1000", "--duration", "0.05", "--stats"]
+    firstClickMs: list = []
+    importMs: list = []
+    memoryKb: list = []
+    guiModules: set = set()
+    for _ in range(runs):
+        spawnNs: int = time.perf_counter_ns()
+        process = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        stats: dict = json.loads(process.stdout.strip().splitlines()[-1])
+        imports: dict = parseImportTime(process.stderr)
+
+        # perf_counter_ns is a system-wide monotonic clock, so the child's timestamps are comparable
+        firstClickMs.append((stats["backend"]["firstEventNs"] - spawnNs) / 1e6)
+        importMs.append(imports["totalUs"] / 1e3)
+        memoryKb.append(stats.get("peakMemoryKb", 0))
+        guiModules.update(name for name in imports["modules"] if name.split(".")[0] in GUI_MODULES)
+    return {
+        "firstClickMs": min(firstClickMs),
+        "importMs": min(importMs),
+        "peakMemoryKb": min(memoryKb),
+        "guiModulesLoaded": sorted(guiModules),
+    }
+
+
+# Builds the window in a child process and reports when its first frame is drawn. The legacy mode reproduces the
+# old startup path: both themes decoded sprite by sprite and the icon decoded a second time for the tray.
+GUI_STARTUP_SCRIPT: str = """
+import json, os, sys, time
+import interface
+from icon import ICON_PATH
+from PIL import Image
+
+if sys.argv[1] == "legacy":
+    createGUI = interface.GUI._createGUI
+
+    def legacyCreateGUI(self):
+        self._tk.eval("set azure_use_atlas 0")
+        self._tk.call("source", os.path.join("themes", "azure", "azure.tcl"))
+        self._tk.call("load_theme", "light")
+        Image.open(ICON_PATH).load()
+        createGUI(self)
+
+    interface.GUI._createGUI = legacyCreateGUI
+
+gui = interface.GUI(lambda *args: None, lambda: None)
+gui._tk.update()
+print(json.dumps({"firstFrameNs": time.perf_counter_ns(), "images": len(gui._tk.call("image", "names"))}))
+gui._tk.destroy()
+"""
+
+
+def measureGuiStartup(runs: int = 5) -> dict:
+    # Needs a display; returns an empty result when the window can't be created
+    results: dict = {}
+    for mode in ("legacy", "current"):
+        firstFrameMs: list = []
+        for _ in range(runs):
+            spawnNs: int = time.perf_counter_ns()
+            process = subprocess.run([sys.executable, "-c", GUI_STARTUP_SCRIPT, mode], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+            if process.returncode != 0:
+                return {}
+            stats: dict = json.loads(process.stdout.strip().splitlines()[-1])
+            firstFrameMs.append((stats["firstFrameNs"] - spawnNs) / 1e6)
+        results[mode] = {"firstFrameMs": min(firstFrameMs), "images": stats["images"]}
+    return results
+
+
+def _summarize(values: list) -> dict:
+    histogram: LatencyHistogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    return histogram.summary()
+
+
+def _runSession(thread, duration: float = None) -> None:
+    # Runs a session thread for duration seconds, or until it ends by itself when it has a limit
+    thread.start()
+    if duration is not None:
+        time.sleep(duration)
+        thread.stop()
+    thread.join()
+
+
+def measureMaxCps(duration: float = 1.0, batchSize: int = 1, jitter=None, path=None) -> dict:
+    # Asks for far more clicks than the loop can deliver, so it runs flat out and the achieved rate is the ceiling
+    backend: RecordingBackend = RecordingBackend()
+    _runSession(ClickThread(10_000_000, False, "left", None, backend, batchSize, jitter, path, daemon=True), duration)
+    presses: list = backend.pressTimes()
+    if len(presses) < 2:
+        return {"clicks": len(presses), "cps": 0.0}
+    return {"clicks": len(presses), "cps": (len(presses) - 1) * 1e9 / (presses[-1] - presses[0])}
+
+
+def measureTimingError(cps: float, clicks: int = 200, maxDuration: float = 4.0) -> dict:
+    # Every press is compared to its ideal time on a grid anchored at the first press
+    backend: RecordingBackend = RecordingBackend()
+    duration: float = min(maxDuration, max(clicks / cps, 1.0))
+    _runSession(ClickThread(cps, False, "left", None, backend, daemon=True), duration)
+    presses: list = backend.pressTimes()
+    intervalNs: float = 1e9 / cps
+    errors: list = [abs(press - presses[0] - round(i * intervalNs)) for i, press in enumerate(presses)]
+    summary: dict = _summarize(errors)
+    return {
+        "clicks": len(presses),
+        "meanErrorNs": summary["mean"],
+        "p99ErrorNs": summary["p99"],
+        "maxErrorNs": summary["max"],
+    }
+
+
+def measureJitterAccuracy(count: int = 100_000, spread: float = 0.2) -> dict:
+    # How far the scheduled intervals of every distribution are from the configured mean and spread
+    try:
+        from jitter import INTERVAL_DISTRIBUTIONS, Jitter
+    except ImportError:
+        return {}
+
+    results: dict = {}
+    for kind in INTERVAL_DISTRIBUTIONS:
+        jitter: Jitter = Jitter(kind, spread, seed=1234)
+        timeline = jitter.timeline(100, count)
+        intervals = timeline[1:] - timeline[:-1]
+        results[kind] = {
+            "meanError": float(abs(intervals.mean() / 1e7 - 1)),
+            "spreadError": float(abs(intervals.std() / intervals.mean() - spread)),
+        }
+    return results
+
+
+def measurePaths(columns: int = 300, rows: int = 200, step: int = 5, interpolateStep: float = 3, duration: float = 0.5) -> dict:
+    # Builds a snake grid of tens of thousands of targets with moves between them and walks it flat out
+    try:
+        from paths import gridPath
+    except ImportError:
+        return {}
+
+    start: int = time.perf_counter_ns()
+    path = gridPath(0, 0, columns, rows, step, step, snake=True).interpolate(interpolateStep)
+    buildNs: int = time.perf_counter_ns() - start
+
+    start = time.perf_counter_ns()
+    path.iterationColumns()
+    path.offsets(1000)
+    prepareNs: int = time.perf_counter_ns() - start
+
+    # What a session keeps for the loop: the coordinate and click lists plus the offsets
+    tracemalloc.start()
+    columnsMemory: tuple = (path.iterationColumns(), path.offsets(1000))
+    prepareBytes: int = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del columnsMemory
+
+    # Runs flat out; the ring is large enough that no event of the run is overwritten
+    backend: RecordingBackend = RecordingBackend(1 << 21)
+    _runSession(ClickThread(10_000_000, False, "left", None, backend, path=path, daemon=True), duration)
+    moves: list = [event[0] for event in backend.events() if event[1] == EVENT_MOVE]
+    return {
+        "points": len(path),
+        "targets": path.clickCount(),
+        "buildMs": buildNs / 1e6,
+        "prepareMs": prepareNs / 1e6,
+        "bytesPerPoint": prepareBytes / len(path),
+        "pointsPerSecond": (len(moves) - 1) * 1e9 / (moves[-1] - moves[0]) if len(moves) > 1 else 0.0,
+        "allocations": measureClickAllocations(clickPos=None, path=path),
+    }
+
+
+def measureLimits(cps: float = 200, duration: float = 0.5, burstClicks: int = 200_000) -> dict:
+    # A duration limit stops before the first tick at or past the end, so the session ends right after its last
+    # click, one interval early
+    thread = ClickThread(cps, False, "left", (100, 100), RecordingBackend(), maxDuration=duration, daemon=True)
+    start: int = time.perf_counter_ns()
+    _runSession(thread)
+    durationErrorNs: int = abs(time.perf_counter_ns() - start - int((duration - 1 / cps) * 1e9))
+
+    thread = ClickThread(1, False, "left", None, RecordingBackend(1 << 20), maxClicks=burstClicks, burst=True, daemon=True)
+    start = time.perf_counter_ns()
+    _runSession(thread)
+    burstNs: int = time.perf_counter_ns() - start
+    return {"durationErrorNs": durationErrorNs, "burstCps": burstClicks * 1e9 / burstNs}
+
+
+def measureKeyPresses(duration: float = 1.0, rate: float = 1000, jobDuration: float = 1.0) -> dict:
+    # Keys run on the same scheduler and batches as clicks, so their ceiling and lateness should match the clicks'
+    backend: RecordingBackend = RecordingBackend()
+    _runSession(KeyThread(10_000_000, parseKeys("a"), backend=backend, daemon=True), duration)
+    times: list = backend.keyPressTimes()
+    maxRate: float = (len(times) - 1) * 1e9 / (times[-1] - times[0]) if len(times) > 1 else 0.0
+
+    backend = RecordingBackend()
+    _runSession(KeyThread(rate, parseKeys("a"), backend=backend, daemon=True), duration)
+    times = backend.keyPressTimes()
+    intervalNs: float = 1e9 / rate
+    timing: dict = _summarize([abs(press - times[0] - round(i * intervalNs)) for i, press in enumerate(times)])
+
+    # Mixed jobs share one timing thread, each should still get its own rate
+    backend = RecordingBackend()
+    scheduler = JobScheduler(backend, daemon=True)
+    scheduler.start()
+    clickJob: int = scheduler.addJob(rate, "left")
+    keyJob: int = scheduler.addKeyJob(rate, parseKeys("a, b"))
+    time.sleep(jobDuration)
+    scheduler.stop()
+    scheduler.join()
+    return {
+        "maxRate": maxRate,
+        "p99ErrorNs": timing["p99"],
+        "mixedClickRate": len(backend.pressTimes()) / jobDuration,
+        "mixedKeyRate": len(backend.keyPressTimes()) / jobDuration,
+        "mixedKeyLatenessNs": scheduler.getJobStats(keyJob)["meanLatenessNs"],
+        "mixedClickLatenessNs": scheduler.getJobStats(clickJob)["meanLatenessNs"],
+    }
+
+
+def measureWatcher(triggers: int = 20, pollRate: float = 500) -> dict:
+    # Turns a region of a synthetic screen green and back, timing each change to the engine's first click
+    try:
+        from watcher import ColorCondition, PixelWatcher, SyntheticFramebuffer
+    except ImportError:
+        return {}
+    from clicker import ClickEngine
+
+    screen = SyntheticFramebuffer(1920, 1080)
+    backend: RecordingBackend = RecordingBackend()
+    engine: ClickEngine = ClickEngine(backend, daemon=True)
+    engine.start()
+    conditions: list = [ColorCondition((800, 500, 200, 50), (0, 200, 0), tolerance=16), ColorCondition((0, 0, 1920, 1080), (0, 200, 0), tolerance=16, fraction=0.001, sampleStep=8)]
+    watcher = PixelWatcher(screen, conditions, lambda: engine.startSession(1000, False, "left", (900, 525)), engine.stopSession, pollRate, daemon=True)
+    watcher.start()
+
+    latencies: list = []
+    for _ in range(triggers):
+        time.sleep(0.02)
+        # Changes elsewhere on the screen only mark their own region dirty
+        screen.fill(10, 10, 20, 20, (255, 255, 255))
+        start: int = time.perf_counter_ns()
+        clicks: int = len(backend.pressTimes())
+        screen.fill(800, 500, 200, 50, (0, 200, 0))
+        while len(backend.pressTimes()) == clicks and time.perf_counter_ns() - start < 1_000_000_000:
+            time.sleep(0.0005)
+        presses: list = backend.pressTimes()
+        if len(presses) > clicks:
+            latencies.append(presses[clicks] - start)
+        screen.fill(800, 500, 200, 50, (0, 0, 0))
+        engine.waitIdle(1)
+        backend.clear()
+
+    watcher.stop()
+    watcher.join()
+    engine.shutdown()
+    stats: dict = watcher.getStats()
+    return {
+        "pollRate": stats["pollRate"],
+        "pollCostNs": stats["pollCostNs"],
+        "skippedRegionShare": stats["regionsSkipped"] / max(1, stats["regionsSkipped"] + stats["regionsChecked"]),
+        "triggers": stats["triggers"],
+        "triggerToClickNs": _summarize(latencies),
+    }
+
+
+def measureTemplateMatching(frames: int = 60, templateCount: int = 3, seed: int = 7) -> dict:
+    # Templates drift a few pixels per frame across a full HD synthetic screen, the way a moving button would.
+    # Every frame changes, so each one rebuilds the pyramid and searches every template.
+    if numpy is None:
+        return {}
+    try:
+        from matching import Template, TemplateMatcher, resize
+        from watcher import SyntheticFramebuffer
+    except ImportError:
+        return {}
+
+    rng = numpy.random.default_rng(seed)
+
+    def widget(height: int, width: int):
+        # Smooth random shapes, closer to real widgets than pixel noise
+        gray = resize(rng.uniform(0, 255, (max(2, height // 6), max(2, width // 6))).astype(numpy.float32), height, width)
+        return numpy.repeat(gray.astype(numpy.uint8)[..., None], 3, axis=2)
+
+    screen = SyntheticFramebuffer(1920, 1080)
+    background = widget(1080, 1920) // 4
+    images: list = [widget(40, 120), widget(48, 48), widget(32, 96)][:templateCount]
+    templates: list = [Template(image, str(n)) for n, image in enumerate(images)]
+    starts: list = [(200 + 500 * n, 200 + 250 * n) for n in range(len(images))]
+    matcher: TemplateMatcher = TemplateMatcher(screen)
+
+    found: int = 0
+    frameTimes: list = []
+    for frame in range(frames):
+        screen.pixels[:] = background
+        positions: list = [(x + 3 * frame, y + 2 * frame) for x, y in starts]
+        for image, (x, y) in zip(images, positions):
+            screen.pixels[y:y + image.shape[0], x:x + image.shape[1]] = image
+        screen.fill(0, 0, 1, 1, tuple(background[0, 0].tolist()))
+
+        start: int = time.perf_counter_ns()
+        matcher.update()
+        matches: list = [matcher.locate(template) for template in templates]
+        frameTimes.append(time.perf_counter_ns() - start)
+        found += sum(1 for match, position in zip(matches, positions) if match is not None and (match.x, match.y) == position)
+
+    stats: dict = matcher.getStats()
+    return {
+        "templates": len(templates),
+        "accuracy": found / (frames * len(templates)),
+        "fullLocateNs": stats["fullLocateLatencyNs"],
+        "locateNs": stats["locateLatencyNs"],
+        "fftCacheHitRate": stats["fftCacheHitRate"],
+        "nearbyHitRate": stats["nearbyHits"] / max(1, stats["nearbySearches"]),
+        "frameNs": _summarize(frameTimes),
+        "framesPerSecond": 1e9 * len(frameTimes) / sum(frameTimes),
+    }
+
+
+def _drainMonitors(sockets: list, stop: Event, received: list) -> None:
+    # Reads every monitoring client's telemetry on one thread, like a dashboard would
+    selector = selectors.DefaultSelector()
+    for client in sockets:
+        selector.register(client, selectors.EVENT_READ)
+    while not stop.is_set():
+        for key, _ in selector.select(0.05):
+            received[0] += key.fileobj.recv(1 << 16).count(b"\n")
+    selector.close()
+
+
+def measureControlServer(requests: int = 2000, starts: int = 20, monitors: int = 64, cps: float = 1000, duration: float = 1.0) -> dict:
+    # Command round trips over the Unix socket, and click timing with and without many clients streaming telemetry
+    if sys.platform == "win32":
+        return {}
+    from controlserver import ControlClient, ControlServer
+
+    socketPath: str = os.path.join(tempfile.mkdtemp(), "control.sock")
+    backend: RecordingBackend = RecordingBackend()
+    clicker: Clicker = Clicker(backend)
+    server: ControlServer = ControlServer(clicker, socketPath, telemetryInterval=0.01, daemon=True)
+    server.start()
+    server.waitReady(2)
+    client: ControlClient = ControlClient(socketPath)
+
+    roundTrips: list = []
+    for _ in range(requests):
+        start: int = time.perf_counter_ns()
+        client.request("status")
+        roundTrips.append(time.perf_counter_ns() - start)
+
+    # From sending the command until the backend sees the first click
+    startToClick: list = []
+    for _ in range(starts):
+        count: int = backend.eventCount()
+        start = time.perf_counter_ns()
+        client.request("start", cps=cps, pos=[100, 100])
+        time.sleep(0.02)
+        client.request("stop")
+        clicker.waitUntilStopped(1)
+        startToClick.append(backend.events()[count - backend.eventCount()][0] - start)
+
+    lateness: dict = {}
+    for clients in (0, monitors):
+        sockets: list = []
+        for _ in range(clients):
+            monitor: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            monitor.connect(socketPath)
+            monitor.sendall(b'{"command": "subscribe"}\n')
+            sockets.append(monitor)
+        stop: Event = Event()
+        received: list = [0]
+        reader: Thread = Thread(target=_drainMonitors, args=(sockets, stop, received), daemon=True)
+        reader.start()
+        client.request("start", cps=cps)
+        time.sleep(duration)
+        lateness[clients] = clicker.getStats()["p99LatenessNs"]
+        client.request("stop")
+        clicker.waitUntilStopped(1)
+        stop.set()
+        reader.join()
+        for monitor in sockets:
+            monitor.close()
+
+    frames: int = server.getStats()["telemetryFrames"]
+    client.close()
+    server.stop()
+    server.join()
+    return {
+        "roundTripNs": _summarize(roundTrips),
+        "startToClickNs": _summarize(startToClick),
+        "idleP99LatenessNs": lateness[0],
+        "monitoredP99LatenessNs": lateness[monitors],
+        "telemetryFrames": frames,
+        "framesReceived": received[0],
+    }
+
+
+def measureStartStopLatency(runs: int = 20, cps: float = 1000) -> dict:
+    # Start: from startClicking() to the first injected press. Stop: from stopClicking() to the last press
+    # that still got through, and to the engine being idle again.
+    backend: RecordingBackend = RecordingBackend()
+    clicker: Clicker = Clicker(backend)
+    startNs: list = []
+    lastClickNs: list = []
+    exitNs: list = []
+    for _ in range(runs):
+        backend.clear()
+        requestNs: int = time.perf_counter_ns()
+        clicker.startClicking(cps, "left")
+        while backend.eventCount() == 0:
+            time.sleep(0)
+        startNs.append(backend.pressTimes()[0] - requestNs)
+
+        time.sleep(0.02)
+        requestNs = time.perf_counter_ns()
+        clicker.stopClicking()
+        clicker.waitUntilStopped()
+        exitNs.append(time.perf_counter_ns() - requestNs)
+        lastClickNs.append(max(0, backend.pressTimes()[-1] - requestNs))
+    return {
+        "startToFirstClickNs": _summarize(startNs),
+        "stopToLastClickNs": _summarize(lastClickNs),
+        "stopToExitNs": _summarize(exitNs),
+    }
+
+
+def measureSlowStopLatency(runs: int = 10) -> dict:
+    # Stopping must not wait for the next click to come due, however far away it is, nor for a hold to poll
+    backend: RecordingBackend = RecordingBackend()
+    clicker: Clicker = Clicker(backend)
+    results: dict = {}
+    for name, hold in (("click", False), ("hold", True)):
+        stopNs: list = []
+        for _ in range(runs):
+            clicker.startClicking(0.1, "left", hold=hold)
+            time.sleep(0.05)
+            requestNs: int = time.perf_counter_ns()
+            clicker.stopClicking()
+            clicker.waitUntilStopped()
+            stopNs.append(time.perf_counter_ns() - requestNs)
+        results[name] = _summarize(stopNs)
+    return results
+
+
+def _simulateGuiLoad(stop: Event) -> None:
+    # Stands in for busy Tk handlers: bursts of pure Python work that hold the GIL, with short idle gaps
+    while not stop.is_set():
+        end: float = time.perf_counter() + 0.02
+        while time.perf_counter() < end:
+            sum(range(1000))
+        time.sleep(0.005)
+
+
+def measureEngineIsolation(cps: float = 1000, duration: float = 2.0) -> dict:
+    # Click timing under simulated GUI load, with the engine as a thread of this process and as its own process
+    # Only this benchmark needs multiprocessing
+    from engineprocess import ProcessClicker
+
+    results: dict = {}
+    for mode in ("thread", "process"):
+        clicker = Clicker(RecordingBackend()) if mode == "thread" else ProcessClicker("recording")
+        stop: Event = Event()
+        load: Thread = Thread(target=_simulateGuiLoad, args=(stop,), daemon=True)
+        load.start()
+        clicker.startClicking(cps, "left")
+        time.sleep(duration)
+        stats: dict = clicker.getStats()
+        clicker.stopClicking()
+        clicker.waitUntilStopped(2)
+        stop.set()
+        load.join()
+        if mode == "process":
+            clicker.close()
+        results[mode] = {"achievedRate": stats["achievedRate"], "p99LatenessNs": stats["p99LatenessNs"], "maxLatenessNs": stats["maxLatenessNs"]}
+    return results
+
+
+def measureHotkeyLatency(presses: int = 10000) -> dict:
+    # Feeds synthetic key events straight into the dispatcher, so no system hook is needed
+    try:
+        from hotkey import HotkeyDispatcher, HotkeyHandler
+    except ImportError:
+        return {}
+
+    handler: HotkeyHandler = HotkeyHandler(HotkeyDispatcher(installHook=False))
+    dispatcher: HotkeyDispatcher = handler._dispatcher
+    calledNs: list = [0]
+    handler.startListeningToKey("f6", lambda: calledNs.__setitem__(0, time.perf_counter_ns()))
+    handler.startListeningToKey("ctrl+shift+f7", lambda: None)
+
+    latencies: list = []
+    for _ in range(presses):
+        receivedNs: int = time.perf_counter_ns()
+        dispatcher.feed("f6", True, receivedNs)
+        latencies.append(calledNs[0] - receivedNs)
+        dispatcher.feed("f6", False)
+    return _summarize(latencies)
+
+
+class _BusyWindowLoop(Thread):
+    def __init__(self, busyMs: float, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # Stands in for the Tk thread: it redraws for busyMs of every 16 ms, without holding the GIL like Tk's C
+        # code, and only runs other threads' calls and after() callbacks between redraws. A Tcl variable read from
+        # another thread is such a call that the reading thread waits for.
+        self._busyMs: float = busyMs
+        self._calls: deque = deque()
+        self._timers: list = []
+        self._wakeup: Event = Event()
+        self._stopped: bool = False
+
+    def call(self, func) -> None:
+        done: Event = Event()
+        self._calls.append((func, done))
+        self._wakeup.set()
+        done.wait()
+
+    def after(self, ms: int, func) -> None:
+        # Like Tk, a call from another thread is handed to this thread and waited for
+        if current_thread() is not self:
+            self.call(lambda: self.after(ms, func))
+            return
+        self._timers.append((time.perf_counter() + ms / 1000, func))
+
+    def after_idle(self, func) -> None:
+        self.after(0, func)
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._wakeup.set()
+
+    def run(self) -> None:
+        nextRedraw: float = time.perf_counter()
+        while not self._stopped:
+            now: float = time.perf_counter()
+            if now >= nextRedraw:
+                time.sleep(self._busyMs / 1000)
+                nextRedraw = now + 0.016
+            while self._calls:
+                func, done = self._calls.popleft()
+                func()
+                done.set()
+            due: list = [timer for timer in self._timers if timer[0] <= time.perf_counter()]
+            for timer in due:
+                self._timers.remove(timer)
+                timer[1]()
+            self._wakeup.wait(max(0.0, min([nextRedraw] + [timer[0] for timer in self._timers]) - time.perf_counter()))
+            self._wakeup.clear()
+
+
+def measureHotkeyToClick(presses: int = 50, busyMs: float = 8.0, settingReads: int = 10) -> dict:
+    # From a hotkey callback starting until the backend sees the first click, while the window is busy. "legacy"
+    # reads the settings from Tk variables on the hotkey thread like the window used to, each read waiting for the
+    # Tk loop; "current" starts from the prepared settings and only posts the window update to the command bus.
+    window: _BusyWindowLoop = _BusyWindowLoop(busyMs, daemon=True)
+    window.start()
+    bus: CommandBus = CommandBus(window)
+
+    backend: RecordingBackend = RecordingBackend()
+    clicker: Clicker = Clicker(backend)
+    startArgs: tuple = (1000.0, "left", (100, 100), False)
+    results: dict = {}
+    for mode in ("legacy", "current"):
+        latencies: list = []
+        for press in range(presses):
+            # Spreads the presses over the redraw cycle
+            time.sleep(0.01 + 0.016 * press / presses)
+            count: int = backend.eventCount()
+            start: int = time.perf_counter_ns()
+            if mode == "legacy":
+                for _ in range(settingReads):
+                    window.call(lambda: None)
+                clicker.startClicking(*startArgs)
+            else:
+                clicker.startClicking(*startArgs)
+                bus.post(lambda: None)
+            while backend.eventCount() == count:
+                time.sleep(0)
+            latencies.append(backend.events()[count - backend.eventCount()][0] - start)
+            clicker.stopClicking()
+            clicker.waitUntilStopped(1)
+        results[mode] = _summarize(latencies)
+    window.stop()
+    window.join()
+    results["savedNs"] = results["legacy"]["p50"] - results["current"]["p50"]
+    return results
+
+
+def measureMousePosIdleCpu(duration: float = 2.0) -> dict:
+    # The cursor never moves on the recording backend, so this is the cost of idle polling
+    updates: list = [0]
+    thread = MousePosThread(lambda x, y: updates.__setitem__(0, updates[0] + 1), RecordingBackend(), daemon=True)
+    cpuStart: float = time.process_time()
+    thread.start()
+    time.sleep(duration)
+    cpu: float = time.process_time() - cpuStart
+    thread.stop()
+    thread.join()
+    return {"cpuPercent": cpu / duration * 100, "updates": updates[0]}
+
+
+# How to compare each metric against a baseline: +1 if higher is better, -1 if lower is better
+METRICS: dict = {
+    "maxCps": 1,
+    "maxCpsBatched": 1,
+    "maxCpsJittered": 1,
+    "timingError.1cps.p99ErrorNs": -1,
+    "timingError.10cps.p99ErrorNs": -1,
+    "timingError.100cps.p99ErrorNs": -1,
+    "timingError.1000cps.p99ErrorNs": -1,
+    "clicker.startToFirstClickNs.p50": -1,
+    "clicker.stopToLastClickNs.max": -1,
+    "clicker.stopToExitNs.p50": -1,
+    "clicker.slowStop.click.max": -1,
+    "clicker.slowStop.hold.max": -1,
+    "isolation.thread.p99LatenessNs": -1,
+    "isolation.process.p99LatenessNs": -1,
+    "hotkey.p50": -1,
+    "hotkey.p99": -1,
+    "hotkeyToClick.currentNs.p50": -1,
+    "hotkeyToClick.currentNs.p99": -1,
+    "mousePos.idleCpuPercent": -1,
+    "allocations.blocksPerClick": -1,
+    "allocations.peakBytesPerClick": -1,
+    "allocations.jitteredBlocksPerClick": -1,
+    "watcher.pollCostNs.p50": -1,
+    "watcher.triggerToClickNs.p50": -1,
+    "watcher.triggerToClickNs.p99": -1,
+    "matching.fullLocateNs.p50": -1,
+    "matching.locateNs.p50": -1,
+    "matching.framesPerSecond": 1,
+    "matching.fftCacheHitRate": 1,
+    "paths.buildMs": -1,
+    "paths.bytesPerPoint": -1,
+    "paths.pointsPerSecond": 1,
+    "allocations.pathBlocksPerClick": -1,
+    "control.roundTripNs.p50": -1,
+    "control.roundTripNs.p99": -1,
+    "control.startToClickNs.p50": -1,
+    "control.monitoredP99LatenessNs": -1,
+    "limits.burstCps": 1,
+    "keys.maxRate": 1,
+    "keys.1000rate.p99ErrorNs": -1,
+    "keys.mixedKeyLatenessNs": -1,
+    "limits.durationErrorNs": -1,
+    "startup.firstClickMs": -1,
+}
+
+
+# Limits a run must stay within, as (direction, limit, what it means when it doesn't); correctness is covered by the
+# tests, these only catch a machine or change that makes the engine too slow to use
+BUDGETS: dict = {
+    "clicker.startToFirstClickNs.p50": (-1, 1_000_000, "Starting the warm engine takes over 1 ms"),
+    "control.roundTripNs.p50": (-1, 1_000_000, "A control command takes over 1 ms to answer"),
+    "matching.framesPerSecond": (1, 10, "Template matching can't keep up with 10 frames per second"),
+}
+
+
+def runSuite() -> dict:
+    metrics: dict = {}
+    metrics["maxCps"] = measureMaxCps()["cps"]
+    metrics["maxCpsBatched"] = measureMaxCps(batchSize=16)["cps"]
+    jitterAccuracy: dict = measureJitterAccuracy()
+    if jitterAccuracy:
+        from jitter import Jitter
+        metrics["maxCpsJittered"] = measureMaxCps(jitter=Jitter("normal", 0.1, "normal", 2.0, seed=1))["cps"]
+        for kind, accuracy in jitterAccuracy.items():
+            metrics[f"jitter.{kind}.meanError"] = accuracy["meanError"]
+            metrics[f"jitter.{kind}.spreadError"] = accuracy["spreadError"]
+    for cps in (1, 10, 100, 1000):
+        for name, value in measureTimingError(cps).items():
+            metrics[f"timingError.{cps}cps.{name}"] = value
+    for name, summary in measureStartStopLatency().items():
+        for key in ("p50", "p99", "max"):
+            metrics[f"clicker.{name}.{key}"] = summary[key]
+    for name, summary in measureSlowStopLatency().items():
+        for key in ("p50", "max"):
+            metrics[f"clicker.slowStop.{name}.{key}"] = summary[key]
+    for mode, stats in measureEngineIsolation().items():
+        for name, value in stats.items():
+            metrics[f"isolation.{mode}.{name}"] = value
+    hotkey: dict = measureHotkeyLatency()
+    for key in ("p50", "p99", "max") if hotkey else ():
+        metrics[f"hotkey.{key}"] = hotkey[key]
+    hotkeyToClick: dict = measureHotkeyToClick()
+    for mode in ("legacy", "current"):
+        for key in ("p50", "p99"):
+            metrics[f"hotkeyToClick.{mode}Ns.{key}"] = hotkeyToClick[mode][key]
+    metrics["hotkeyToClick.savedNs"] = hotkeyToClick["savedNs"]
+    metrics["mousePos.idleCpuPercent"] = measureMousePosIdleCpu()["cpuPercent"]
+    allocations: list = [measureClickAllocations(clickPos=clickPos, batchSize=batchSize) for clickPos, batchSize in [(None, 1), ((100, 100), 1), ((100, 100), 16)]]
+    metrics["allocations.blocksPerClick"] = max(allocation["blocksPerClick"] for allocation in allocations)
+    metrics["allocations.peakBytesPerClick"] = max(allocation["peakBytesPerClick"] for allocation in allocations)
+    if jitterAccuracy:
+        metrics["allocations.jitteredBlocksPerClick"] = measureClickAllocations(jitter=Jitter("lognormal", 0.2, "normal", 2.0, seed=1))["blocksPerClick"]
+    watcher: dict = measureWatcher()
+    if watcher:
+        metrics["watcher.pollRate"] = watcher["pollRate"]
+        metrics["watcher.pollCostNs.p50"] = watcher["pollCostNs"]["p50"]
+        metrics["watcher.skippedRegionShare"] = watcher["skippedRegionShare"]
+        for key in ("p50", "p99"):
+            metrics[f"watcher.triggerToClickNs.{key}"] = watcher["triggerToClickNs"][key]
+    matching: dict = measureTemplateMatching()
+    if matching:
+        metrics["matching.accuracy"] = matching["accuracy"]
+        metrics["matching.fullLocateNs.p50"] = matching["fullLocateNs"]["p50"]
+        metrics["matching.locateNs.p50"] = matching["locateNs"]["p50"]
+        metrics["matching.fftCacheHitRate"] = matching["fftCacheHitRate"]
+        metrics["matching.framesPerSecond"] = matching["framesPerSecond"]
+    paths: dict = measurePaths()
+    if paths:
+        for name in ("buildMs", "prepareMs", "bytesPerPoint", "pointsPerSecond"):
+            metrics[f"paths.{name}"] = paths[name]
+        metrics["allocations.pathBlocksPerClick"] = paths["allocations"]["blocksPerClick"]
+    control: dict = measureControlServer()
+    if control:
+        for key in ("p50", "p99"):
+            metrics[f"control.roundTripNs.{key}"] = control["roundTripNs"][key]
+        metrics["control.startToClickNs.p50"] = control["startToClickNs"]["p50"]
+        metrics["control.idleP99LatenessNs"] = control["idleP99LatenessNs"]
+        metrics["control.monitoredP99LatenessNs"] = control["monitoredP99LatenessNs"]
+    limits: dict = measureLimits()
+    metrics["limits.burstCps"] = limits["burstCps"]
+    metrics["limits.durationErrorNs"] = limits["durationErrorNs"]
+    keys: dict = measureKeyPresses()
+    metrics["keys.maxRate"] = keys["maxRate"]
+    metrics["keys.1000rate.p99ErrorNs"] = keys["p99ErrorNs"]
+    for name in ("mixedClickRate", "mixedKeyRate", "mixedClickLatenessNs", "mixedKeyLatenessNs"):
+        metrics[f"keys.{name}"] = keys[name]
+    startup: dict = measureStartup()
+    metrics["startup.firstClickMs"] = startup["firstClickMs"]
+    metrics["startup.importMs"] = startup["importMs"]
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "metrics": metrics,
+        "guiModulesLoaded": startup["guiModulesLoaded"],
+    }
+
+
+def compareResults(results: dict, baseline: dict, tolerance: float) -> list:
+    # Returns the metrics that got worse than the baseline by more than the tolerance (0.25 = 25%)
+    regressions: list = []
+    for name, direction in METRICS.items():
+        if name not in results["metrics"] or name not in baseline["metrics"]:
+            continue
+        current: float = results["metrics"][name]
+        previous: float = baseline["metrics"][name]
+        change: float = (current - previous) / previous if previous else 0.0
+        regressed: bool = change * direction < -tolerance
+        print(f"{name:40} {previous:>16.1f} -> {current:>16.1f} {change * 100:+8.1f}%{'  REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def checkBudgets(results: dict) -> list:
+    # Returns the metrics outside their budget; metrics a run skipped aren't checked
+    failures: list = []
+    for name, (direction, limit, message) in BUDGETS.items():
+        value: float = results["metrics"].get(name)
+        if value is not None and (value - limit) * direction < 0:
+            print(f"{name}: {message} ({value:.1f})")
+            failures.append(name)
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the click engine headlessly on the recording backend")
+    parser.add_argument("--output", help="write the results as JSON to this file ('-' for stdout)")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --output run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    results: dict = runSuite()
+    if args.output == "-":
+        print(json.dumps(results, indent=2))
+    else:
+        for name, value in results["metrics"].items():
+            print(f"{name:40} {value:>16.1f}")
+        if "hotkey.p50" not in results["metrics"]:
+            print("hotkey: skipped, keyboard module not installed")
+        if args.output:
+            with open(args.output, "w") as file:
+                json.dump(results, file, indent=2)
+
+    failures: list = checkBudgets(results)
+
+    gui: dict = measureGuiStartup()
+    if gui and args.output != "-":
+        for mode in ("legacy", "current"):
+            print(f"gui startup ({mode}): first frame after {gui[mode]['firstFrameMs']:.1f} ms, {gui[mode]['images']} images loaded")
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            baseline: dict = json.load(file)
+        failures += compareResults(results, baseline, args.tolerance)
+    if failures:
+        sys.exit(1)
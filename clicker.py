@@ -1,194 +1,567 @@
-from threading import Thread
+from itertools import islice
+from threading import Event, Lock, Thread
 import time
-from typing import Dict
-import win32api
-import win32con
-from pygame import time as pg_time
-
-from ctypes import windll, Structure, c_long, byref
-
-
-class Vector2:
-    def __init__(self, x: float, y: float) -> None:
-        self.x: float = x
-        self.y: float = y
-
-
-class POINT(Structure):
-    _fields_ = [("x", c_long), ("y", c_long)]
-
-
-def queryMousePosition() -> Vector2:
-    pt = POINT()
-    windll.user32.GetCursorPos(byref(pt))
-    return Vector2(pt.x, pt.y)
-
-
-class ClickThread(Thread):
-    def __init__(self, interval: float, hold: bool, clickButton: str, clickPos: tuple, *args, **kwargs) -> None:
-        super().__init__(*args, **kwargs)
+from typing import List
+
+from backend import BURST_BATCH_SIZE, EventBatch, InputBackend, Vector2, getDefaultBackend
+from jobs import JobScheduler
+from keypress import KeySession, parseKeys
+from scheduler import INTERRUPTED, DeadlineScheduler
+from sequence import SequenceThread, Timeline
+
+
+def queryMousePosition(backend: InputBackend = None) -> Vector2:
+    if backend is None:
+        backend = getDefaultBackend()
+    return backend.queryCursor()
+
+
+class ClickSession:
+    def __init__(self, interval: float, hold: bool, clickButton: str, clickPos: tuple, backend: InputBackend = None, batchSize: int = 1, jitter=None, path=None, maxClicks: int = None, maxDuration: float = None, burst: bool = False) -> None:
+        if maxClicks is not None and maxClicks < 1:
+            raise ValueError("Click limit must be at least 1")
+        if maxDuration is not None and maxDuration <= 0:
+            raise ValueError("Duration must be positive")
+        if burst and path is not None:
+            raise ValueError("A burst can't follow a path")
+        self._backend: InputBackend = backend if backend is not None else getDefaultBackend()
         self._running: bool = True
         self._interval: float = interval
         self._clickPos: tuple = clickPos
         self._clickButton: str = clickButton
         self._hold: bool = hold
-
-        self._clickFunc = None
-        if self._clickButton == "left":
-            self._clickFunc = ClickThread._leftClick
-        elif self._clickButton == "right":
-            self._clickFunc = ClickThread._rightClick
-        elif self._clickButton == "middle":
-            self._clickFunc = ClickThread._middleClick
+        # A burst clicks as fast as the backend takes the clicks, ignoring the rate and any jitter
+        self._burst: bool = burst and not hold
+        if self._burst:
+            jitter = None
+            batchSize = batchSize if batchSize > 1 else BURST_BATCH_SIZE
+        # Clicks sent per backend call; larger batches cost less per click but delay clicks by up to batchSize / rate.
+        # Jittered clicks each get their own interval and path clicks their own position, so neither is batched.
+        self._batchSize: int = max(1, batchSize) if jitter is None and path is None else 1
+
+        # Stopping and reconfiguring set _signal, which cuts short whatever wait the session is in
+        self._signal: Event = Event()
+        self._changes: tuple = None
+
+        # Everything is prepared up front so the session can start clicking the moment it runs; holding has no rate
+        self._scheduler: DeadlineScheduler = DeadlineScheduler(1 if hold else interval / self._batchSize, clicksPerTick=self._batchSize, interrupt=self._signal)
+        self._batch: EventBatch = self._buildBatch() if self._batchSize > 1 and not hold else None
+
+        # The scheduler refuses the tick that would go past a limit, so the session ends on exactly its last click.
+        # A hold has no clicks, it only ends after the duration.
+        self._holdDurationNs: int = round(maxDuration * 1e9) if maxDuration is not None and hold else None
+        if not hold:
+            self._scheduler.setLimits(maxClicks, round(maxDuration * 1e9) if maxDuration is not None else None)
+        # Injected events besides every click's press and release: cursor moves, and the press and release of a hold
+        self._otherEvents: int = 0
+
+        # Humanized timing: interval factors and position offsets come from sample rings refilled in the background
+        self._jitterRings: list = jitter.createRings() if jitter is not None and not hold and path is None else None
+        self._jitterNextNs: int = None
+        self._jitterLastNs: int = None
+
+        # A path is walked from precomputed columns: the interval is between its click targets and the moves in between
+        # are spread over it. The position to resume from is kept when the walk is interrupted.
+        self._path = path if not hold else None
+        if self._path is not None:
+            self._pathXs, self._pathYs, self._pathClicks = self._path.iterationColumns()
+            self._pathOffsets: list = self._path.offsets(interval)
+            self._pathCycleNs: int = self._path.cycleNs(interval)
+        self._pathIndex: int = 0
+        self._pathCycleStart: int = None
 
     def stop(self) -> None:
         self._running = False
-
-    @staticmethod
-    def _leftClick(x, y):
-        win32api.SetCursorPos((x, y))
-        win32api.mouse_event(win32con.MOUSEEVENTF_LEFTDOWN, x, y, 0, 0)
-        win32api.mouse_event(win32con.MOUSEEVENTF_LEFTUP, x, y, 0, 0)
-
-    @staticmethod
-    def _rightClick(x, y):
-        win32api.SetCursorPos((x, y))
-        win32api.mouse_event(win32con.MOUSEEVENTF_RIGHTDOWN, x, y, 0, 0)
-        win32api.mouse_event(win32con.MOUSEEVENTF_RIGHTUP, x, y, 0, 0)
-
-    @staticmethod
-    def _middleClick(x, y):
-        win32api.SetCursorPos((x, y))
-        win32api.mouse_event(win32con.MOUSEEVENTF_MIDDLEDOWN, x, y, 0, 0)
-        win32api.mouse_event(win32con.MOUSEEVENTF_MIDDLEUP, x, y, 0, 0)
-
-    @staticmethod
-    def _holdLeft(x, y):
-        win32api.SetCursorPos((x, y))
-        win32api.mouse_event(win32con.MOUSEEVENTF_LEFTDOWN, x, y, 0, 0)
-
-    @staticmethod
-    def _holdRight(x, y):
-        win32api.SetCursorPos((x, y))
-        win32api.mouse_event(win32con.MOUSEEVENTF_RIGHTDOWN, x, y, 0, 0)
-
-    @staticmethod
-    def _holdMiddle(x, y):
-        win32api.SetCursorPos((x, y))
-        win32api.mouse_event(win32con.MOUSEEVENTF_MIDDLEDOWN, x, y, 0, 0)
-
-    @staticmethod
-    def _unholdLeft(x, y):
-        win32api.SetCursorPos((x, y))
-        win32api.mouse_event(win32con.MOUSEEVENTF_LEFTUP, x, y, 0, 0)
-
-    @staticmethod
-    def _unholdRight(x, y):
-        win32api.SetCursorPos((x, y))
-        win32api.mouse_event(win32con.MOUSEEVENTF_RIGHTUP, x, y, 0, 0)
-
-    @staticmethod
-    def _unholdMiddle(x, y):
-        win32api.SetCursorPos((x, y))
-        win32api.mouse_event(win32con.MOUSEEVENTF_MIDDLEUP, x, y, 0, 0)
+        self._signal.set()
+
+    def reconfigure(self, interval: float, clickPos: tuple = None) -> None:
+        # Applied by the session itself the next time it wakes, which is immediately
+        if interval <= 0:
+            raise ValueError("Rate must be positive")
+        self._changes = (interval, clickPos)
+        self._signal.set()
+
+    def getStats(self) -> dict:
+        stats: dict = self._scheduler.getStats()
+        stats["events"] = 2 * stats["clicks"] + self._otherEvents
+        return stats
+
+    def exportStats(self, path: str) -> None:
+        self._scheduler.telemetry.export(path)
+
+    def _buildBatch(self, clicks: int = None) -> EventBatch:
+        # The batch is built once and resent as is; a fixed position needs a single move per batch
+        clicks = self._batchSize if clicks is None else clicks
+        batch: EventBatch = self._backend.createBatch(2 * clicks + 1)
+        if self._clickPos is not None:
+            batch.addMove(self._clickPos[0], self._clickPos[1])
+        for _ in range(clicks):
+            batch.addClick(self._clickButton)
+        return batch
+
+    def _sendRemainder(self, deadline: int) -> None:
+        # A click limit that isn't a whole number of batches ends with one smaller batch
+        remaining: int = self._scheduler.remainingClicks()
+        if not self._scheduler.finished or not 0 < remaining < self._batchSize:
+            return
+        batch: EventBatch = self._buildBatch(remaining)
+        if self._scheduler.waitUntil(deadline, remaining) != INTERRUPTED:
+            self._backend.sendBatch(batch)
+            self._otherEvents += 1 if self._clickPos is not None else 0
+
+    def _applyChanges(self) -> None:
+        # Clear first, so a change made while this runs sets the signal again instead of getting lost
+        self._signal.clear()
+        changes: tuple = self._changes
+        self._changes = None
+        if changes is None or not self._running:
+            return
+
+        interval, self._clickPos = changes
+        if self._batch is not None:
+            self._batch = self._buildBatch()
+        if interval != self._interval:
+            self._interval = interval
+            self._scheduler.rebase(interval / self._batchSize)
+            if self._path is not None:
+                # Keep the current point and its deadline, stretch or shrink the rest of the cycle around it
+                self._pathOffsets = self._path.offsets(interval)
+                self._pathCycleNs = self._path.cycleNs(interval)
+                if self._pathCycleStart is not None:
+                    self._pathCycleStart = time.perf_counter_ns() - self._pathOffsets[self._pathIndex]
+            if self._jitterLastNs is not None:
+                self._jitterNextNs = self._jitterLastNs + int(self._jitterRings[0].take() * 1e9 / interval)
 
     def _runHold(self) -> None:
-        # Get the hold position
-        if self._clickPos is None:
-            pos: Vector2 = queryMousePosition()
-        else:
-            pos: Vector2 = Vector2(self._clickPos[0], self._clickPos[1])
-
-        # Check which button user wants to hold and get the correct function for it
-        if self._clickButton == "left":
-            holdFunc = ClickThread._holdLeft
-            unholdFunc = ClickThread._unholdLeft
-        elif self._clickButton == "right":
-            holdFunc = ClickThread._holdRight
-            unholdFunc = ClickThread._unholdRight
-        elif self._clickButton == "middle":
-            holdFunc = ClickThread._holdMiddle
-            unholdFunc = ClickThread._unholdMiddle
+        # Holding at the current position needs no cursor move, only a fixed position does
+        if self._clickPos is not None:
+            self._backend.move(self._clickPos[0], self._clickPos[1])
 
         # Start holding
-        holdFunc(pos.x, pos.y)
+        self._backend.press(self._clickButton)
+        self._otherEvents += 2 if self._clickPos is not None else 1
+        endNs: int = time.perf_counter_ns() + self._holdDurationNs if self._holdDurationNs is not None else None
 
-        # Wait until user stops holding
+        # Sleep until the user stops holding, moves the hold somewhere else or the duration is up
         while self._running:
-            time.sleep(0.1)
+            if endNs is None:
+                self._signal.wait()
+            elif self._scheduler.waitUntil(endNs, 0) != INTERRUPTED:
+                self._scheduler.finished = True
+                break
+            self._applyChanges()
+            if self._running and self._clickPos is not None:
+                self._backend.move(self._clickPos[0], self._clickPos[1])
+                self._otherEvents += 1
 
         # Stop holding mouse
-        pos = queryMousePosition()
-        unholdFunc(pos.x, pos.y)
+        self._backend.release(self._clickButton)
+        self._otherEvents += 1
 
     def _runClick(self) -> None:
-        clock = pg_time.Clock()
+        self._scheduler.start()
+        # Each loop clicks until it is interrupted, then picks up the new settings or ends the session
+        while self._running:
+            if self._burst:
+                self._runBurst()
+            elif self._path is not None:
+                self._runClickPath()
+            elif self._jitterRings is not None:
+                self._runJitteredClick()
+            elif self._batch is not None:
+                self._runBatchedClick()
+            elif self._clickPos is None:
+                self._runClickInPlace()
+            else:
+                self._runClickAt()
+            self._applyChanges()
+            if self._scheduler.finished:
+                self._running = False
+
+    def _runClickInPlace(self) -> None:
+        # Resolve everything the loop touches once, so each click is only bound method calls on preallocated state
+        wait = self._scheduler.wait
+        press = self._backend.press
+        release = self._backend.release
+        button: str = self._clickButton
+        while wait() != INTERRUPTED:
+            press(button)
+            release(button)
+
+    def _runClickAt(self) -> None:
+        wait = self._scheduler.wait
+        press = self._backend.press
+        release = self._backend.release
+        button: str = self._clickButton
+        queryCursorInto = self._backend.queryCursorInto
+        move = self._backend.move
+        x, y = self._clickPos
+        # The cursor can be moved away mid-session, so it is checked before every click into one preallocated vector
+        cursor: Vector2 = Vector2(0, 0)
+        moves: int = 0
+        while wait() != INTERRUPTED:
+            queryCursorInto(cursor)
+            if cursor.x != x or cursor.y != y:
+                move(x, y)
+                moves += 1
+            press(button)
+            release(button)
+        self._otherEvents += moves
+
+    def _runJitteredClick(self) -> None:
+        # Deadlines are still absolute, each one a sampled interval after the previous, so the mean rate doesn't drift
+        nextFactor, nextX, nextY = [ring.take for ring in self._jitterRings]
+        waitUntil = self._scheduler.waitUntil
+        press = self._backend.press
+        release = self._backend.release
+        button: str = self._clickButton
+        intervalNs: float = 1e9 / self._interval
+        fixed: bool = self._clickPos is not None
+        x, y = self._clickPos if fixed else (0, 0)
+        # Only a new target needs a move, so an unchanged offset costs no call at all
+        lastX: int = None
+        lastY: int = None
+        move = self._backend.move
+
+        deadline: int = self._jitterNextNs if self._jitterNextNs is not None else time.perf_counter_ns()
+        moves: int = 0
+        while waitUntil(deadline) != INTERRUPTED:
+            if fixed:
+                targetX: int = x + nextX()
+                targetY: int = y + nextY()
+                if targetX != lastX or targetY != lastY:
+                    move(targetX, targetY)
+                    lastX, lastY = targetX, targetY
+                    moves += 1
+            press(button)
+            release(button)
+            self._jitterLastNs = deadline
+            deadline += int(nextFactor() * intervalNs)
+        self._jitterNextNs = deadline
+        self._otherEvents += moves
+
+    def _runClickPath(self) -> None:
+        # Every point comes straight from the precomputed lists, so walking even a very long path allocates nothing
+        # that outlives an iteration
+        waitUntil = self._scheduler.waitUntil
+        press = self._backend.press
+        release = self._backend.release
+        move = self._backend.move
+        button: str = self._clickButton
+        columns: tuple = (self._pathOffsets, self._pathXs, self._pathYs, self._pathClicks)
+        cycleNs: int = self._pathCycleNs
+        cycleStart: int = self._pathCycleStart if self._pathCycleStart is not None else time.perf_counter_ns()
+        start: int = self._pathIndex
+        moves: int = 0
         while True:
-            if self._running:
-                if self._clickPos is None:
-                    pos = queryMousePosition()
-                    self._clickFunc(pos.x, pos.y)
-                else:
-                    self._clickFunc(self._clickPos[0], self._clickPos[1])
+            for index, (offset, x, y, click) in enumerate(islice(zip(*columns), start, None), start):
+                if waitUntil(cycleStart + offset, click) == INTERRUPTED:
+                    self._pathIndex, self._pathCycleStart = index, cycleStart
+                    self._otherEvents += moves
+                    return
+                move(x, y)
+                moves += 1
+                if click:
+                    press(button)
+                    release(button)
+            cycleStart += cycleNs
+            start = 0
+
+    def _runBatchedClick(self) -> None:
+        batch: EventBatch = self._batch
+        wait = self._scheduler.wait
+        sendBatch = self._backend.sendBatch
+        batches: int = 0
+        while wait() != INTERRUPTED:
+            sendBatch(batch)
+            batches += 1
+        self._otherEvents += batches if self._clickPos is not None else 0
+        self._sendRemainder(self._scheduler.nextDeadline())
+
+    def _runBurst(self) -> None:
+        # Every deadline is now, so the scheduler only checks for a stop or a limit between batches
+        batch: EventBatch = self._batch
+        waitUntil = self._scheduler.waitUntil
+        now = time.perf_counter_ns
+        sendBatch = self._backend.sendBatch
+        batches: int = 0
+        while waitUntil(now()) != INTERRUPTED:
+            sendBatch(batch)
+            batches += 1
+        self._otherEvents += batches if self._clickPos is not None else 0
+        self._sendRemainder(now())
+
+    def run(self) -> None:
+        try:
+            if self._hold:
+                self._runHold()
             else:
-                break
-            clock.tick(self._interval)
+                self._runClick()
+        except BaseException:
+            # Whatever went wrong, the button must not be left down
+            self._backend.release(self._clickButton)
+            raise
+
+
+class ClickThread(Thread):
+    def __init__(self, interval: float, hold: bool, clickButton: str, clickPos: tuple, backend: InputBackend = None, batchSize: int = 1, jitter=None, path=None, maxClicks: int = None, maxDuration: float = None, burst: bool = False, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._session: ClickSession = ClickSession(interval, hold, clickButton, clickPos, backend, batchSize, jitter, path, maxClicks, maxDuration, burst)
+
+    def stop(self) -> None:
+        self._session.stop()
+
+    def reconfigure(self, interval: float, clickPos: tuple = None) -> None:
+        self._session.reconfigure(interval, clickPos)
+
+    def getStats(self) -> dict:
+        return self._session.getStats()
+
+    def exportStats(self, path: str) -> None:
+        self._session.exportStats(path)
 
     def run(self) -> None:
-        if self._hold:
-            self._runHold()
-        else:
-            self._runClick()
+        self._session.run()
+
+
+class ClickEngine(Thread):
+    def __init__(self, backend: InputBackend = None, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._backend: InputBackend = backend if backend is not None else getDefaultBackend()
+
+        # The worker lives as long as the engine and parks on _wakeup between sessions. Sessions only ever run on
+        # this one thread, so a new one can't begin before the previous one has returned and released its button.
+        self._lock: Lock = Lock()
+        self._wakeup: Event = Event()
+        self._idle: Event = Event()
+        self._idle.set()
+        self._alive: bool = True
+        self._pending: ClickSession = None
+        self._current: ClickSession = None
+        self._last: ClickSession = None
+        self.lastError: str = None
+
+    def startSession(self, interval: float, hold: bool, clickButton: str, clickPos: tuple = None, batchSize: int = 1, jitter=None, path=None, maxClicks: int = None, maxDuration: float = None, burst: bool = False) -> None:
+        self._handOff(ClickSession(interval, hold, clickButton, clickPos, self._backend, batchSize, jitter, path, maxClicks, maxDuration, burst))
+
+    def startKeySession(self, interval: float, steps: List[tuple], hold: bool = False, batchSize: int = 1, maxPresses: int = None, maxDuration: float = None, burst: bool = False) -> None:
+        # Key sessions take turns with click sessions on the same worker
+        self._handOff(KeySession(interval, steps, hold, self._backend, batchSize, maxPresses, maxDuration, burst))
+
+    def _handOff(self, session) -> None:
+        with self._lock:
+            if self._current is not None:
+                self._current.stop()
+            self._pending = session
+            self._last = session
+            self._idle.clear()
+        self._wakeup.set()
+
+    def reconfigure(self, interval: float, clickPos: tuple = None) -> None:
+        # Changes the rate or position of the running session without restarting it
+        with self._lock:
+            session: ClickSession = self._pending if self._pending is not None else self._current
+            if session is not None:
+                session.reconfigure(interval, clickPos)
+
+    def stopSession(self) -> None:
+        with self._lock:
+            self._pending = None
+            if self._current is not None:
+                self._current.stop()
+
+    def waitIdle(self, timeout: float = None) -> bool:
+        return self._idle.wait(timeout)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._alive = False
+        self.stopSession()
+        self._wakeup.set()
+
+    def getStats(self) -> dict:
+        session: ClickSession = self._last
+        return session.getStats() if session is not None else {}
+
+    def exportStats(self, path: str) -> None:
+        session: ClickSession = self._last
+        if session is not None:
+            session.exportStats(path)
+
+    def run(self) -> None:
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                self._wakeup.clear()
+                if not self._alive:
+                    break
+                session: ClickSession = self._pending
+                self._pending = None
+                self._current = session
+                if session is None:
+                    self._idle.set()
+                    continue
+
+            try:
+                session.run()
+            except Exception as e:
+                # A failed session ends on its own, the worker stays up for the next one
+                self.lastError = f"{type(e).__name__}: {e}"
+                print(f"Click session failed: {self.lastError}")
+            finally:
+                with self._lock:
+                    self._current = None
+                    if self._pending is None:
+                        self._idle.set()
+        self._idle.set()
 
 
 class MousePosThread(Thread):
-    def __init__(self, updateFunc, *args, **kwargs) -> None:
+    def __init__(self, updateFunc, backend: InputBackend = None, scheduleFunc=None, minInterval: float = 1 / 60, maxInterval: float = 0.5, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
 
+        # updateFunc runs wherever scheduleFunc puts it, e.g. lambda func: tk.after(0, func) for the Tk main loop
         self._updateFunc = updateFunc
+        self._scheduleFunc = scheduleFunc
+        self._backend: InputBackend = backend if backend is not None else getDefaultBackend()
         self._running: bool = True
-        self._paused: bool = False
+        self._active: Event = Event()
+        self._active.set()
+        self._nudge: Event = Event()
+
+        # Polling speeds up to minInterval while the cursor moves and backs off towards maxInterval when idle
+        self._minInterval: float = minInterval
+        self._maxInterval: float = maxInterval
+        self._latest: tuple = None
+        self._pending: bool = False
 
     def stop(self):
         self._running: bool = False
-        self._paused = False
+        self._active.set()
+        self._nudge.set()
 
     def pause(self):
-        self._paused = True
+        self._active.clear()
 
     def unpause(self):
-        self._paused = False
+        self._active.set()
+        self._nudge.set()
+
+    def _publish(self, x, y) -> None:
+        self._latest = (x, y)
+        if self._scheduleFunc is None:
+            self._updateFunc(x, y)
+        elif not self._pending:
+            # Only one update is queued at a time, it shows whatever position is newest when it runs
+            self._pending = True
+            self._scheduleFunc(self._flush)
+
+    def _flush(self) -> None:
+        self._pending = False
+        if self._active.is_set():
+            self._updateFunc(*self._latest)
 
     def run(self) -> None:
-        interval: float = 1 / 20
+        interval: float = self._minInterval
+        cursor: Vector2 = Vector2(0, 0)
+        last: tuple = None
         while True:
-            if self._paused:
-                time.sleep(0.25)
+            # Blocks without waking up while paused
+            self._active.wait()
+            if not self._running:
+                break
+
+            self._backend.queryCursorInto(cursor)
+            if last is None or cursor.x != last[0] or cursor.y != last[1]:
+                last = (cursor.x, cursor.y)
+                self._publish(cursor.x, cursor.y)
+                interval = self._minInterval
             else:
-                if self._running:
-                    if not self._paused:
-                        pos: Vector2 = queryMousePosition()
-                        self._updateFunc(pos.x, pos.y)
-                else:
-                    break
-                time.sleep(interval)
+                interval = min(interval * 2, self._maxInterval)
 
+            # Unpausing cuts a backed off wait short
+            if self._nudge.wait(interval):
+                self._nudge.clear()
+                interval = self._minInterval
 
-class Clicker:
-    clickThreads: Dict[str, ClickThread] = {}
 
-    def __init__(self) -> None:
-        pass
+class Clicker:
+    def __init__(self, backend: InputBackend = None) -> None:
+        self._backend: InputBackend = backend
+        # One warm worker runs every click session, so starting is a state change instead of a new thread
+        self._engine: ClickEngine = ClickEngine(backend, daemon=True)
+        self._engine.start()
+        self._jobScheduler: JobScheduler = None
+        self._macroPlayer = None
+        self._sequenceThread: SequenceThread = None
 
     def stopClicking(self):
-        for key in Clicker.clickThreads:
-            Clicker.clickThreads[key].stop()
-        Clicker.clickThreads = {}
+        self._engine.stopSession()
+
+    def startClicking(self, interval: float, clickButton: str, clickPos: tuple = None, hold: bool = False, batchSize: int = 1, jitter=None, path=None, maxClicks: int = None, maxDuration: float = None, burst: bool = False):
+        # With a click or duration limit the session ends by itself; getStats() then reports it finished
+        self._engine.startSession(interval, hold, clickButton, clickPos, batchSize, jitter, path, maxClicks, maxDuration, burst)
+
+    def startPressing(self, interval: float, keys: str, hold: bool = False, batchSize: int = 1, maxPresses: int = None, maxDuration: float = None, burst: bool = False):
+        # keys as parseKeys takes them, e.g. "a, b, ctrl+c"; replaces any click session that is running
+        self._engine.startKeySession(interval, parseKeys(keys), hold, batchSize, maxPresses, maxDuration, burst)
+
+    def reconfigure(self, interval: float, clickPos: tuple = None):
+        self._engine.reconfigure(interval, clickPos)
+
+    def waitUntilStopped(self, timeout: float = None) -> bool:
+        return self._engine.waitIdle(timeout)
+
+    def getStats(self) -> dict:
+        return self._engine.getStats()
+
+    def exportStats(self, path: str):
+        self._engine.exportStats(path)
+
+    def _getJobScheduler(self) -> JobScheduler:
+        # All concurrent jobs share one timing thread, started the first time a job is added
+        if self._jobScheduler is None:
+            self._jobScheduler = JobScheduler(self._backend, daemon=True)
+            self._jobScheduler.start()
+        return self._jobScheduler
+
+    def addJob(self, interval: float, clickButton: str, clickPos: tuple = None) -> int:
+        return self._getJobScheduler().addJob(interval, clickButton, clickPos)
+
+    def addKeyJob(self, interval: float, keys: str) -> int:
+        return self._getJobScheduler().addKeyJob(interval, parseKeys(keys))
+
+    def removeJob(self, jobId: int):
+        self._getJobScheduler().removeJob(jobId)
+
+    def pauseJob(self, jobId: int):
+        self._getJobScheduler().pauseJob(jobId)
+
+    def resumeJob(self, jobId: int):
+        self._getJobScheduler().resumeJob(jobId)
+
+    def getJobStats(self, jobId: int) -> dict:
+        return self._getJobScheduler().getJobStats(jobId)
+
+    def playMacro(self, path: str, speed: float = 1.0, loops: int = 1, onEvent=None):
+        # Imported here so plain clicking never loads the macro player
+        from macro import MacroFile, MacroPlayer
+
+        self.stopMacro()
+        self._macroPlayer = MacroPlayer(MacroFile(path), self._backend, speed, loops, onEvent, daemon=True)
+        self._macroPlayer.start()
 
-    def startClicking(self, interval: int, clickButton: str, clickPos: tuple = None, hold: bool = False):
-        self.stopClicking()
+    def stopMacro(self):
+        if self._macroPlayer is not None:
+            self._macroPlayer.stop()
+            self._macroPlayer = None
 
-        thread = ClickThread(interval, hold, clickButton, clickPos, daemon=True)  # Clicking thread
-        thread.start()
+    def startSequence(self, timeline: Timeline, loops: int = 1):
+        self.stopSequence()
+        self._sequenceThread = SequenceThread(timeline, self._backend, loops, daemon=True)
+        self._sequenceThread.start()
 
-        Clicker.clickThreads[str(len(Clicker.clickThreads))] = thread
+    def stopSequence(self):
+        if self._sequenceThread is not None:
+            self._sequenceThread.stop()
+            self._sequenceThread = None
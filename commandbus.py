@@ -0,0 +1,37 @@
+from collections import deque
+
+
+class CommandBus:
+    def __init__(self, tkWindow) -> None:
+        # Hands work from hotkey, tray and watcher threads to the Tk thread. Posting is a deque append, which is
+        # atomic, so it never takes a lock; only the Tk thread drains the queue.
+        # Created on the Tk thread.
+        self._tk = tkWindow
+        self._commands: deque = deque()
+        self.posted: int = 0
+        self.drained: int = 0
+        # A drain is only scheduled while there is something to drain, so an idle window never wakes for the bus.
+        # The first one runs once the main loop does and picks up anything posted before it started.
+        self._armed: bool = True
+        self._tk.after_idle(self._drain)
+
+    def post(self, func, *args) -> None:
+        self._commands.append((func, args))
+        self.posted += 1
+        if not self._armed:
+            # Two posters can both get here, which only costs one extra, empty drain
+            self._armed = True
+            try:
+                self._tk.after(0, self._drain)
+            except RuntimeError:
+                # The main loop has ended, nothing will run the command anyway
+                pass
+
+    def _drain(self) -> None:
+        # Disarmed before draining, so a command posted while this runs schedules the next drain instead of getting lost
+        self._armed = False
+        commands: deque = self._commands
+        while commands:
+            func, args = commands.popleft()
+            self.drained += 1
+            func(*args)
@@ -0,0 +1,417 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import socket
+import stat
+import struct
+import sys
+from threading import Event, Thread
+
+from backend import BUTTON_CODES
+
+CONTROL_SOCKET_PATH: str = "autoclicker.sock"
+
+# A client whose unread output passes this is too slow for telemetry; frames are dropped for it instead of queued
+MAX_BUFFERED: int = 1 << 16
+MAX_MESSAGE: int = 1 << 16
+
+WEBSOCKET_GUID: bytes = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OPCODE_TEXT: int = 0x1
+OPCODE_CLOSE: int = 0x8
+OPCODE_PING: int = 0x9
+OPCODE_PONG: int = 0xA
+
+
+def _websocketFrame(opcode: int, payload: bytes) -> bytes:
+    # Frames from the server are never masked
+    length: int = len(payload)
+    if length < 126:
+        header: bytes = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def _unmask(payload: bytes, mask: bytes) -> bytes:
+    # XORs the whole payload as one big integer instead of byte by byte
+    repeated: bytes = (mask * (len(payload) // 4 + 1))[:len(payload)]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(repeated, "big")).to_bytes(len(payload), "big")
+
+
+class _Connection:
+    def __init__(self, writer: asyncio.StreamWriter) -> None:
+        self.writer: asyncio.StreamWriter = writer
+        self.subscribed: bool = False
+        self.dropped: int = 0
+
+    def encode(self, message: bytes) -> bytes:
+        return message + b"\n"
+
+    def send(self, message: bytes) -> None:
+        self.writer.write(self.encode(message))
+
+    def sendFrame(self, frame: bytes) -> None:
+        # Telemetry never waits for a client: one that stopped reading just misses frames
+        if self.writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+            self.dropped += 1
+            return
+        self.writer.write(frame)
+
+
+class _WebSocketConnection(_Connection):
+    def encode(self, message: bytes) -> bytes:
+        return _websocketFrame(OPCODE_TEXT, message)
+
+
+class ControlServer(Thread):
+    def __init__(self, clicker, socketPath: str = CONTROL_SOCKET_PATH, websocketPort: int = None, telemetryInterval: float = 0.1, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # Drives a Clicker or ProcessClicker with newline-delimited JSON over a Unix socket and, optionally, a
+        # WebSocket on the loopback interface. Every command runs on this thread's event loop; starting and stopping
+        # only hand state to the engine's warm worker, so no command spawns or waits on a thread.
+        if socketPath is None and websocketPort is None:
+            raise ValueError("The control server needs a socket path or a WebSocket port")
+        if socketPath is not None and sys.platform == "win32":
+            raise ValueError("Unix sockets aren't available here, use a WebSocket port")
+        if telemetryInterval <= 0:
+            raise ValueError("Telemetry interval must be positive")
+        self._clicker = clicker
+        self._socketPath: str = socketPath
+        self._websocketPort: int = websocketPort
+        self._telemetryInterval: float = telemetryInterval
+
+        self._loop: asyncio.AbstractEventLoop = None
+        self._stopped: asyncio.Event = None
+        self._ready: Event = Event()
+        self._error: Exception = None
+        self._connections: set = set()
+        self._commands: int = 0
+        self._frames: int = 0
+
+        self._handlers: dict = {
+            "start": self._commandStart,
+            "stop": self._commandStop,
+            "reconfigure": self._commandReconfigure,
+            "status": self._commandStatus,
+            "subscribe": self._commandSubscribe,
+            "unsubscribe": self._commandUnsubscribe,
+        }
+
+    def waitReady(self, timeout: float = None) -> bool:
+        # Raises what kept the server from listening, e.g. a port that is already taken
+        ready: bool = self._ready.wait(timeout)
+        if self._error is not None:
+            raise self._error
+        return ready
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    def getStats(self) -> dict:
+        connections: list = list(self._connections)
+        return {
+            "clients": len(connections),
+            "subscribers": sum(connection.subscribed for connection in connections),
+            "commands": self._commands,
+            "telemetryFrames": self._frames,
+            "droppedFrames": sum(connection.dropped for connection in connections),
+        }
+
+    def run(self) -> None:
+        loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self._serve(loop))
+        except OSError as e:
+            self._error = e
+        finally:
+            self._ready.set()
+            loop.close()
+
+    def _bindUnixSocket(self) -> socket.socket:
+        # Only this user may drive the clicker. The socket is created with mode 0600 by binding it under a tight
+        # umask, so it is never reachable by others even for a moment, which a chmod after binding would leave open.
+        sock: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        oldUmask: int = os.umask(0o177)
+        try:
+            sock.bind(self._socketPath)
+        except OSError:
+            sock.close()
+            raise
+        finally:
+            os.umask(oldUmask)
+        return sock
+
+    async def _serve(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._stopped = asyncio.Event()
+        servers: list = []
+        try:
+            if self._socketPath is not None:
+                # A socket left behind by a previous run would make binding fail
+                if os.path.exists(self._socketPath) and stat.S_ISSOCK(os.stat(self._socketPath).st_mode):
+                    os.unlink(self._socketPath)
+                servers.append(await asyncio.start_unix_server(self._handleStream, sock=self._bindUnixSocket(), limit=MAX_MESSAGE))
+            if self._websocketPort is not None:
+                servers.append(await asyncio.start_server(self._handleWebSocket, "127.0.0.1", self._websocketPort, limit=MAX_MESSAGE))
+            self._loop = loop
+            self._ready.set()
+
+            broadcaster: asyncio.Task = loop.create_task(self._broadcast())
+            await self._stopped.wait()
+            broadcaster.cancel()
+        finally:
+            for server in servers:
+                server.close()
+            for connection in list(self._connections):
+                connection.writer.close()
+            # Lets the handlers of the connections that were just closed see the end of their stream
+            handlers: list = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            if handlers:
+                await asyncio.wait(handlers, timeout=1)
+            for server in servers:
+                await server.wait_closed()
+            if self._socketPath is not None and servers and os.path.exists(self._socketPath):
+                os.unlink(self._socketPath)
+
+    async def _broadcast(self) -> None:
+        # The stats are read and encoded once per tick no matter how many clients watch, so monitoring costs the
+        # engine the same with one subscriber as with hundreds
+        while True:
+            await asyncio.sleep(self._telemetryInterval)
+            subscribers: list = [connection for connection in self._connections if connection.subscribed]
+            if not subscribers:
+                continue
+            message: bytes = json.dumps({"event": "telemetry", "stats": self._clicker.getStats()}).encode()
+            self._frames += 1
+            # Framed once per kind of connection too
+            frames: dict = {}
+            for connection in subscribers:
+                frame: bytes = frames.get(type(connection))
+                if frame is None:
+                    frame = frames[type(connection)] = connection.encode(message)
+                connection.sendFrame(frame)
+
+    async def _handleStream(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        connection: _Connection = _Connection(writer)
+        self._connections.add(connection)
+        try:
+            while True:
+                try:
+                    line: bytes = await reader.readline()
+                except ValueError:
+                    connection.send(json.dumps({"ok": False, "error": f"Messages are limited to {MAX_MESSAGE} bytes"}).encode())
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    connection.send(self._execute(connection, line))
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.discard(connection)
+            writer.close()
+
+    async def _handleWebSocket(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            key: str = await self._handshake(reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            key = None
+        if key is None:
+            writer.close()
+            return
+
+        connection: _WebSocketConnection = _WebSocketConnection(writer)
+        self._connections.add(connection)
+        try:
+            while True:
+                opcode, payload = await self._readFrame(reader)
+                if opcode == OPCODE_TEXT:
+                    connection.send(self._execute(connection, payload))
+                    await writer.drain()
+                elif opcode == OPCODE_PING:
+                    writer.write(_websocketFrame(OPCODE_PONG, payload))
+                elif opcode == OPCODE_CLOSE or opcode is None:
+                    writer.write(_websocketFrame(OPCODE_CLOSE, payload[:2]))
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(connection)
+            writer.close()
+
+    async def _handshake(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> str:
+        request: bytes = await reader.readuntil(b"\r\n\r\n")
+        lines: list = request.decode("latin-1").split("\r\n")
+        headers: dict = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        key: str = headers.get("sec-websocket-key")
+        # Browsers always send an Origin and can't be stopped from connecting to loopback, so any page could click
+        # for the user; only clients that aren't browsers are let in
+        if not lines[0].startswith("GET ") or headers.get("upgrade", "").lower() != "websocket" or key is None or "origin" in headers:
+            writer.write(b"HTTP/1.1 403 Forbidden\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            return None
+        accept: str = base64.b64encode(hashlib.sha1(key.encode() + WEBSOCKET_GUID).digest()).decode()
+        writer.write(f"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\nSec-WebSocket-Accept: {accept}\r\n\r\n".encode())
+        return key
+
+    async def _readFrame(self, reader: asyncio.StreamReader) -> tuple:
+        # (opcode, payload), or (None, close payload) for frames this server doesn't take: fragmented, unmasked
+        # or too large ones
+        first, second = await reader.readexactly(2)
+        length: int = second & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", await reader.readexactly(8))[0]
+        if not first & 0x80 or not second & 0x80:
+            return None, struct.pack("!H", 1002)
+        if length > MAX_MESSAGE:
+            return None, struct.pack("!H", 1009)
+        mask: bytes = await reader.readexactly(4)
+        return first & 0x0F, _unmask(await reader.readexactly(length), mask)
+
+    def _execute(self, connection: _Connection, message: bytes) -> bytes:
+        self._commands += 1
+        requestId = None
+        try:
+            try:
+                request = json.loads(message)
+            except ValueError as e:
+                raise ValueError(f"Invalid JSON: {e}")
+            if not isinstance(request, dict):
+                raise ValueError("A command must be a JSON object")
+            requestId = request.get("id")
+            handler = self._handlers.get(request.get("command"))
+            if handler is None:
+                raise ValueError(f"Unknown command '{request.get('command')}'")
+            reply: dict = handler(connection, request)
+        except ValueError as e:
+            reply = {"ok": False, "error": str(e)}
+        except Exception as e:
+            # Whatever else a handler raises is still only this command's failure, the connection stays open
+            reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        if requestId is not None:
+            reply["id"] = requestId
+        return json.dumps(reply).encode()
+
+    def _commandStart(self, connection: _Connection, request: dict) -> dict:
+        cps: float = _number(request, "cps", 10.0)
+        button: str = request.get("button", "left")
+        if button not in BUTTON_CODES:
+            raise ValueError(f"Unknown mouse button '{button}'")
+        hold: bool = _flag(request, "hold")
+        batchSize: int = _whole(request, "batchSize", 1)
+        maxClicks: int = _whole(request, "maxClicks", None)
+        maxDuration: float = _number(request, "maxDuration", None)
+
+        path = None
+        if request.get("path") is not None:
+            # NumPy is only loaded once a path is actually clicked
+            from paths import loadPath
+            try:
+                path = loadPath(str(request["path"]))
+            except OSError as e:
+                raise ValueError(f"Couldn't load path: {e}")
+        self._clicker.startClicking(cps, button, _position(request), hold, batchSize, path=path, maxClicks=maxClicks, maxDuration=maxDuration, burst=_flag(request, "burst"))
+        return {"ok": True}
+
+    def _commandStop(self, connection: _Connection, request: dict) -> dict:
+        self._clicker.stopClicking()
+        return {"ok": True}
+
+    def _commandReconfigure(self, connection: _Connection, request: dict) -> dict:
+        cps: float = _number(request, "cps", None)
+        if cps is None:
+            raise ValueError("reconfigure needs cps")
+        self._clicker.reconfigure(cps, _position(request))
+        return {"ok": True}
+
+    def _commandStatus(self, connection: _Connection, request: dict) -> dict:
+        return {"ok": True, "clicking": not self._clicker.waitUntilStopped(0), "stats": self._clicker.getStats()}
+
+    def _commandSubscribe(self, connection: _Connection, request: dict) -> dict:
+        connection.subscribed = True
+        return {"ok": True, "interval": self._telemetryInterval}
+
+    def _commandUnsubscribe(self, connection: _Connection, request: dict) -> dict:
+        connection.subscribed = False
+        return {"ok": True}
+
+
+def _number(request: dict, name: str, default):
+    value = request.get(name, default)
+    if value is default:
+        return value
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or value <= 0:
+        raise ValueError(f"{name} must be a positive number")
+    return float(value)
+
+
+def _whole(request: dict, name: str, default):
+    value = request.get(name, default)
+    if value is default:
+        return value
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+        raise ValueError(f"{name} must be a positive whole number")
+    return value
+
+
+def _flag(request: dict, name: str) -> bool:
+    value = request.get(name, False)
+    if not isinstance(value, bool):
+        raise ValueError(f"{name} must be true or false")
+    return value
+
+
+def _position(request: dict) -> tuple:
+    position = request.get("pos")
+    if position is None:
+        return None
+    if not isinstance(position, list) or len(position) != 2 or not all(isinstance(value, int) and not isinstance(value, bool) for value in position):
+        raise ValueError("pos must be [x, y] or null")
+    return (position[0], position[1])
+
+
+class ControlClient:
+    def __init__(self, socketPath: str = CONTROL_SOCKET_PATH, timeout: float = 5.0) -> None:
+        # Blocking client for scripts and the benchmark; telemetry that arrives while waiting for a reply is kept
+        # for nextEvent()
+        self._socket: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(socketPath)
+        self._file = self._socket.makefile("rb")
+        self._nextId: int = 0
+        self._events: list = []
+
+    def request(self, command: str, **fields) -> dict:
+        self._nextId += 1
+        self._socket.sendall(json.dumps({"command": command, "id": self._nextId, **fields}).encode() + b"\n")
+        while True:
+            message: dict = self._readMessage()
+            if message.get("id") == self._nextId:
+                return message
+            if "event" in message:
+                self._events.append(message)
+
+    def nextEvent(self) -> dict:
+        if self._events:
+            return self._events.pop(0)
+        return self._readMessage()
+
+    def _readMessage(self) -> dict:
+        line: bytes = self._file.readline()
+        if not line:
+            raise ConnectionError("The control server closed the connection")
+        return json.loads(line)
+
+    def close(self) -> None:
+        self._file.close()
+        self._socket.close()
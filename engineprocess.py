@@ -0,0 +1,243 @@
+import multiprocessing
+from multiprocessing import shared_memory
+import os
+import struct
+from threading import Lock
+import time
+
+from backend import BUTTON_CODES, BUTTON_NAMES
+
+# The controller and the engine process share one memory block. The control half holds the state the controller
+# wants (not a queue of commands), so the engine can skip straight to the newest state no matter how many changes
+# piled up. Each half is a seqlock: the writer makes the sequence odd, writes the fields and makes it even again.
+CONTROL = struct.Struct("<QQQBBBBBBxxdiiiqd1024s")
+STATUS = struct.Struct("<QQQQQdddddqqqqqqQQQ")
+STATUS_OFFSET: int = 1152
+BLOCK_SIZE: int = STATUS_OFFSET + STATUS.size
+
+# How often the engine publishes its statistics while clicking
+STATUS_INTERVAL: float = 0.1
+# How often an idle engine checks that the process that started it is still there
+PARENT_CHECK_INTERVAL: float = 1.0
+# How long a reader waits for a write in progress before it gives up on the writer
+READ_TIMEOUT: float = 1.0
+
+
+class ControlBlock:
+    def __init__(self, buffer) -> None:
+        self._buffer = buffer
+
+    @staticmethod
+    def _write(buffer, struct_: struct.Struct, offset: int, values: tuple) -> None:
+        seq: int = struct.unpack_from("<Q", buffer, offset)[0]
+        struct.pack_into("<Q", buffer, offset, seq + 1)
+        struct_.pack_into(buffer, offset, seq + 1, *values)
+        struct.pack_into("<Q", buffer, offset, seq + 2)
+
+    @staticmethod
+    def _read(buffer, struct_: struct.Struct, offset: int) -> tuple:
+        # Retries until it gets a copy that no write overlapped; a writer that died mid-write leaves the sequence odd
+        deadline: float = None
+        while True:
+            seq: int = struct.unpack_from("<Q", buffer, offset)[0]
+            if seq % 2:
+                if deadline is None:
+                    deadline = time.monotonic() + READ_TIMEOUT
+                elif time.monotonic() > deadline:
+                    raise TimeoutError("The engine's shared memory was left halfway through an update")
+                continue
+            values: tuple = struct_.unpack_from(buffer, offset)
+            if struct.unpack_from("<Q", buffer, offset)[0] == seq:
+                return values[1:]
+
+    def writeControl(self, *values) -> None:
+        self._write(self._buffer, CONTROL, 0, values)
+
+    def readControl(self) -> tuple:
+        # (sessionSeq, exportSeq, running, hold, hasPos, shutdown, button, burst, rate, x, y, batchSize, maxClicks,
+        #  maxDuration, exportPath); a limit of 0 means none
+        return self._read(self._buffer, CONTROL, 0)
+
+    def writeStatus(self, *values) -> None:
+        self._write(self._buffer, STATUS, STATUS_OFFSET, values)
+
+    def readStatus(self) -> tuple:
+        # (sessionSeq, exportSeq, active, ticks, targetRate, achievedRate, cps1s, cps10s, latenessMean,
+        #  latenessCount, p50, p99, p999, max, pid, clicks, events, finished)
+        return self._read(self._buffer, STATUS, STATUS_OFFSET)
+
+
+def runEngine(memoryName: str, backendName: str, wakeup) -> None:
+    # Entry point of the engine process: it only imports the engine, never Tk or anything else the GUI uses
+    from backend import createBackend
+    from clicker import ClickEngine
+
+    memory = shared_memory.SharedMemory(memoryName)
+    block: ControlBlock = ControlBlock(memory.buf)
+    engine: ClickEngine = ClickEngine(createBackend(backendName), daemon=True)
+    engine.start()
+
+    sessionSeq = exportSeq = 0
+    settings: tuple = None
+    running: bool = False
+    while True:
+        # Even an idle engine wakes up now and then, so it doesn't outlive a controller that crashed
+        wakeup.wait(STATUS_INTERVAL if running else PARENT_CHECK_INTERVAL)
+        wakeup.clear()
+        newSessionSeq, newExportSeq, wantRunning, hold, hasPos, shutdown, button, burst, rate, x, y, batchSize, maxClicks, maxDuration, exportPath = block.readControl()
+        if shutdown or not multiprocessing.parent_process().is_alive():
+            break
+
+        clickPos: tuple = (x, y) if hasPos else None
+        if not wantRunning:
+            if running:
+                # The session ends within microseconds, so the status below can already report it stopped
+                engine.stopSession()
+                engine.waitIdle(1)
+        elif newSessionSeq != sessionSeq or not running:
+            engine.startSession(rate, bool(hold), BUTTON_NAMES[button], clickPos, batchSize, None, None, maxClicks or None, maxDuration or None, bool(burst))
+        elif (rate, clickPos) != settings:
+            engine.reconfigure(rate, clickPos)
+        sessionSeq, settings, running = newSessionSeq, (rate, clickPos), bool(wantRunning)
+
+        if newExportSeq != exportSeq:
+            try:
+                engine.exportStats(exportPath.rstrip(b"\0").decode())
+            except OSError as e:
+                print(f"Couldn't export stats: {e}")
+            exportSeq = newExportSeq
+        # A session that reached its limit has ended even though the controller still wants it running
+        _publishStatus(block, engine, sessionSeq, exportSeq, running and not engine.waitIdle(0))
+
+    engine.shutdown()
+    engine.join()
+    del block
+    memory.close()
+
+
+def _publishStatus(block: ControlBlock, engine, sessionSeq: int, exportSeq: int, active: bool) -> None:
+    stats: dict = engine.getStats()
+    if not stats:
+        block.writeStatus(sessionSeq, exportSeq, active, 0, 0.0, 0.0, 0.0, 0.0, 0.0, 0, 0, 0, 0, 0, os.getpid(), 0, 0, False)
+        return
+    telemetry: dict = stats["telemetry"]
+    lateness: dict = telemetry["latenessNs"]
+    block.writeStatus(
+        sessionSeq, exportSeq, active, stats["ticks"], stats["targetRate"], stats["achievedRate"], telemetry["cps1s"], telemetry["cps10s"],
+        lateness["mean"], lateness["count"], lateness["p50"], lateness["p99"], lateness["p999"], lateness["max"], os.getpid(),
+        stats["clicks"], stats["events"], stats["finished"],
+    )
+
+
+class ProcessClicker:
+    def __init__(self, backendName: str = None) -> None:
+        # Runs the click engine in its own process, so its timing doesn't share a GIL with the window, the tray icon
+        # or the hotkey hooks. Spawned rather than forked so every platform starts the same clean interpreter.
+        context = multiprocessing.get_context("spawn")
+        self._memory = shared_memory.SharedMemory(create=True, size=BLOCK_SIZE)
+        self._block: ControlBlock = ControlBlock(self._memory.buf)
+        self._wakeup = context.Event()
+        self._lock: Lock = Lock()
+
+        self._sessionSeq: int = 0
+        self._exportSeq: int = 0
+        self._exportPath: str = ""
+        self._state: list = [False, False, False, BUTTON_CODES["left"], False, 1.0, 0, 0, 1, 0, 0.0]
+        self._publish()
+
+        self._process = context.Process(target=runEngine, args=(self._memory.name, backendName, self._wakeup), name="ClickEngine", daemon=True)
+        self._process.start()
+
+    def _publish(self, shutdown: bool = False) -> None:
+        running, hold, hasPos, button, burst, rate, x, y, batchSize, maxClicks, maxDuration = self._state
+        self._block.writeControl(self._sessionSeq, self._exportSeq, running, hold, hasPos, shutdown, button, burst, rate, x, y, batchSize, maxClicks, maxDuration, self._exportPath.encode())
+        self._wakeup.set()
+
+    def startClicking(self, interval: float, clickButton: str, clickPos: tuple = None, hold: bool = False, batchSize: int = 1, jitter=None, path=None, maxClicks: int = None, maxDuration: float = None, burst: bool = False):
+        if interval <= 0:
+            raise ValueError("Rate must be positive")
+        if maxClicks is not None and maxClicks < 1:
+            raise ValueError("Click limit must be at least 1")
+        if maxDuration is not None and maxDuration <= 0:
+            raise ValueError("Duration must be positive")
+        if jitter is not None:
+            raise ValueError("Jitter isn't supported by the engine process yet")
+        if path is not None:
+            # The control block only has room for one position
+            raise ValueError("Paths can't be clicked by the engine process yet")
+        with self._lock:
+            self._sessionSeq += 1
+            x, y = clickPos if clickPos is not None else (0, 0)
+            self._state = [True, hold, clickPos is not None, BUTTON_CODES[clickButton], burst, interval, x, y, batchSize, maxClicks or 0, maxDuration or 0.0]
+            self._publish()
+
+    def stopClicking(self):
+        with self._lock:
+            self._state[0] = False
+            self._publish()
+
+    def reconfigure(self, interval: float, clickPos: tuple = None):
+        if interval <= 0:
+            raise ValueError("Rate must be positive")
+        with self._lock:
+            x, y = clickPos if clickPos is not None else (0, 0)
+            self._state[2] = clickPos is not None
+            self._state[5:8] = [interval, x, y]
+            self._publish()
+
+    def waitUntilStopped(self, timeout: float = None) -> bool:
+        deadline: float = time.monotonic() + (timeout if timeout is not None else float("inf"))
+        while True:
+            sessionSeq, exportSeq, active = self._block.readStatus()[:3]
+            # A session that hit its limit counts as stopped even though stopClicking() was never called
+            if sessionSeq == self._sessionSeq and not active:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.001)
+
+    def getStats(self) -> dict:
+        sessionSeq, exportSeq, active, ticks, targetRate, achievedRate, cps1s, cps10s, mean, count, p50, p99, p999, maximum, pid, clicks, events, finished = self._block.readStatus()
+        if not ticks:
+            return {}
+        lateness: dict = {"count": count, "mean": mean, "p50": p50, "p99": p99, "p999": p999, "max": maximum}
+        return {
+            "targetRate": targetRate,
+            "achievedRate": achievedRate,
+            "ticks": ticks,
+            "clicks": clicks,
+            "finished": bool(finished),
+            "events": events,
+            "meanLatenessNs": mean,
+            "maxLatenessNs": maximum,
+            "p50LatenessNs": p50,
+            "p99LatenessNs": p99,
+            "p999LatenessNs": p999,
+            "telemetry": {"latenessNs": lateness, "cps1s": cps1s, "cps10s": cps10s},
+            "enginePid": pid,
+        }
+
+    def exportStats(self, path: str, timeout: float = 5.0):
+        # The histograms live in the engine process, so it writes the file itself
+        path = os.path.abspath(path)
+        if len(path.encode()) >= 1024:
+            raise ValueError("Export path is too long")
+        with self._lock:
+            self._exportSeq += 1
+            self._exportPath = path
+            self._publish()
+            exportSeq: int = self._exportSeq
+        deadline: float = time.monotonic() + timeout
+        while self._block.readStatus()[1] != exportSeq and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def close(self):
+        with self._lock:
+            self._state[0] = False
+            self._publish(shutdown=True)
+        self._process.join(2)
+        if self._process.is_alive():
+            self._process.terminate()
+        del self._block
+        self._memory.close()
+        self._memory.unlink()
@@ -1,51 +1,211 @@
-from threading import Thread
-from typing import Dict
-import keyboard
+from threading import Lock
 import time
+from typing import Dict, List
+import keyboard
+
+MODIFIERS: Dict[str, str] = {
+    "ctrl": "ctrl", "left ctrl": "ctrl", "right ctrl": "ctrl",
+    "shift": "shift", "left shift": "shift", "right shift": "shift",
+    "alt": "alt", "left alt": "alt", "right alt": "alt", "alt gr": "alt",
+    "windows": "windows", "left windows": "windows", "right windows": "windows",
+}
+MODIFIER_KEYS: frozenset = frozenset(MODIFIERS.values())
+
+# Time allowed between the steps of a chord like "ctrl+k, ctrl+c"
+CHORD_TIMEOUT_NS: int = 1_000_000_000
+
+
+def normalizeKey(name: str) -> str:
+    name = name.strip().lower()
+    return MODIFIERS.get(name, name)
+
+
+class HotkeyStep:
+    __slots__ = ("key", "modifiers")
+
+    def __init__(self, key: str, modifiers: frozenset) -> None:
+        self.key: str = key
+        self.modifiers: frozenset = modifiers
+
+
+def parseHotkey(hotkey: str) -> List[HotkeyStep]:
+    steps: List[HotkeyStep] = []
+    for part in hotkey.split(","):
+        keys: List[str] = [normalizeKey(key) for key in part.split("+")]
+        if "" in keys:
+            raise ValueError(f"Invalid hotkey '{hotkey}'")
+        steps.append(HotkeyStep(keys[-1], frozenset(keys[:-1])))
+    return steps
+
+
+class Hotkey:
+    def __init__(self, hotkey: str, pressFunc, releaseFunc=None, requireToggle: bool = False) -> None:
+        self.hotkey: str = hotkey
+        self.steps: List[HotkeyStep] = parseHotkey(hotkey)
+        self.pressFunc = pressFunc
+        self.releaseFunc = releaseFunc
+        self.requireToggle: bool = requireToggle
+
+        # Chord progress: index of the next expected step and when the previous one matched
+        self.progress: int = 0
+        self.progressNs: int = 0
+        self.active: bool = False
+
+
+class HotkeyDispatcher:
+    def __init__(self, installHook: bool = True) -> None:
+        self._installHook: bool = installHook
+        self._hook = None
+        self._lock: Lock = Lock()
+        self._hotkeys: Dict[str, Hotkey] = {}
+        self._table: Dict[str, List[Hotkey]] = {}
+        self._compiled: tuple = ()
+        self._listeners: list = []
+        self._pressed: set = set()
+        self._modifiers: frozenset = frozenset()
 
+        # Dispatch latency from receiving an event to calling its callback
+        self._dispatches: int = 0
+        self._totalLatencyNs: int = 0
+        self._maxLatencyNs: int = 0
 
-class HotkeyThead(Thread):
-    def __init__(self, hotkey: str, hotkeyFunc, requireToggle: bool = False, *args, **kwargs) -> None:
-        super().__init__(*args, **kwargs)
-        self._key: str = hotkey
-        self._hotkeyFunc = hotkeyFunc
-        self._pressed: bool = False
-        self._lastKey: str = ""
-        self._holding: bool = False
-        self._requireToggle = requireToggle
-        self._running = True
+    def _updateHook(self) -> None:
+        if self._installHook and self._hook is None and (self._hotkeys or self._listeners):
+            self._hook = keyboard.hook(self._onKeyboardEvent)
+        elif self._hook is not None and not self._hotkeys and not self._listeners:
+            keyboard.unhook(self._hook)
+            self._hook = None
 
-    def isBeingPressed(self):
-        return self._pressed
+    def add(self, hotkey: Hotkey) -> None:
+        with self._lock:
+            self._hotkeys[hotkey.hotkey] = hotkey
+            self._compile()
+        self._updateHook()
 
-    def stop(self):
-        self._running = False
+    def remove(self, hotkey: str) -> None:
+        with self._lock:
+            self._hotkeys.pop(hotkey, None)
+            self._compile()
+        self._updateHook()
 
-    def run(self) -> None:
-        while self._running:
-            time.sleep(1 / 20)
-            self._pressed = keyboard.is_pressed(self._key)
-            if self._pressed:
-                if not self._requireToggle or self._lastKey != self._key:
-                    self._hotkeyFunc()
-                    self._lastKey = self._key
-            else:
-                self._lastKey = ""
+    def addListener(self, listenerFunc) -> None:
+        # Listeners see every raw key event as (name, scanCode, down, receivedNs) through the same hook
+        self._listeners = self._listeners + [listenerFunc]
+        self._updateHook()
+
+    def removeListener(self, listenerFunc) -> None:
+        self._listeners = [listener for listener in self._listeners if listener is not listenerFunc]
+        self._updateHook()
+
+    def _compile(self) -> None:
+        # Every step's key points at the hotkeys that might advance on it, so an event is a single dict lookup
+        table: Dict[str, List[Hotkey]] = {}
+        for hotkey in self._hotkeys.values():
+            for step in hotkey.steps:
+                bound: List[Hotkey] = table.setdefault(step.key, [])
+                if hotkey not in bound:
+                    bound.append(hotkey)
+        self._table = table
+        self._compiled = tuple(self._hotkeys.values())
+
+    def _onKeyboardEvent(self, event) -> None:
+        receivedNs: int = time.perf_counter_ns()
+        down: bool = event.event_type == keyboard.KEY_DOWN
+        for listener in self._listeners:
+            listener(event.name, event.scan_code, down, receivedNs)
+        if event.name is None:
+            return
+        self.feed(event.name, down, receivedNs)
+
+    def feed(self, name: str, down: bool, receivedNs: int = None) -> None:
+        if receivedNs is None:
+            receivedNs = time.perf_counter_ns()
+        key: str = normalizeKey(name)
+
+        repeat: bool = down and key in self._pressed
+        if down:
+            self._pressed.add(key)
+        else:
+            self._pressed.discard(key)
+
+        if key in MODIFIER_KEYS:
+            self._modifiers = frozenset(self._pressed)
+            # Modifiers are chord state, unless a hotkey ends on one, like "shift" or "ctrl+alt". Then the
+            # modifiers held along with it are the others.
+            if key not in self._table:
+                return
+            modifiers: frozenset = self._modifiers - {key}
+        else:
+            modifiers = self._modifiers
+            # Any other key breaks chords that were waiting for their next step
+            if down and not repeat:
+                for hotkey in self._compiled:
+                    if hotkey.progress and hotkey.steps[hotkey.progress].key != key:
+                        hotkey.progress = 0
+
+        for hotkey in self._table.get(key, ()):
+            if down:
+                self._onDown(hotkey, key, modifiers, repeat, receivedNs)
+            elif hotkey.active and hotkey.steps[-1].key == key:
+                hotkey.active = False
+                if hotkey.releaseFunc is not None:
+                    self._call(hotkey.releaseFunc, receivedNs)
+
+    def _onDown(self, hotkey: Hotkey, key: str, modifiers: frozenset, repeat: bool, receivedNs: int) -> None:
+        if repeat:
+            # Key repeats only re-trigger hotkeys that don't require a fresh press
+            if hotkey.active and not hotkey.requireToggle:
+                self._call(hotkey.pressFunc, receivedNs)
+            return
+
+        if hotkey.progress and receivedNs - hotkey.progressNs > CHORD_TIMEOUT_NS:
+            hotkey.progress = 0
+        step: HotkeyStep = hotkey.steps[hotkey.progress]
+        if step.key != key or step.modifiers != modifiers:
+            step = hotkey.steps[0]
+            hotkey.progress = 0
+            if step.key != key or step.modifiers != modifiers:
+                return
+
+        hotkey.progress += 1
+        hotkey.progressNs = receivedNs
+        if hotkey.progress == len(hotkey.steps):
+            hotkey.progress = 0
+            hotkey.active = True
+            self._call(hotkey.pressFunc, receivedNs)
+
+    def _call(self, func, receivedNs: int) -> None:
+        latency: int = time.perf_counter_ns() - receivedNs
+        self._dispatches += 1
+        self._totalLatencyNs += latency
+        if latency > self._maxLatencyNs:
+            self._maxLatencyNs = latency
+        func()
+
+    def getLatencyStats(self) -> dict:
+        return {
+            "dispatches": self._dispatches,
+            "meanLatencyNs": self._totalLatencyNs / self._dispatches if self._dispatches else 0.0,
+            "maxLatencyNs": self._maxLatencyNs,
+        }
 
 
 class HotkeyHandler:
-    def __init__(self) -> None:
-        self._keys: Dict[str, HotkeyThead] = {}
-    
-    def startListeningToKey(self, key: str, pressFunc, requireToggle: bool = False):
+    def __init__(self, dispatcher: HotkeyDispatcher = None) -> None:
+        self._dispatcher: HotkeyDispatcher = dispatcher if dispatcher is not None else HotkeyDispatcher()
+        self._keys: Dict[str, Hotkey] = {}
+
+    def startListeningToKey(self, key: str, pressFunc, requireToggle: bool = False, releaseFunc=None):
         self.stopListeningToKey(key)
-        
-        keyThread = HotkeyThead(key, pressFunc, requireToggle, daemon=True)
-        keyThread.start()
-        self._keys[key] = keyThread
+
+        hotkey = Hotkey(key, pressFunc, releaseFunc, requireToggle)
+        self._dispatcher.add(hotkey)
+        self._keys[key] = hotkey
 
     def stopListeningToKey(self, key: str):
         if key in self._keys.keys():
-            thread: HotkeyThead = self._keys[key]
-            thread.stop()
+            self._dispatcher.remove(key)
             self._keys.pop(key)
+
+    def getLatencyStats(self) -> dict:
+        return self._dispatcher.getLatencyStats()
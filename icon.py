@@ -1,44 +1,76 @@
-
 from threading import Thread
 import tkinter as tk
 import PIL
-from pystray import MenuItem as item
-from pystray import Menu
-import pystray
 from PIL import Image
 
+ICON_PATH: str = "icon.ico"
+
+_iconImage: Image.Image = None
+
+
+def loadIcon() -> Image.Image:
+    # The icon is decoded once and shared by the window and the tray
+    global _iconImage
+    if _iconImage is None:
+        try:
+            image = Image.open(ICON_PATH)
+            image.load()
+            _iconImage = image
+        except FileNotFoundError:
+            print("Could not find icon")
+        except PIL.UnidentifiedImageError:
+            print("Could not identify image")
+    return _iconImage
+
 
 class Icon:
-    def __init__(self, tkWindow, hideCommand=None, showCommand=None) -> None:
+    def __init__(self, tkWindow, hideCommand=None, showCommand=None, profilesFunc=None, switchProfileFunc=None, activeProfileFunc=None, postFunc=None) -> None:
         self._tk: tk.Tk = tkWindow
         self._tk.protocol('WM_DELETE_WINDOW', self._hideWindow)
+        # Menu callbacks run on pystray's thread, so whatever touches the window is handed to the Tk thread
+        self._post = postFunc if postFunc is not None else lambda func: self._tk.after(0, func)
 
         self._hideCommand = hideCommand
         self._showCommand = showCommand
 
+        # Optional profile switching from the tray menu
+        self._profilesFunc = profilesFunc
+        self._switchProfileFunc = switchProfileFunc
+        self._activeProfileFunc = activeProfileFunc
+
         self._title = "Auto Clicker"
-        try:
-            self._image = Image.open("icon.ico")
-        except FileNotFoundError:
-            print("Could not find icon")
-        except PIL.UnidentifiedImageError:
-            print("Could not identify image")
-        self._menu = Menu(
-            item('Show', self._showWindow),
-            item('Quit', self._quitWindow)
-        )
+        self._image = loadIcon()
+        self._menu = None
+        self._icon = None
 
     def _quitWindow(self):
-        self._tk.destroy()
         self._icon.stop()
+        self._post(self._tk.destroy)
 
     def _showWindow(self):
         self._icon.stop()
-        self._tk.after(0, self._tk.deiconify())
+        self._post(self._tk.deiconify)
         if self._showCommand is not None:
-            self._showCommand()
+            self._post(self._showCommand)
+
+    def _profileItem(self, name: str):
+        from pystray import MenuItem as item
+        return item(name, lambda: self._switchProfileFunc(name), checked=lambda menuItem: name == self._activeProfileFunc(), radio=True)
 
     def _hideWindow(self):
+        # pystray is only needed once the window goes to the tray, so it stays out of startup
+        import pystray
+        from pystray import Menu
+        from pystray import MenuItem as item
+
+        if self._menu is None:
+            items: list = [item('Show', self._showWindow)]
+            if self._profilesFunc is not None:
+                # Built each time the menu opens, so it always lists the profiles currently loaded
+                items.append(item('Profiles', Menu(lambda: [self._profileItem(name) for name in self._profilesFunc()])))
+            items.append(item('Quit', self._quitWindow))
+            self._menu = Menu(*items)
+
         self._tk.withdraw()
         self._icon = pystray.Icon("name", self._image, self._title, self._menu)
         Thread(target=self._icon.run, daemon=True).start()
@@ -1,18 +1,21 @@
 import os
-from threading import Thread
+from threading import RLock
 import tkinter as tk
-from tkinter import DISABLED, TclError, ttk
+from tkinter import DISABLED, TclError, filedialog, ttk
 import tkinter
 from tkinter.font import NORMAL
 
-import PIL
+from PIL import ImageTk
 
 from clicker import MousePosThread
+from commandbus import CommandBus
 from hotkey import HotkeyHandler
+from icon import loadIcon
+from profiles import Profile, ProfileStore, ProfileWatcher, parseProfile
 
 
 class NumberEntry(ttk.Entry):
-    def __init__(self, master=None, tkVariable: tk.Variable = None, min: int = None, max: int = None, *args, **kwargs):
+    def __init__(self, master=None, tkVariable: tk.Variable = None, min: int = None, max: int = None, decimal: bool = False, *args, **kwargs):
         if tkVariable is None:
             self._var: tk.Variable = tk.StringVar(0)
         else:
@@ -23,10 +26,16 @@ class NumberEntry(ttk.Entry):
         self._var.trace('w', lambda a, b, c: self._check())
         self._min: int = min
         self._max: int = max
+        self._decimal: bool = decimal
+
+    def _isNumber(self, value: str) -> bool:
+        if self._decimal and value.count(".") == 1:
+            value = value.replace(".", "")
+        return value.isnumeric()
 
     def _check(self):
-        if self._var.get().isnumeric():
-            num: int = int(self._var.get())
+        if self._isNumber(self._var.get()):
+            num: float = float(self._var.get()) if self._decimal else int(self._var.get())
             if self._min is not None and num < self._min:
                 self._var.set(self._min)
             elif self._max is not None and num > self._max:
@@ -39,7 +48,7 @@ class NumberEntry(ttk.Entry):
             self._var.set(self._old_value)
 
 
-class CharacterEntry(ttk.Entry):
+class HotkeyEntry(ttk.Entry):
     def __init__(self, master=None, tkVariable: tk.Variable = None, *args, **kwargs):
         if tkVariable is None:
             self._var: tk.Variable = tk.StringVar()
@@ -50,25 +59,28 @@ class CharacterEntry(ttk.Entry):
         self._var.trace('w', lambda a, b, c: self._check())
 
     def _check(self):
-        if len(self._var.get()) > 1:
-            self._var.set(self._var.get()[len(self._var.get()) - 1])
+        # Hotkeys are single keys, combos like "ctrl+g" or chords like "ctrl+k, g"
+        if self._var.get() != self._var.get().lower():
+            self._var.set(self._var.get().lower())
 
 
 class GUI:
-    def __init__(self, startClickingFunc, stopClickingFunc) -> None:
+    def __init__(self, startClickingFunc, stopClickingFunc, statsFunc=None, exportStatsFunc=None, profileStore: ProfileStore = None) -> None:
         self._tk = tk.Tk()
-        try:
-            self._tk.iconbitmap("icon.ico")
-        except tk.TclError:
-            print("Could not load icon.ico")
-        except PIL.UnidentifiedImageError:
-            print("Could not identify image")
+        self._iconPhoto: ImageTk.PhotoImage = None
+        icon = loadIcon()
+        if icon is not None:
+            self._iconPhoto = ImageTk.PhotoImage(icon)
+            self._tk.iconphoto(True, self._iconPhoto)
 
         self._tk.title("Auto Clicker")
         self._tk.minsize(650, 0)
         self._tk.resizable(False, False)
         self._tk.bind_all("<Button-1>", lambda event: event.widget.focus_set())
 
+        # Everything other threads want done to the window goes through here, Tk is only touched on its own thread
+        self._bus: CommandBus = CommandBus(self._tk)
+
         # Tk elements
         self._startButton: ttk.Button = None
         self._stopButton: ttk.Button = None
@@ -102,30 +114,79 @@ class GUI:
         self._clickXVar.set("0")
         self._clickYVar.set("0")
 
+        # Limits, 0 means no limit
+        self._maxClicksVar = tk.StringVar()
+        self._maxClicksVar.set("0")
+        self._maxDurationVar = tk.StringVar()
+        self._maxDurationVar.set("0")
+        self._burstVar = tk.BooleanVar()
+        self._burstVar.set(False)
+
+        # Click path, loaded from a file and walked by the engine as precomputed columns
+        self._clickPath = None
+        self._pathVarText = tk.StringVar()
+        self._pathVarText.set("No path loaded")
+
         # Hotkeys
         self._startHotkey: str = ""
         self._stopHotkey: str = ""
         self._toggleHotkey: str = ""
 
+        # Profiles, all parsed up front so switching to one is only swapping _activeProfile
+        self._profileStore: ProfileStore = profileStore
+        self._activeProfile: Profile = None
+        self._profileVar = tk.StringVar()
+        self._switchkeyVar = tk.StringVar()
+        self._switchHotkeys: list = []
+        self._profileBox: ttk.Combobox = None
+        self._profileWatcher: ProfileWatcher = None
+
         # Functions
         self._startClickingFunc = startClickingFunc
         self._stopClickingFunc = stopClickingFunc
+        self._statsFunc = statsFunc
+        self._exportStatsFunc = exportStatsFunc
+
+        # Click statistics
+        self._statsVarText = tk.StringVar()
+        self._statsVarText.set("Achieved: - CPS")
+        self._statsUpdate: str = None
 
         # Mouse position
         self._mousePosVarText = tk.StringVar()
         self._mousePosVarText.set("Position: ?, ?")
-        self._mousePosThread: MousePosThread = MousePosThread(lambda x, y: self._mousePosVarText.set(f"Position: {x}, {y}"), daemon=True)
+        self._mousePosThread: MousePosThread = MousePosThread(lambda x, y: self._mousePosVarText.set(f"Position: {x}, {y}"), scheduleFunc=self._bus.post, daemon=True)
         self._mousePosThread.pause()
         self._mousePosThread.start()
         # Clicking related
         self._clicking: bool = False
+        # Hotkey threads and the Tk thread start and stop clicking; the flag and the engine call change together under
+        # this lock, so two callers can't both pass the check. Reentrant because toggling starts or stops under it.
+        self._clickingLock: RLock = RLock()
+        # (args, kwargs) for startClickingFunc, rebuilt on the Tk thread whenever a setting changes, so a hotkey
+        # starts the engine without reading a single Tk variable. None while the settings can't be clicked.
+        self._startArgs: tuple = None
+        # The window's limits, burst and path, captured with _startArgs; a profile switch keeps them
+        self._sessionOptions: dict = {}
+        for variable in (self._intervalVar, self._cpsVar, self._timeFormatVar, self._clickButtonVar, self._clickActionVar, self._clickposVar,
+                         self._clickXVar, self._clickYVar, self._maxClicksVar, self._maxDurationVar, self._burstVar):
+            variable.trace_add("write", lambda *args: self._captureSettings())
 
         # Hotkeys
         self._hotkeyHandler = HotkeyHandler()
 
         self._createGUI()
+        self._captureSettings()
         self._restartHotkeys()
 
+        if self._profileStore is not None:
+            self._refreshProfiles()
+            if self._profileStore.active is not None:
+                self.switchProfile(self._profileStore.active)
+            # Edits to the profile file are picked up while the program runs
+            self._profileWatcher = ProfileWatcher(self._profileStore.path, lambda: self._bus.post(self._reloadProfiles), daemon=True)
+            self._profileWatcher.start()
+
     def _createGUI(self):
         try:
             self._tk.call("source", os.path.join("themes", "azure", "azure.tcl"))
@@ -142,6 +203,21 @@ class GUI:
         mainFrame = ttk.Frame(self._tk)
         mainFrame.pack(pady=framePadding, padx=20, fill=tk.X)
 
+        # Profile settings
+        if self._profileStore is not None:
+            profileLabelFrame: ttk.Labelframe = ttk.Labelframe(mainFrame, text="Profile")
+            profileLabelFrame.pack(fill=tk.X, pady=(0, framePadding))
+            profileFrame: ttk.Frame = ttk.Frame(profileLabelFrame)
+            profileFrame.pack(padx=frameInnerPadding, pady=frameInnerPadding, fill=tk.X)
+
+            self._profileBox = ttk.Combobox(profileFrame, textvariable=self._profileVar, width=20)
+            self._profileBox.bind("<<ComboboxSelected>>", lambda event: self.switchProfile(self._profileVar.get()))
+            self._profileBox.pack(side=tk.LEFT)
+            ttk.Label(profileFrame, text="Switch Key").pack(side=tk.LEFT, padx=(10, 5))
+            HotkeyEntry(profileFrame, self._switchkeyVar, width=10).pack(side=tk.LEFT)
+            ttk.Button(profileFrame, text="Delete", command=self._deleteProfile).pack(side=tk.RIGHT)
+            ttk.Button(profileFrame, style="Accent.TButton", text="Save", command=self._saveProfile).pack(side=tk.RIGHT, padx=(0, 5))
+
         # Interval settings
         intervalLabelFrame: ttk.Labelframe = ttk.Labelframe(mainFrame, text="Click Interval")
         intervalLabelFrame.pack(fill=tk.X, pady=(0, framePadding))
@@ -156,11 +232,11 @@ class GUI:
 
         msFrame = ttk.Frame(timeFrame)
         ttk.Label(msFrame, text="Click Interval (ms)").pack(anchor=tk.W)
-        NumberEntry(msFrame, self._intervalVar, 1).pack()
+        NumberEntry(msFrame, self._intervalVar, 0, decimal=True).pack()
         cpsFrame = ttk.Frame(timeFrame)
         cpsFrame.pack()
         ttk.Label(cpsFrame, text="Clicks Per Second").pack(anchor=tk.W)
-        NumberEntry(cpsFrame, self._cpsVar, 1).pack()
+        NumberEntry(cpsFrame, self._cpsVar, 0, decimal=True).pack()
 
         def showMS():
             msFrame.pack()
@@ -174,6 +250,18 @@ class GUI:
         ttk.Radiobutton(timeFormatFrame, text="Clicks per second", variable=self._timeFormatVar, value="cps", command=showCPS).pack(anchor=tk.W)
         ttk.Radiobutton(timeFormatFrame, text="Milliseconds", variable=self._timeFormatVar, value="ms", command=showMS).pack(anchor=tk.W)
 
+        # Limit settings
+        limitLabelFrame: ttk.Labelframe = ttk.Labelframe(mainFrame, text="Limits")
+        limitLabelFrame.pack(fill=tk.X, pady=(0, framePadding))
+        limitFrame: ttk.Frame = ttk.Frame(limitLabelFrame)
+        limitFrame.pack(padx=frameInnerPadding, pady=frameInnerPadding)
+
+        ttk.Label(limitFrame, text="Stop after clicks (0 = never)").grid(row=0, column=0, sticky=tk.W, padx=(0, 10))
+        NumberEntry(limitFrame, self._maxClicksVar, 0).grid(row=1, column=0, sticky=tk.W, padx=(0, 10))
+        ttk.Label(limitFrame, text="Stop after seconds (0 = never)").grid(row=0, column=1, sticky=tk.W, padx=10)
+        NumberEntry(limitFrame, self._maxDurationVar, 0, decimal=True).grid(row=1, column=1, sticky=tk.W, padx=10)
+        ttk.Checkbutton(limitFrame, text="Burst at full speed", variable=self._burstVar).grid(row=1, column=2, sticky=tk.W, padx=(10, 0))
+
         rowFrame1: ttk.Frame = ttk.Frame(mainFrame)
         #rowFrame1.columnconfigure(0, weight=1)
         #rowFrame1.columnconfigure(1, weight=1)
@@ -187,11 +275,11 @@ class GUI:
         hotkeyFrame.pack(padx=frameInnerPadding, pady=frameInnerPadding)
 
         ttk.Label(hotkeyFrame, text="Start Key").pack(anchor=tk.W)
-        CharacterEntry(hotkeyFrame, self._startkeyVar).pack(pady=(0, 10))
+        HotkeyEntry(hotkeyFrame, self._startkeyVar).pack(pady=(0, 10))
         ttk.Label(hotkeyFrame, text="Stop Key").pack(anchor=tk.W)
-        CharacterEntry(hotkeyFrame, self._stopkeyVar).pack(pady=(0, 10))
+        HotkeyEntry(hotkeyFrame, self._stopkeyVar).pack(pady=(0, 10))
         ttk.Label(hotkeyFrame, text="Toggle Key").pack(anchor=tk.W)
-        CharacterEntry(hotkeyFrame, self._togglekeyVar).pack(pady=(0, 10))
+        HotkeyEntry(hotkeyFrame, self._togglekeyVar).pack(pady=(0, 10))
         ttk.Button(hotkeyFrame, text="Assign Hotkeys", command=self._restartHotkeys).pack()
 
         # Click button settings
@@ -236,11 +324,19 @@ class GUI:
         def changeToPick():
             mouseX.config(state=tk.NORMAL)
             mouseY.config(state=tk.NORMAL)
+            loadPathButton.config(state=tk.DISABLED)
             self._startUpdatingMousePos()
 
         def changeToCurrent():
             mouseX.config(state=tk.DISABLED)
             mouseY.config(state=tk.DISABLED)
+            loadPathButton.config(state=tk.DISABLED)
+            self._stopUpdatingMousePos()
+
+        def changeToPath():
+            mouseX.config(state=tk.DISABLED)
+            mouseY.config(state=tk.DISABLED)
+            loadPathButton.config(state=tk.NORMAL)
             self._stopUpdatingMousePos()
 
         clickPositionLabelFrame: ttk.Frame = ttk.Labelframe(rowFrame1, text="Mouse Position Settings")
@@ -250,6 +346,7 @@ class GUI:
         ttk.Label(clickPositionFrame, text="Mouse Position").pack(anchor=tk.W)
         ttk.Radiobutton(clickPositionFrame, text="Use Current Position", variable=self._clickposVar, value="current", command=changeToCurrent).pack(anchor=tk.W)
         ttk.Radiobutton(clickPositionFrame, text="Pick a Position", variable=self._clickposVar, value="pick", command=changeToPick).pack(anchor=tk.W)
+        ttk.Radiobutton(clickPositionFrame, text="Follow a Path", variable=self._clickposVar, value="path", command=changeToPath).pack(anchor=tk.W)
 
         positionLabel = ttk.Label(clickPositionFrame, textvariable=self._mousePosVarText, state=tk.DISABLED)
         positionLabel.pack(anchor=tk.W, pady=10)
@@ -257,13 +354,27 @@ class GUI:
         mouseX = NumberEntry(clickPositionFrame, self._clickXVar, 0, state=tk.DISABLED)
         mouseY = NumberEntry(clickPositionFrame, self._clickYVar, 0, state=tk.DISABLED)
 
+        def syncWidgets():
+            # Shows and enables the widgets that match the settings after they were set from a profile
+            showCPS() if self._timeFormatVar.get() == "cps" else showMS()
+            changeToHold() if self._isHolding() else changeToClick()
+            if self._clickposVar.get() == "current":
+                changeToCurrent()
+            elif self._clickposVar.get() == "path":
+                changeToPath()
+            else:
+                changeToPick()
+
+        self._syncWidgets = syncWidgets
+
         ttk.Label(clickPositionFrame, text="Mouse X").pack(anchor=tk.W)
         mouseX.pack()
         ttk.Label(clickPositionFrame, text="Mouse Y").pack(anchor=tk.W)
         mouseY.pack()
 
-        # Save button
-        # ttk.Button(mainFrame, style="Accent.TButton",  text="Save", command=self._saveSettings).pack(pady=10)
+        loadPathButton = ttk.Button(clickPositionFrame, text="Load Path...", command=self._loadPath, state=tk.DISABLED)
+        loadPathButton.pack(anchor=tk.W, pady=(10, 0))
+        ttk.Label(clickPositionFrame, textvariable=self._pathVarText).pack(anchor=tk.W)
 
         # Other buttons
         buttonsFrame = ttk.Frame(mainFrame)
@@ -274,6 +385,14 @@ class GUI:
         self._startButton.pack(side=tk.LEFT)
         self._stopButton.pack(side=tk.RIGHT)
 
+        # Click statistics
+        if self._statsFunc is not None:
+            statsFrame = ttk.Frame(mainFrame)
+            statsFrame.pack(pady=(framePadding, 0), fill=tk.X)
+            ttk.Label(statsFrame, textvariable=self._statsVarText).pack(side=tk.LEFT)
+            if self._exportStatsFunc is not None:
+                ttk.Button(statsFrame, text="Export Stats", command=self._exportStats).pack(side=tk.RIGHT)
+
     @staticmethod
     def _cpsToInterval(cps: float):
         return 1.0 / cps
@@ -282,17 +401,20 @@ class GUI:
     def _intervalToCPS(interval: float):
         return 1000 / interval
 
-    def _getInterval(self) -> float:
+    def _parseInterval(self) -> float:
+        # None when the field doesn't hold a usable rate
         try:
             if self._timeFormatVar.get() == "cps":
                 interval: float = float(self._cpsVar.get())
-            elif self._timeFormatVar.get() == "ms":
+            else:
                 interval: float = self._intervalToCPS(float(self._intervalVar.get()))
-            if interval == 0:
-                interval = 1
-                self._intervalVar.set(1000)
-                self._cpsVar.set(1)
-        except ValueError:
+        except (ValueError, ZeroDivisionError):
+            return None
+        return interval if interval != 0 else None
+
+    def _getInterval(self) -> float:
+        interval: float = self._parseInterval()
+        if interval is None:
             interval = 1
             self._intervalVar.set(1000)
             self._cpsVar.set(1)
@@ -307,6 +429,50 @@ class GUI:
             return False
         return True
 
+    def _getLimits(self) -> dict:
+        # Only the limits that are set, so a start without any stays a plain startClicking call
+        limits: dict = {}
+        try:
+            maxClicks: int = int(self._maxClicksVar.get() or 0)
+            maxDuration: float = float(self._maxDurationVar.get() or 0)
+        except ValueError:
+            return limits
+        if maxClicks > 0:
+            limits["maxClicks"] = maxClicks
+        if maxDuration > 0:
+            limits["maxDuration"] = maxDuration
+        if self._burstVar.get():
+            limits["burst"] = True
+        return limits
+
+    def _captureSettings(self):
+        # The same fallback as _getInterval, without rewriting a field the user is still typing in
+        interval: float = self._parseInterval() or 1
+        options: dict = self._getLimits()
+        if self._clickposVar.get() == "path":
+            options["path"] = self._clickPath
+        self._sessionOptions = options
+        batchSize: int = self._activeProfile.batchSize if self._activeProfile is not None else 1
+        self._startArgs = self._buildStartArgs(interval, self._getClickButton(), self._getClickPos(), self._isHolding(), batchSize)
+
+    def _buildStartArgs(self, interval: float, clickButton: str, clickPos: tuple, hold: bool, batchSize: int = 1) -> tuple:
+        # (args, kwargs) for startClickingFunc from the click settings plus the captured session options, which
+        # only read plain attributes, so hotkey threads can call it. None if the path to follow isn't loaded.
+        kwargs: dict = dict(self._sessionOptions)
+        if "path" in kwargs:
+            # Holding or clicking a fixed position doesn't follow the path
+            if hold or clickPos is not None:
+                del kwargs["path"]
+            elif kwargs["path"] is None:
+                return None
+        if batchSize > 1:
+            kwargs["batchSize"] = batchSize
+        return ((interval, clickButton, clickPos, hold), kwargs)
+
+    def post(self, func, *args):
+        # For other threads, e.g. the tray icon's
+        self._bus.post(func, *args)
+
     def hide(self):
         self._stopUpdatingMousePos()
 
@@ -314,7 +480,7 @@ class GUI:
         self._startUpdatingMousePos()
 
     def _getClickPos(self) -> tuple:
-        if self._clickposVar.get() == "current":
+        if self._clickposVar.get() != "pick":
             return None
         try:
             x: int = int(self._clickXVar.get())
@@ -332,7 +498,10 @@ class GUI:
             if newHotkey != oldHotkey:
                 self._hotkeyHandler.stopListeningToKey(oldHotkey)
                 if newHotkey != "":
-                    self._hotkeyHandler.startListeningToKey(newHotkey, command, True)
+                    try:
+                        self._hotkeyHandler.startListeningToKey(newHotkey, command, True)
+                    except ValueError:
+                        print(f"Invalid hotkey '{newHotkey}'")
 
         startHotkey(self._startkeyVar.get(), self._startHotkey, self._startClicking)
         self._startHotkey = self._startkeyVar.get()
@@ -341,40 +510,220 @@ class GUI:
         startHotkey(self._togglekeyVar.get(), self._toggleHotkey, self._toggleClicking)
         self._toggleHotkey = self._togglekeyVar.get()
 
+    def getProfileNames(self) -> list:
+        return list(self._profileStore.profiles) if self._profileStore is not None else []
+
+    def getActiveProfile(self) -> str:
+        return self._activeProfile.name if self._activeProfile is not None else None
+
+    def switchProfile(self, name: str):
+        # Safe to call from hotkey and tray threads: the engine gets the prepared settings straight away and
+        # the window catches up on the Tk thread
+        profile: Profile = self._profileStore.profiles.get(name)
+        if profile is None:
+            return
+        self._activeProfile = profile
+        self._profileStore.active = name
+        with self._clickingLock:
+            if self._clicking:
+                # Restarted like the Start button does, so the window's limits, burst and path carry over
+                startArgs: tuple = self._buildStartArgs(*profile.startArgs)
+                if startArgs is None:
+                    print("Load a path first")
+                else:
+                    args, kwargs = startArgs
+                    try:
+                        self._startClickingFunc(*args, **kwargs)
+                    except ValueError as e:
+                        print(e)
+        self._bus.post(self._showProfile, profile)
+
+    def _showProfile(self, profile: Profile):
+        self._profileVar.set(profile.name)
+        self._switchkeyVar.set(profile.switchKey)
+        self._timeFormatVar.set(profile.timeFormat)
+        self._cpsVar.set(f"{profile.cps:g}")
+        self._intervalVar.set(f"{1000 / profile.cps:g}")
+        self._clickButtonVar.set(profile.button)
+        self._clickActionVar.set("hold" if profile.hold else "click")
+        if profile.clickPos is not None:
+            self._clickposVar.set("pick")
+        elif self._clickposVar.get() != "path":
+            self._clickposVar.set("current")
+        if profile.clickPos is not None:
+            self._clickXVar.set(str(profile.clickPos[0]))
+            self._clickYVar.set(str(profile.clickPos[1]))
+        self._startkeyVar.set(profile.startKey)
+        self._stopkeyVar.set(profile.stopKey)
+        self._togglekeyVar.set(profile.toggleKey)
+        self._syncWidgets()
+        self._restartHotkeys()
+
+    def _saveProfile(self):
+        name: str = self._profileVar.get().strip()
+        if name == "":
+            print("Profile needs a name")
+            return
+        clickPos: tuple = self._getClickPos()
+        data: dict = {
+            "cps": self._getInterval(),
+            "timeFormat": self._timeFormatVar.get(),
+            "button": self._getClickButton(),
+            "hold": self._isHolding(),
+            "position": list(clickPos) if clickPos is not None else None,
+            "batchSize": self._activeProfile.batchSize if self._activeProfile is not None else 1,
+            "startKey": self._startkeyVar.get(),
+            "stopKey": self._stopkeyVar.get(),
+            "toggleKey": self._togglekeyVar.get(),
+            "switchKey": self._switchkeyVar.get(),
+        }
+        try:
+            profile: Profile = parseProfile(name, data)
+        except ValueError as e:
+            print(e)
+            return
+        self._profileStore.put(profile)
+        self._profileStore.active = name
+        self._activeProfile = profile
+        try:
+            self._profileStore.save()
+        except OSError as e:
+            print(f"Could not save profiles: {e}")
+        self._refreshProfiles()
+
+    def _deleteProfile(self):
+        self._profileStore.remove(self._profileVar.get())
+        try:
+            self._profileStore.save()
+        except OSError as e:
+            print(f"Could not save profiles: {e}")
+        self._refreshProfiles()
+        if self._profileStore.active is not None:
+            self.switchProfile(self._profileStore.active)
+
+    def _reloadProfiles(self):
+        # Our own saves also trigger the watcher, those are skipped
+        if self._profileStore.isCurrent() or not self._profileStore.load():
+            return
+        self._refreshProfiles()
+        if self._profileStore.active is not None:
+            self.switchProfile(self._profileStore.active)
+
+    def _refreshProfiles(self):
+        self._profileBox.configure(values=self.getProfileNames())
+        for key in self._switchHotkeys:
+            self._hotkeyHandler.stopListeningToKey(key)
+        self._switchHotkeys = []
+        for profile in self._profileStore.profiles.values():
+            if profile.switchKey != "":
+                self._hotkeyHandler.startListeningToKey(profile.switchKey, lambda name=profile.name: self.switchProfile(name), True)
+                self._switchHotkeys.append(profile.switchKey)
+
     def _toggleClicking(self):
-        self._clicking = not self._clicking
-        if self._clicking:
-            self._startClicking()
-        else:
-            self._stopClicking()
+        with self._clickingLock:
+            if self._clicking:
+                self._stopClicking()
+            else:
+                self._startClicking()
 
     def _startUpdatingMousePos(self):
-        if self._clickposVar.get() != "current" and self._startButton.cget("state") != tk.DISABLED:
+        if self._clickposVar.get() == "pick" and self._startButton.cget("state") != tk.DISABLED:
             self._mousePosThread.unpause()
 
     def _stopUpdatingMousePos(self):
         self._mousePosThread.pause()
         self._mousePosVarText.set("Position: ?, ?")
 
-    def _stopClicking(self):
-        # self._restartHotkeys()
-        self._startButton.config(state=tk.NORMAL)
-        self._stopButton.config(state=tk.DISABLED)
-        self._stopClickingFunc()
+    def _updateStats(self, repeat: bool = True):
+        stats: dict = self._statsFunc()
+        if stats:
+            telemetry: dict = stats["telemetry"]
+            lateness: dict = telemetry["latenessNs"]
+            self._statsVarText.set(f"Achieved: {telemetry['cps1s']:.1f} CPS | Clicks: {stats['clicks']}, events: {stats['events']} | Lateness p50 {lateness['p50'] / 1e6:.2f} ms, p99 {lateness['p99'] / 1e6:.2f} ms, max {lateness['max'] / 1e6:.2f} ms")
+            if stats.get("finished") and self._clicking:
+                # The session hit its click or duration limit and ended by itself
+                self._stopClicking()
+                return
+        if repeat:
+            self._statsUpdate = self._tk.after(500, self._updateStats)
+
+    def _stopUpdatingStats(self):
+        if self._statsUpdate is not None:
+            self._tk.after_cancel(self._statsUpdate)
+            self._statsUpdate = None
+            self._updateStats(False)
+
+    def _exportStats(self):
+        path: str = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON", "*.json"), ("CSV", "*.csv")])
+        if path:
+            self._exportStatsFunc(path)
+
+    def _loadPath(self):
+        path: str = filedialog.askopenfilename(filetypes=[("Path", "*.txt"), ("All files", "*.*")])
+        if not path:
+            return
+        # NumPy is only loaded once a path is actually used
+        from paths import loadPath
+        try:
+            self._clickPath = loadPath(path)
+        except (OSError, ValueError) as e:
+            print(f"Couldn't load path: {e}")
+            return
+        self._pathVarText.set(f"{os.path.basename(path)}: {self._clickPath.clickCount()} points")
+        self._captureSettings()
 
-        self._startUpdatingMousePos()
+    def _stopClicking(self):
+        # Safe from any thread, like _startClicking
+        with self._clickingLock:
+            if not self._clicking:
+                return
+            self._clicking = False
+            self._stopClickingFunc()
+        self._bus.post(self._showStopped)
 
     def _startClicking(self):
-        # self._restartHotkeys()
-        # Makes sure that program isn't clicking already
-        print(self._startButton["state"], tk.NORMAL, self._startButton["state"] == tk.NORMAL)
-        if str(self._startButton["state"]) == tk.NORMAL:
-            self._startButton.config(state=tk.DISABLED)
-            self._stopButton.config(state=tk.NORMAL)
-
-            self._stopUpdatingMousePos()
+        # Called by the Start button and straight from hotkey threads. The engine gets the prepared settings right
+        # here; the window catches up once the Tk loop drains the command bus.
+        with self._clickingLock:
+            if self._clicking:
+                return
+            startArgs: tuple = self._startArgs
+            if startArgs is None:
+                print("Load a path first")
+                return
+            args, kwargs = startArgs
+            try:
+                self._startClickingFunc(*args, **kwargs)
+            except ValueError as e:
+                print(e)
+                return
+            self._clicking = True
+        self._bus.post(self._showClicking)
+
+    def _showClicking(self):
+        # Puts back a rate field that couldn't be read, the engine already fell back to 1 CPS
+        self._getInterval()
+        self._startButton.config(state=tk.DISABLED)
+        self._stopButton.config(state=tk.NORMAL)
+        self._stopUpdatingMousePos()
+        if self._statsFunc is not None and self._statsUpdate is None:
+            self._statsUpdate = self._tk.after(500, self._updateStats)
 
-            Thread(daemon=True, target=lambda: self._startClickingFunc(self._getInterval(), self._getClickButton(), self._getClickPos(), self._isHolding())).start()
+    def _showStopped(self):
+        self._startButton.config(state=tk.NORMAL)
+        self._stopButton.config(state=tk.DISABLED)
+        self._stopUpdatingStats()
+        self._startUpdatingMousePos()
 
     def mainloop(self):
-        self._tk.mainloop()
+        try:
+            self._tk.mainloop()
+        finally:
+            self._close()
+
+    def _close(self):
+        # The window is gone once the main loop returns, its helper threads go with it
+        if self._profileWatcher is not None:
+            self._profileWatcher.stop()
+            self._profileWatcher.join()
+        self._mousePosThread.stop()
@@ -0,0 +1,129 @@
+import math
+from queue import SimpleQueue
+from threading import Event, Lock, Thread
+from typing import List
+
+import numpy
+
+INTERVAL_DISTRIBUTIONS: tuple = ("normal", "lognormal", "uniform")
+POSITION_DISTRIBUTIONS: tuple = ("normal", "uniform")
+
+# Intervals never shrink below this fraction of the mean, so a wild sample can't produce a burst of clicks
+MIN_INTERVAL_FACTOR: float = 0.05
+
+
+def sampleIntervalFactors(rng: numpy.random.Generator, kind: str, spread: float, count: int) -> numpy.ndarray:
+    # Interval multipliers with a mean of 1 and a standard deviation of spread (the coefficient of variation)
+    if kind == "normal":
+        values = rng.normal(1.0, spread, count)
+    elif kind == "lognormal":
+        sigmaSquared: float = math.log1p(spread * spread)
+        values = rng.lognormal(-sigmaSquared / 2, math.sqrt(sigmaSquared), count)
+    else:
+        # Bounded uniform with the same standard deviation: half width is spread * sqrt(3)
+        halfWidth: float = spread * math.sqrt(3)
+        values = rng.uniform(1.0 - halfWidth, 1.0 + halfWidth, count)
+    return numpy.maximum(values, MIN_INTERVAL_FACTOR)
+
+
+def sampleOffsets(rng: numpy.random.Generator, kind: str, spread: float, count: int) -> numpy.ndarray:
+    # Whole pixel offsets around 0: spread is the standard deviation for normal and the maximum for uniform
+    if kind == "normal":
+        return numpy.rint(rng.normal(0.0, spread, count)).astype(numpy.int64)
+    limit: int = int(round(spread))
+    return rng.integers(-limit, limit, count, endpoint=True)
+
+
+class SampleRing:
+    def __init__(self, sampleFunc, blockSize: int = 4096) -> None:
+        # sampleFunc(count) returns a NumPy array. Blocks are stored as lists of Python numbers, so taking a sample
+        # in the click loop is a plain list index with no NumPy scalar boxing.
+        self._sampleFunc = sampleFunc
+        self._blockSize: int = blockSize
+        self._block: list = sampleFunc(blockSize).tolist()
+        self._index: int = 0
+
+        # The spare block is generated by the refill thread while the current one is consumed
+        self._spare: list = None
+        self._spareReady: Event = Event()
+        _requestRefill(self)
+
+    def take(self):
+        if self._index == self._blockSize:
+            # Only blocks if the refill thread fell a whole block behind
+            self._spareReady.wait()
+            # A refill that failed leaves no spare, then the block is generated here and any error is the caller's
+            self._block = self._spare if self._spare is not None else self._sampleFunc(self._blockSize).tolist()
+            self._spare = None
+            self._index = 0
+            _requestRefill(self)
+        value = self._block[self._index]
+        self._index += 1
+        return value
+
+    def _refill(self) -> None:
+        try:
+            self._spare = self._sampleFunc(self._blockSize).tolist()
+        finally:
+            self._spareReady.set()
+
+
+# One background thread refills the spare blocks of every ring
+_refillQueue: SimpleQueue = SimpleQueue()
+_refillLock: Lock = Lock()
+_refillThread: Thread = None
+
+
+def _refillLoop() -> None:
+    # A failing ring must not take the refills of every other ring down with it
+    while True:
+        try:
+            _refillQueue.get()._refill()
+        except Exception as e:
+            print(f"Couldn't refill jitter samples: {type(e).__name__}: {e}")
+
+
+def _requestRefill(ring: SampleRing) -> None:
+    global _refillThread
+    ring._spareReady.clear()
+    with _refillLock:
+        if _refillThread is None:
+            _refillThread = Thread(target=_refillLoop, name="JitterRefill", daemon=True)
+            _refillThread.start()
+    _refillQueue.put(ring)
+
+
+class Jitter:
+    def __init__(self, interval: str = "normal", intervalSpread: float = 0.1, position: str = "normal", positionSpread: float = 0.0, seed: int = None, blockSize: int = 4096) -> None:
+        if interval not in INTERVAL_DISTRIBUTIONS:
+            raise ValueError(f"Interval jitter must be one of {', '.join(INTERVAL_DISTRIBUTIONS)}")
+        if position not in POSITION_DISTRIBUTIONS:
+            raise ValueError(f"Position jitter must be one of {', '.join(POSITION_DISTRIBUTIONS)}")
+        if intervalSpread < 0 or positionSpread < 0:
+            raise ValueError("Jitter spread can't be negative")
+        if interval == "uniform" and intervalSpread * math.sqrt(3) >= 1:
+            raise ValueError("Uniform interval jitter needs a spread below 0.577")
+
+        self.interval: str = interval
+        self.intervalSpread: float = intervalSpread
+        self.position: str = position
+        self.positionSpread: float = positionSpread
+        # The same seed always gives the same intervals and offsets, no matter how fast they are consumed
+        self.seed: int = seed
+        self.blockSize: int = blockSize
+
+    def createRings(self) -> List[SampleRing]:
+        # Interval factors, x offsets and y offsets, each from its own independent stream of the seed
+        intervalRng, xRng, yRng = [numpy.random.default_rng(child) for child in numpy.random.SeedSequence(self.seed).spawn(3)]
+        return [
+            SampleRing(lambda count: sampleIntervalFactors(intervalRng, self.interval, self.intervalSpread, count), self.blockSize),
+            SampleRing(lambda count: sampleOffsets(xRng, self.position, self.positionSpread, count), self.blockSize),
+            SampleRing(lambda count: sampleOffsets(yRng, self.position, self.positionSpread, count), self.blockSize),
+        ]
+
+    def timeline(self, rate: float, count: int) -> numpy.ndarray:
+        # Click offsets in nanoseconds exactly as a session with this seed would schedule them
+        intervalRng = numpy.random.default_rng(numpy.random.SeedSequence(self.seed).spawn(3)[0])
+        factors = numpy.concatenate([sampleIntervalFactors(intervalRng, self.interval, self.intervalSpread, self.blockSize) for _ in range(-(-count // self.blockSize))])
+        intervals = (factors[:count - 1] * (1e9 / rate)).astype(numpy.int64)
+        return numpy.concatenate(([0], numpy.cumsum(intervals)))
@@ -0,0 +1,220 @@
+from fractions import Fraction
+import heapq
+import itertools
+from threading import Event, Lock, Thread
+import time
+from typing import Dict, List
+
+from backend import EventBatch, InputBackend, Vector2, getDefaultBackend
+from keypress import addKeySteps
+from scheduler import DEFAULT_SPIN_NS
+
+
+class ClickJob:
+    def __init__(self, jobId: int, rate: float, clickButton: str, clickPos: tuple = None) -> None:
+        self.jobId: int = jobId
+        self.clickButton: str = clickButton
+        self.clickPos: tuple = clickPos
+        self.paused: bool = False
+
+        self._numerator: int = 1
+        self._denominator: int = 1
+        self.setRate(rate)
+
+        # Deadlines are exact offsets from startNs, so jobs never drift relative to each other
+        self.startNs: int = 0
+        self.ticks: int = 0
+        self.generation: int = 0
+
+        self.clicks: int = 0
+        self.totalLatenessNs: int = 0
+        # Set when firing failed; the job is paused then and resuming it tries again
+        self.error: str = None
+        self.maxLatenessNs: int = 0
+
+    def setRate(self, rate: float) -> None:
+        if rate <= 0:
+            raise ValueError("Rate must be positive")
+        fraction: Fraction = Fraction(rate).limit_denominator(1_000_000)
+        self._numerator = fraction.numerator
+        self._denominator = fraction.denominator
+        self.rate: float = float(fraction)
+
+    def deadline(self) -> int:
+        return self.startNs + self.ticks * 1_000_000_000 * self._denominator // self._numerator
+
+    def fire(self, backend: InputBackend, cursor: Vector2) -> None:
+        if self.clickPos is not None:
+            backend.queryCursorInto(cursor)
+            if cursor.x != self.clickPos[0] or cursor.y != self.clickPos[1]:
+                backend.move(self.clickPos[0], self.clickPos[1])
+        backend.press(self.clickButton)
+        backend.release(self.clickButton)
+
+    def getStats(self) -> dict:
+        return {
+            "jobId": self.jobId,
+            "rate": self.rate,
+            "clicks": self.clicks,
+            "paused": self.paused,
+            "meanLatenessNs": self.totalLatenessNs / self.clicks if self.clicks else 0.0,
+            "maxLatenessNs": self.maxLatenessNs,
+            "error": self.error,
+        }
+
+
+class KeyJob(ClickJob):
+    def __init__(self, jobId: int, rate: float, steps: List[tuple], backend: InputBackend) -> None:
+        # Shares the click job's timing, but each tick sends the next step of a key sequence as one prebuilt batch
+        super().__init__(jobId, rate, None)
+        self._batches: List[EventBatch] = []
+        for step in steps:
+            batch: EventBatch = backend.createBatch(2 * len(step))
+            addKeySteps(batch, [step])
+            self._batches.append(batch)
+
+    def fire(self, backend: InputBackend, cursor: Vector2) -> None:
+        backend.sendBatch(self._batches[self.clicks % len(self._batches)])
+
+    def getStats(self) -> dict:
+        stats: dict = super().getStats()
+        stats["presses"] = stats["clicks"]
+        return stats
+
+
+class JobScheduler(Thread):
+    def __init__(self, backend: InputBackend = None, spinNs: int = DEFAULT_SPIN_NS, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._backend: InputBackend = backend if backend is not None else getDefaultBackend()
+        self._spinNs: int = spinNs
+        self._running: bool = True
+
+        self._lock: Lock = Lock()
+        self._wakeup: Event = Event()
+        self._jobs: Dict[int, ClickJob] = {}
+        self._ids = itertools.count(1)
+        self._sequence = itertools.count()
+
+        # Heap of (deadline, sequence, generation, job); entries whose generation is outdated are skipped
+        self._heap: List[tuple] = []
+
+    def stop(self) -> None:
+        self._running = False
+        self._wakeup.set()
+
+    def _schedule(self, job: ClickJob) -> None:
+        heapq.heappush(self._heap, (job.deadline(), next(self._sequence), job.generation, job))
+
+    def _restart(self, job: ClickJob) -> None:
+        job.generation += 1
+        job.startNs = time.perf_counter_ns()
+        job.ticks = 0
+        self._schedule(job)
+        self._wakeup.set()
+
+    def _addJob(self, createJob) -> int:
+        with self._lock:
+            job: ClickJob = createJob(next(self._ids))
+            self._jobs[job.jobId] = job
+            self._restart(job)
+        return job.jobId
+
+    def addJob(self, rate: float, clickButton: str, clickPos: tuple = None) -> int:
+        return self._addJob(lambda jobId: ClickJob(jobId, rate, clickButton, clickPos))
+
+    def addKeyJob(self, rate: float, steps: List[tuple]) -> int:
+        if not steps:
+            raise ValueError("No keys to press")
+        return self._addJob(lambda jobId: KeyJob(jobId, rate, steps, self._backend))
+
+    def removeJob(self, jobId: int) -> None:
+        with self._lock:
+            job: ClickJob = self._jobs.pop(jobId, None)
+            if job is not None:
+                job.generation += 1
+
+    def pauseJob(self, jobId: int) -> None:
+        with self._lock:
+            job: ClickJob = self._jobs.get(jobId)
+            if job is not None and not job.paused:
+                job.paused = True
+                job.generation += 1
+
+    def resumeJob(self, jobId: int) -> None:
+        with self._lock:
+            job: ClickJob = self._jobs.get(jobId)
+            if job is not None and job.paused:
+                job.paused = False
+                job.error = None
+                self._restart(job)
+
+    def setJobRate(self, jobId: int, rate: float) -> None:
+        with self._lock:
+            job: ClickJob = self._jobs.get(jobId)
+            if job is not None:
+                job.setRate(rate)
+                if not job.paused:
+                    self._restart(job)
+
+    def jobIds(self) -> list:
+        with self._lock:
+            return list(self._jobs.keys())
+
+    def getJobStats(self, jobId: int) -> dict:
+        with self._lock:
+            job: ClickJob = self._jobs.get(jobId)
+            return job.getStats() if job is not None else {}
+
+    def _waitUntil(self, deadline: int) -> bool:
+        # Sleeps coarsely on the wakeup event and spins the rest; returns False if the jobs changed meanwhile
+        remaining: int = deadline - time.perf_counter_ns()
+        if remaining > self._spinNs:
+            if self._wakeup.wait((remaining - self._spinNs) / 1e9):
+                self._wakeup.clear()
+                return False
+        while time.perf_counter_ns() < deadline:
+            pass
+        return True
+
+    def run(self) -> None:
+        cursor: Vector2 = Vector2(0, 0)
+        while self._running:
+            with self._lock:
+                while self._heap and self._heap[0][2] != self._heap[0][3].generation:
+                    heapq.heappop(self._heap)
+                entry: tuple = self._heap[0] if self._heap else None
+
+            if entry is None:
+                # Parked until a job is added
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            if not self._waitUntil(entry[0]):
+                continue
+
+            with self._lock:
+                if not self._heap or self._heap[0] is not entry:
+                    continue
+                heapq.heappop(self._heap)
+                deadline, _, generation, job = entry
+                if generation != job.generation:
+                    continue
+                job.ticks += 1
+                self._schedule(job)
+
+            lateness: int = time.perf_counter_ns() - deadline
+            try:
+                job.fire(self._backend, cursor)
+            except Exception as e:
+                # Only the failing job stops, the timing thread keeps running every other one
+                with self._lock:
+                    job.error = f"{type(e).__name__}: {e}"
+                    job.paused = True
+                    job.generation += 1
+                print(f"Job {job.jobId} failed: {job.error}")
+                continue
+            job.clicks += 1
+            job.totalLatenessNs += lateness
+            if lateness > job.maxLatenessNs:
+                job.maxLatenessNs = lateness
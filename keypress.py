@@ -0,0 +1,224 @@
+from math import gcd
+from threading import Event, Thread
+import time
+from typing import Dict, List
+
+from backend import BURST_BATCH_SIZE, EventBatch, InputBackend, getDefaultBackend
+from scheduler import INTERRUPTED, DeadlineScheduler
+
+# Set 1 scan codes; the evdev key codes X uses, less 8, are the same for all of these
+SCAN_CODES: Dict[str, int] = {
+    "esc": 1, "escape": 1, "backspace": 14, "tab": 15, "enter": 28, "return": 28, "space": 57, "caps lock": 58,
+    "ctrl": 29, "shift": 42, "right shift": 54, "alt": 56,
+    "-": 12, "=": 13, "[": 26, "]": 27, ";": 39, "'": 40, "`": 41, "\\": 43, "comma": 51, ".": 52, "/": 53,
+}
+SCAN_CODES.update({str(digit): 2 + (digit - 1) % 10 for digit in range(10)})
+for row, first in (("qwertyuiop", 16), ("asdfghjkl", 30), ("zxcvbnm", 44)):
+    SCAN_CODES.update({letter: first + i for i, letter in enumerate(row)})
+SCAN_CODES.update({f"f{n}": 58 + n for n in range(1, 11)})
+SCAN_CODES.update({"f11": 87, "f12": 88})
+
+
+def scanCode(name: str) -> int:
+    # A key name, or "sc:30" for a raw scan code
+    if name.startswith("sc:"):
+        try:
+            code: int = int(name[3:])
+        except ValueError:
+            raise ValueError(f"Invalid scan code '{name}'")
+        if not 0 < code < 0x10000:
+            raise ValueError(f"Invalid scan code '{name}'")
+        return code
+    code = SCAN_CODES.get(name)
+    if code is None:
+        # Anything else is looked up by the keyboard module, only loaded when such a key is used
+        try:
+            import keyboard
+            code = keyboard.key_to_scan_codes(name)[0]
+        except (ImportError, ValueError, IndexError):
+            raise ValueError(f"Unknown key '{name}'")
+    return code
+
+
+def parseKeys(text: str) -> List[tuple]:
+    # "a" presses one key, "ctrl+c" a chord and "a, b, ctrl+c" each of them in turn. Every step is a tuple of scan
+    # codes, pressed in order and released in reverse.
+    steps: List[tuple] = []
+    for part in text.split(","):
+        names: List[str] = [name.strip().lower() for name in part.split("+")]
+        if "" in names:
+            raise ValueError(f"Invalid keys '{text}'")
+        steps.append(tuple(scanCode(name) for name in names))
+    return steps
+
+
+def addKeySteps(batch: EventBatch, steps: List[tuple]) -> None:
+    for step in steps:
+        for code in step:
+            batch.addKeyPress(code)
+        for code in reversed(step):
+            batch.addKeyRelease(code)
+
+
+class KeySession:
+    def __init__(self, interval: float, steps: List[tuple], hold: bool = False, backend: InputBackend = None, batchSize: int = 1, maxPresses: int = None, maxDuration: float = None, burst: bool = False) -> None:
+        # The keyboard counterpart of ClickSession: each tick presses the next step of the sequence, on the same
+        # scheduler and through the same backend batches as clicks
+        if not steps:
+            raise ValueError("No keys to press")
+        if maxPresses is not None and maxPresses < 1:
+            raise ValueError("Press limit must be at least 1")
+        if maxDuration is not None and maxDuration <= 0:
+            raise ValueError("Duration must be positive")
+        self._backend: InputBackend = backend if backend is not None else getDefaultBackend()
+        self._running: bool = True
+        self._interval: float = interval
+        self._steps: List[tuple] = steps
+        self._hold: bool = hold
+        self._burst: bool = burst and not hold
+        if self._burst:
+            batchSize = batchSize if batchSize > 1 else BURST_BATCH_SIZE
+        self._batchSize: int = max(1, batchSize)
+
+        self._signal: Event = Event()
+        self._changes: float = None
+        self._scheduler: DeadlineScheduler = DeadlineScheduler(1 if hold else interval / self._batchSize, clicksPerTick=self._batchSize, interrupt=self._signal)
+        self._holdDurationNs: int = round(maxDuration * 1e9) if maxDuration is not None and hold else None
+        if not hold:
+            self._scheduler.setLimits(maxPresses, round(maxDuration * 1e9) if maxDuration is not None else None)
+
+        # Every batch is built up front and resent as is. A batch continues the sequence where the previous one
+        # stopped, so the sequence positions a batch can start at are the multiples of gcd(batchSize, steps).
+        self._stride: int = gcd(self._batchSize, len(steps))
+        self._batches: List[EventBatch] = [self._buildBatch(start * self._stride, self._batchSize) for start in range(len(steps) // self._stride)] if not hold else None
+        self._advance: int = self._batchSize // self._stride
+        self._index: int = 0
+        self._events: int = 0
+
+    def stop(self) -> None:
+        self._running = False
+        self._signal.set()
+
+    def reconfigure(self, interval: float, clickPos: tuple = None) -> None:
+        # Takes the same arguments as ClickSession.reconfigure, so the engine can change either; keys have no position
+        if interval <= 0:
+            raise ValueError("Rate must be positive")
+        self._changes = interval
+        self._signal.set()
+
+    def getStats(self) -> dict:
+        stats: dict = self._scheduler.getStats()
+        stats["presses"] = stats["clicks"]
+        stats["events"] = self._events
+        return stats
+
+    def exportStats(self, path: str) -> None:
+        self._scheduler.telemetry.export(path)
+
+    def _buildBatch(self, start: int, presses: int) -> EventBatch:
+        steps: List[tuple] = [self._steps[(start + i) % len(self._steps)] for i in range(presses)]
+        batch: EventBatch = self._backend.createBatch(sum(2 * len(step) for step in steps))
+        addKeySteps(batch, steps)
+        return batch
+
+    def _applyChanges(self) -> None:
+        self._signal.clear()
+        interval: float = self._changes
+        self._changes = None
+        if interval is not None and self._running and interval != self._interval:
+            self._interval = interval
+            self._scheduler.rebase(interval / self._batchSize)
+
+    def _runHold(self) -> None:
+        # All the keys go down together and come up in reverse, like one long chord
+        codes: List[int] = [code for step in self._steps for code in step]
+        press: EventBatch = self._backend.createBatch(len(codes))
+        release: EventBatch = self._backend.createBatch(len(codes))
+        for code in codes:
+            press.addKeyPress(code)
+        for code in reversed(codes):
+            release.addKeyRelease(code)
+
+        self._backend.sendBatch(press)
+        self._events += press.size
+        endNs: int = time.perf_counter_ns() + self._holdDurationNs if self._holdDurationNs is not None else None
+        while self._running:
+            if endNs is None:
+                self._signal.wait()
+            elif self._scheduler.waitUntil(endNs, 0) != INTERRUPTED:
+                self._scheduler.finished = True
+                break
+            self._applyChanges()
+        self._backend.sendBatch(release)
+        self._events += release.size
+
+    def _runPresses(self) -> None:
+        self._scheduler.start()
+        while self._running:
+            self._runBatches()
+            self._applyChanges()
+            if self._scheduler.finished:
+                self._running = False
+
+    def _runBatches(self) -> None:
+        batches: List[EventBatch] = self._batches
+        count: int = len(batches)
+        advance: int = self._advance
+        sendBatch = self._backend.sendBatch
+        now = time.perf_counter_ns
+        if self._burst:
+            # Every deadline is now, so the scheduler only checks for a stop or a limit between batches
+            waitUntil = self._scheduler.waitUntil
+            wait = lambda: waitUntil(now())
+        else:
+            wait = self._scheduler.wait
+        index: int = self._index
+        events: int = 0
+        while wait() != INTERRUPTED:
+            batch: EventBatch = batches[index]
+            sendBatch(batch)
+            events += batch.size
+            index = (index + advance) % count
+        self._index = index
+        self._events += events
+        self._sendRemainder(now() if self._burst else self._scheduler.nextDeadline())
+
+    def _sendRemainder(self, deadline: int) -> None:
+        # A press limit that isn't a whole number of batches ends with one smaller batch
+        remaining: int = self._scheduler.remainingClicks()
+        if not self._scheduler.finished or not 0 < remaining < self._batchSize:
+            return
+        batch: EventBatch = self._buildBatch(self._index * self._stride, remaining)
+        if self._scheduler.waitUntil(deadline, remaining) != INTERRUPTED:
+            self._backend.sendBatch(batch)
+            self._events += batch.size
+
+    def run(self) -> None:
+        try:
+            if self._hold:
+                self._runHold()
+            else:
+                self._runPresses()
+        except BaseException:
+            # Whatever went wrong, no key may be left down
+            for code in reversed([code for step in self._steps for code in step]):
+                self._backend.releaseKey(code)
+            raise
+
+
+class KeyThread(Thread):
+    def __init__(self, interval: float, steps: List[tuple], hold: bool = False, backend: InputBackend = None, batchSize: int = 1, maxPresses: int = None, maxDuration: float = None, burst: bool = False, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._session: KeySession = KeySession(interval, steps, hold, backend, batchSize, maxPresses, maxDuration, burst)
+
+    def stop(self) -> None:
+        self._session.stop()
+
+    def reconfigure(self, interval: float) -> None:
+        self._session.reconfigure(interval)
+
+    def getStats(self) -> dict:
+        return self._session.getStats()
+
+    def run(self) -> None:
+        self._session.run()
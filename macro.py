@@ -0,0 +1,211 @@
+from fractions import Fraction
+import mmap
+import os
+import struct
+from threading import Event, Lock, Thread
+import time
+from typing import Set
+
+from backend import BUTTON_CODES, BUTTON_NAMES, EVENT_KEY_PRESS, EVENT_KEY_RELEASE, EVENT_MOVE, EVENT_PRESS, EVENT_RELEASE, InputBackend, getDefaultBackend
+from scheduler import DeadlineScheduler
+
+# File layout: a small header followed by fixed-size little-endian records
+# (offset_ns int64, kind int8, button int8, padding, x int32, y int32); keys store their scan code in x
+MACRO_MAGIC: bytes = b"ACM1"
+HEADER = struct.Struct("<4sI")
+RECORD = struct.Struct("<qbbxxii")
+
+
+class MacroRecorder:
+    def __init__(self, path: str, dispatcher=None, chunkRecords: int = 4096) -> None:
+        # dispatcher is a hotkey.HotkeyDispatcher whose key events get recorded too
+        self._path: str = path
+        self._dispatcher = dispatcher
+        self._lock: Lock = Lock()
+
+        # Records are packed into a fixed chunk that is written out whenever it fills up
+        self._chunk: bytearray = bytearray(RECORD.size * chunkRecords)
+        self._chunkRecords: int = chunkRecords
+        self._buffered: int = 0
+        self._file = None
+        self._startNs: int = 0
+        self._mouse = None
+        self._mouseHook = None
+        self.recordCount: int = 0
+
+    def start(self) -> None:
+        # The mouse hook library is only needed for recording, playing a macro back works without it
+        import mouse
+        self._mouse = mouse
+
+        self._file = open(self._path, "wb")
+        self._file.write(HEADER.pack(MACRO_MAGIC, RECORD.size))
+        self._startNs = time.perf_counter_ns()
+        self.recordCount = 0
+
+        if self._dispatcher is not None:
+            self._dispatcher.addListener(self._onKey)
+        self._mouseHook = mouse.hook(self._onMouse)
+
+    def stop(self) -> None:
+        # Does nothing if recording never started
+        if self._file is None:
+            return
+        if self._mouseHook is not None:
+            self._mouse.unhook(self._mouseHook)
+            self._mouseHook = None
+        if self._dispatcher is not None:
+            self._dispatcher.removeListener(self._onKey)
+
+        with self._lock:
+            self._flush()
+            self._file.close()
+            self._file = None
+
+    def _flush(self) -> None:
+        self._file.write(memoryview(self._chunk)[:self._buffered * RECORD.size])
+        self._buffered = 0
+
+    def record(self, kind: int, button: int, x: int, y: int, timestampNs: int = None) -> None:
+        if timestampNs is None:
+            timestampNs = time.perf_counter_ns()
+        with self._lock:
+            if self._file is None:
+                return
+            RECORD.pack_into(self._chunk, self._buffered * RECORD.size, timestampNs - self._startNs, kind, button, x, y)
+            self._buffered += 1
+            self.recordCount += 1
+            if self._buffered == self._chunkRecords:
+                self._flush()
+
+    def _onKey(self, name: str, scanCode: int, down: bool, receivedNs: int) -> None:
+        self.record(EVENT_KEY_PRESS if down else EVENT_KEY_RELEASE, -1, scanCode, 0, receivedNs)
+
+    def _onMouse(self, event) -> None:
+        receivedNs: int = time.perf_counter_ns()
+        mouse = self._mouse
+        if isinstance(event, mouse.MoveEvent):
+            self.record(EVENT_MOVE, -1, event.x, event.y, receivedNs)
+        elif isinstance(event, mouse.ButtonEvent) and event.button in BUTTON_CODES:
+            # Windows reports the second press of a double click as "double"
+            kind: int = EVENT_RELEASE if event.event_type == mouse.UP else EVENT_PRESS
+            self.record(kind, BUTTON_CODES[event.button], 0, 0, receivedNs)
+
+
+class MacroFile:
+    def __init__(self, path: str) -> None:
+        self._file = open(path, "rb")
+        size: int = os.fstat(self._file.fileno()).st_size
+        if size < HEADER.size:
+            self._file.close()
+            raise ValueError(f"'{path}' is not a macro file")
+
+        # The records are memory mapped, so even multi-hour recordings are paged in on demand
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, recordSize = HEADER.unpack_from(self._map, 0)
+        if magic != MACRO_MAGIC or recordSize != RECORD.size:
+            self.close()
+            raise ValueError(f"'{path}' is not a macro file")
+        self._count: int = (size - HEADER.size) // RECORD.size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def record(self, index: int) -> tuple:
+        return RECORD.unpack_from(self._map, HEADER.size + index * RECORD.size)
+
+    def duration(self) -> int:
+        return self.record(self._count - 1)[0] if self._count else 0
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "MacroFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class MacroPlayer(Thread):
+    def __init__(self, macro: MacroFile, backend: InputBackend = None, speed: float = 1.0, loops: int = 1, onEvent=None, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # The player owns the macro file and closes it once playback ends or is stopped
+        self._macro: MacroFile = macro
+        self._backend: InputBackend = backend if backend is not None else getDefaultBackend()
+        self._running: bool = True
+
+        # Offsets are divided by the speed exactly; loops == 0 repeats until stopped
+        fraction: Fraction = Fraction(speed).limit_denominator(1_000_000)
+        if fraction <= 0:
+            macro.close()
+            raise ValueError("Speed must be positive")
+        self._speedNumerator: int = fraction.numerator
+        self._speedDenominator: int = fraction.denominator
+        self._loops: int = loops
+
+        # onEvent(index, latenessNs) is called after every replayed event
+        self._onEvent = onEvent
+        # Stopping interrupts the wait for the next event instead of letting it run out
+        self._stopped: Event = Event()
+        self._scheduler: DeadlineScheduler = DeadlineScheduler(1, interrupt=self._stopped)
+        self._heldButtons: Set[str] = set()
+        self._heldKeys: Set[int] = set()
+
+    def stop(self) -> None:
+        self._running = False
+        self._stopped.set()
+
+    def getStats(self) -> dict:
+        return self._scheduler.getStats()
+
+    def _scale(self, offsetNs: int) -> int:
+        return offsetNs * self._speedDenominator // self._speedNumerator
+
+    def _replay(self, kind: int, button: int, x: int, y: int) -> None:
+        if kind == EVENT_MOVE:
+            self._backend.move(x, y)
+        elif kind == EVENT_PRESS:
+            self._backend.press(BUTTON_NAMES[button])
+            self._heldButtons.add(BUTTON_NAMES[button])
+        elif kind == EVENT_RELEASE:
+            self._backend.release(BUTTON_NAMES[button])
+            self._heldButtons.discard(BUTTON_NAMES[button])
+        elif kind == EVENT_KEY_PRESS:
+            self._backend.pressKey(x)
+            self._heldKeys.add(x)
+        elif kind == EVENT_KEY_RELEASE:
+            self._backend.releaseKey(x)
+            self._heldKeys.discard(x)
+
+    def run(self) -> None:
+        try:
+            self._play()
+        finally:
+            self._macro.close()
+
+    def _play(self) -> None:
+        count: int = len(self._macro)
+        loopDuration: int = self._scale(self._macro.duration())
+        loop: int = 0
+        loopStart: int = time.perf_counter_ns()
+        while self._running and count and (self._loops == 0 or loop < self._loops):
+            for index in range(count):
+                offset, kind, button, x, y = self._macro.record(index)
+                lateness: int = self._scheduler.waitUntil(loopStart + self._scale(offset))
+                if not self._running:
+                    break
+                self._replay(kind, button, x, y)
+                if self._onEvent is not None:
+                    self._onEvent(index, lateness)
+
+            # The next loop starts exactly where this one was scheduled to end
+            loopStart += loopDuration
+            loop += 1
+
+        # Never leave buttons or keys stuck down
+        for button in self._heldButtons:
+            self._backend.release(button)
+        for scanCode in self._heldKeys:
+            self._backend.releaseKey(scanCode)
@@ -1,11 +1,6 @@
+import sys
 
-from clicker import Clicker
-from icon import Icon
-from interface import GUI
+from autoclicker import main
 
 if __name__ == "__main__":
-    clicker = Clicker()
-    gui = GUI(clicker.startClicking, clicker.stopClicking)
-    icon = Icon(gui._tk, gui.hide, gui.show)
-    gui.mainloop()
-j
\ No newline at end of file
+    sys.exit(main(["gui"] + sys.argv[1:]))
@@ -0,0 +1,371 @@
+from collections import OrderedDict
+from threading import Event, Thread
+import time
+from typing import Dict, List
+from weakref import WeakKeyDictionary
+
+import numpy
+
+from scheduler import INTERRUPTED, DeadlineScheduler
+from telemetry import LatencyHistogram
+from watcher import FrameGrabber
+
+# A template is searched on the coarsest pyramid level where it is still at least this many pixels on each side
+MIN_TEMPLATE_SIZE: int = 8
+MAX_LEVELS: int = 5
+
+# Pixels around the upsampled position that each finer level searches
+REFINE_MARGIN: int = 2
+
+# Best distinct positions of a full coarse search that get refined; fine detail blurred away on the coarse level
+# can make a wrong position score highest there
+COARSE_CANDIDATES: int = 3
+
+# Template FFTs kept per template; searches clipped by the frame edge come in many shapes, so the least recently
+# used ones are dropped
+FFT_CACHE_SIZE: int = 64
+
+# A window whose pixels barely vary can't be correlated, it scores 0 instead of dividing by nearly nothing
+MIN_VARIANCE: float = 1e-3
+
+
+def _fastSize(n: int) -> int:
+    # Smallest size >= n with only 2, 3 and 5 as factors, which the FFT handles quickly
+    while True:
+        m: int = n
+        for factor in (2, 3, 5):
+            while m % factor == 0:
+                m //= factor
+        if m == 1:
+            return n
+        n += 1
+
+
+def toGray(pixels: numpy.ndarray) -> numpy.ndarray:
+    # The unweighted channel sum; normalized correlation doesn't care about the scale
+    if pixels.ndim == 2:
+        return pixels.astype(numpy.float32)
+    gray: numpy.ndarray = pixels[..., 0].astype(numpy.float32)
+    gray += pixels[..., 1]
+    gray += pixels[..., 2]
+    return gray
+
+
+def halve(image: numpy.ndarray) -> numpy.ndarray:
+    # 2x2 box filter and subsample
+    height, width = image.shape[0] // 2 * 2, image.shape[1] // 2 * 2
+    image = image[:height, :width]
+    result: numpy.ndarray = image[0::2, 0::2] + image[1::2, 0::2]
+    result += image[0::2, 1::2]
+    result += image[1::2, 1::2]
+    result *= 0.25
+    return result
+
+
+def resize(image: numpy.ndarray, height: int, width: int) -> numpy.ndarray:
+    # Bilinear resize of a gray image
+    ys = numpy.linspace(0, image.shape[0] - 1, height, dtype=numpy.float32)
+    xs = numpy.linspace(0, image.shape[1] - 1, width, dtype=numpy.float32)
+    y0 = ys.astype(numpy.int64)
+    x0 = xs.astype(numpy.int64)
+    y1 = numpy.minimum(y0 + 1, image.shape[0] - 1)
+    x1 = numpy.minimum(x0 + 1, image.shape[1] - 1)
+    wy = (ys - y0)[:, None]
+    wx = (xs - x0)[None, :]
+    top = image[y0][:, x0] * (1 - wx) + image[y0][:, x1] * wx
+    bottom = image[y1][:, x0] * (1 - wx) + image[y1][:, x1] * wx
+    return (top * (1 - wy) + bottom * wy).astype(numpy.float32)
+
+
+def integralImage(image: numpy.ndarray) -> numpy.ndarray:
+    # table[y, x] is the sum of image[:y, :x]
+    table = numpy.zeros((image.shape[0] + 1, image.shape[1] + 1), dtype=numpy.float64)
+    numpy.cumsum(numpy.cumsum(image, axis=0, dtype=numpy.float64), axis=1, out=table[1:, 1:])
+    return table
+
+
+def windowSums(table: numpy.ndarray, right: int, bottom: int, height: int, width: int) -> numpy.ndarray:
+    # Sums of the height x width windows whose top left corners are in [0, right] x [0, bottom]
+    return (
+        table[height:bottom + height + 1, width:right + width + 1]
+        - table[:bottom + 1, width:right + width + 1]
+        - table[height:bottom + height + 1, :right + 1]
+        + table[:bottom + 1, :right + 1]
+    )
+
+
+class Match:
+    __slots__ = ("x", "y", "width", "height", "score", "scale")
+
+    def __init__(self, x: int, y: int, width: int, height: int, score: float, scale: float) -> None:
+        # Top left corner and size on the full resolution frame
+        self.x: int = x
+        self.y: int = y
+        self.width: int = width
+        self.height: int = height
+        self.score: float = score
+        self.scale: float = scale
+
+    def center(self) -> tuple:
+        return (self.x + self.width // 2, self.y + self.height // 2)
+
+
+class Template:
+    def __init__(self, pixels: numpy.ndarray, name: str = "", scales: tuple = (1.0,), threshold: float = 0.8, searchRadius: int = 48) -> None:
+        # pixels is a (height, width, 3) RGB or (height, width) gray array. Every scale gets its own pyramid,
+        # built once here.
+        if not 0 < threshold <= 1:
+            raise ValueError("Match threshold must be above 0 and at most 1")
+        self.name: str = name
+        self.threshold: float = threshold
+        # How far from the last hit a re-search looks before giving up and searching the whole frame
+        self.searchRadius: int = searchRadius
+        self.scales: tuple = tuple(scales)
+        self.lastMatch: Match = None
+
+        gray: numpy.ndarray = toGray(pixels)
+        self.pyramids: Dict[float, List[numpy.ndarray]] = {}
+        for scale in self.scales:
+            height, width = round(gray.shape[0] * scale), round(gray.shape[1] * scale)
+            if height < 2 or width < 2:
+                raise ValueError(f"Template '{name}' is too small at scale {scale}")
+            level: numpy.ndarray = gray if scale == 1.0 else resize(gray, height, width)
+            pyramid: List[numpy.ndarray] = [level]
+            while len(pyramid) < MAX_LEVELS and min(level.shape) // 2 >= MIN_TEMPLATE_SIZE:
+                level = halve(level)
+                pyramid.append(level)
+            self.pyramids[scale] = pyramid
+
+    def size(self, scale: float) -> tuple:
+        height, width = self.pyramids[scale][0].shape
+        return (width, height)
+
+
+def loadTemplate(path: str, scales: tuple = (1.0,), threshold: float = 0.8) -> Template:
+    # Pillow is only needed to read image files
+    from PIL import Image
+
+    with Image.open(path) as image:
+        return Template(numpy.asarray(image.convert("RGB")), path, scales, threshold)
+
+
+class TemplateMatcher:
+    def __init__(self, grabber: FrameGrabber) -> None:
+        self._grabber: FrameGrabber = grabber
+        self._version: int = -1
+        self._pyramid: List[numpy.ndarray] = None
+        # Per frame: integral images of every level and FFTs of whole levels, built when first needed
+        self._integrals: list = None
+        self._levelFFTs: dict = None
+
+        # Template FFTs per template, keyed by scale, level and FFT shape. Searches of the same area size (a whole
+        # level, a neighbourhood, a refine window) always reuse the same entries. A template that goes away takes
+        # its entries with it.
+        self._fftCache: WeakKeyDictionary = WeakKeyDictionary()
+        self.fftHits: int = 0
+        self.fftMisses: int = 0
+        self.frameHits: int = 0
+        self.frameMisses: int = 0
+
+        self.locateLatency: LatencyHistogram = LatencyHistogram()
+        self.fullLocateLatency: LatencyHistogram = LatencyHistogram()
+        self.fullSearches: int = 0
+        self.nearbySearches: int = 0
+        self.nearbyHits: int = 0
+
+    def update(self) -> bool:
+        # Grabs a new frame and rebuilds its pyramid, unless the grabber knows nothing changed. True if rebuilt.
+        version, dirty = self._grabber.dirtySince(self._version)
+        if self._pyramid is not None and dirty is not None and not dirty:
+            self.frameHits += 1
+            return False
+        self.frameMisses += 1
+        self._version = version
+        level: numpy.ndarray = toGray(self._grabber.grabFrame())
+        pyramid: List[numpy.ndarray] = [level]
+        while len(pyramid) < MAX_LEVELS and min(level.shape) // 2 >= MIN_TEMPLATE_SIZE:
+            level = halve(level)
+            pyramid.append(level)
+        self._pyramid = pyramid
+        self._integrals = [None] * len(pyramid)
+        self._levelFFTs = {}
+        return True
+
+    def _prepare(self, level: int, left: int, top: int, right: int, bottom: int, height: int, width: int, shape: tuple) -> tuple:
+        # FFT and integral images of the searched area. A whole level is shared by every template searched on it,
+        # so it is kept for the rest of the frame; a window is small enough to redo.
+        image: numpy.ndarray = self._pyramid[level]
+        if left > 0 or top > 0 or right + width < image.shape[1] or bottom + height < image.shape[0]:
+            window: numpy.ndarray = image[top:bottom + height, left:right + width]
+            return numpy.fft.rfft2(window, s=shape), integralImage(window), integralImage(numpy.square(window, dtype=numpy.float64))
+        if self._integrals[level] is None:
+            self._integrals[level] = (integralImage(image), integralImage(numpy.square(image, dtype=numpy.float64)))
+        key: tuple = (level, shape)
+        if key not in self._levelFFTs:
+            self._levelFFTs[key] = numpy.fft.rfft2(image, s=shape)
+        return (self._levelFFTs[key],) + self._integrals[level]
+
+    def _templateFFT(self, template: Template, scale: float, level: int, shape: tuple) -> tuple:
+        cache: OrderedDict = self._fftCache.get(template)
+        if cache is None:
+            cache = self._fftCache[template] = OrderedDict()
+        key: tuple = (scale, level, shape)
+        entry: tuple = cache.get(key)
+        if entry is not None:
+            cache.move_to_end(key)
+            self.fftHits += 1
+            return entry
+        self.fftMisses += 1
+        pixels: numpy.ndarray = template.pyramids[scale][level]
+        zeroMean: numpy.ndarray = pixels - pixels.mean()
+        # Correlating is convolving with the flipped template
+        entry = (numpy.fft.rfft2(zeroMean[::-1, ::-1], s=shape), float(numpy.square(zeroMean, dtype=numpy.float64).sum()))
+        cache[key] = entry
+        if len(cache) > FFT_CACHE_SIZE:
+            cache.popitem(last=False)
+        return entry
+
+    def _searchLevel(self, template: Template, scale: float, level: int, left: int, top: int, right: int, bottom: int, count: int = 1) -> list:
+        # The count best (score, x, y) for the template's top left corner within [left, right] x [top, bottom] on
+        # this level, at least half a template apart, scored by normalized cross correlation from -1 to 1
+        image: numpy.ndarray = self._pyramid[level]
+        height, width = template.pyramids[scale][level].shape
+        left, top = max(0, left), max(0, top)
+        right, bottom = min(image.shape[1] - width, right), min(image.shape[0] - height, bottom)
+        if right < left or bottom < top:
+            return [(-1.0, left, top)]
+
+        shape: tuple = (_fastSize(bottom - top + height), _fastSize(right - left + width))
+        templateFFT, templateEnergy = self._templateFFT(template, scale, level, shape)
+        imageFFT, sumTable, squareTable = self._prepare(level, left, top, right, bottom, height, width, shape)
+        full = numpy.fft.irfft2(imageFFT * templateFFT, s=shape)
+        correlation = full[height - 1:bottom - top + height, width - 1:right - left + width]
+
+        sums = windowSums(sumTable, right - left, bottom - top, height, width)
+        variance = windowSums(squareTable, right - left, bottom - top, height, width) - sums * sums / (height * width)
+        flat = variance <= MIN_VARIANCE
+        numpy.maximum(variance, MIN_VARIANCE, out=variance)
+        scores = correlation / numpy.sqrt(variance * templateEnergy)
+        scores[flat] = 0.0
+
+        candidates: list = []
+        for _ in range(count):
+            index: int = int(numpy.argmax(scores))
+            y, x = divmod(index, scores.shape[1])
+            candidates.append((float(scores[y, x]), left + x, top + y))
+            scores[max(0, y - height // 2):y + height // 2 + 1, max(0, x - width // 2):x + width // 2 + 1] = -1.0
+        return candidates
+
+    def _coarseToFine(self, template: Template, scale: float, level: int, score: float, x: int, y: int) -> Match:
+        # Each finer level only looks a few pixels around the doubled position from the level above
+        while level > 0:
+            level -= 1
+            x, y = x * 2, y * 2
+            score, x, y = self._searchLevel(template, scale, level, x - REFINE_MARGIN, y - REFINE_MARGIN, x + REFINE_MARGIN, y + REFINE_MARGIN)[0]
+        width, height = template.size(scale)
+        return Match(x, y, width, height, score, scale)
+
+    def _coarsestLevel(self, template: Template, scale: float) -> int:
+        return min(len(template.pyramids[scale]), len(self._pyramid)) - 1
+
+    def _locateNearby(self, template: Template) -> Match:
+        last: Match = template.lastMatch
+        level: int = self._coarsestLevel(template, last.scale)
+        factor: int = 1 << level
+        radius: int = -(-template.searchRadius // factor)
+        x, y = last.x // factor, last.y // factor
+        score, x, y = self._searchLevel(template, last.scale, level, x - radius, y - radius, x + radius, y + radius)[0]
+        match: Match = self._coarseToFine(template, last.scale, level, score, x, y)
+        return match if match.score >= template.threshold else None
+
+    def _locateFull(self, template: Template) -> Match:
+        # The coarse score isn't compared to the threshold: a template off the coarse pixel grid scores low there
+        # and only gets its real score once refined
+        best: Match = None
+        for scale in template.scales:
+            level: int = self._coarsestLevel(template, scale)
+            for score, x, y in self._searchLevel(template, scale, level, 0, 0, self._pyramid[level].shape[1], self._pyramid[level].shape[0], COARSE_CANDIDATES):
+                match: Match = self._coarseToFine(template, scale, level, score, x, y)
+                if best is None or match.score > best.score:
+                    best = match
+        return best if best is not None and best.score >= template.threshold else None
+
+    def locate(self, template: Template) -> Match:
+        # Searches the current frame, call update() first to see a new one. None when the template isn't found.
+        start: int = time.perf_counter_ns()
+        match: Match = None
+        if template.lastMatch is not None:
+            # Things on screen rarely jump far, so the area around the last hit is tried first
+            self.nearbySearches += 1
+            match = self._locateNearby(template)
+            if match is not None:
+                self.nearbyHits += 1
+        if match is None:
+            self.fullSearches += 1
+            match = self._locateFull(template)
+            self.fullLocateLatency.record(time.perf_counter_ns() - start)
+        template.lastMatch = match
+        self.locateLatency.record(time.perf_counter_ns() - start)
+        return match
+
+    def getStats(self) -> dict:
+        return {
+            "frames": self.frameMisses,
+            "frameCacheHitRate": self.frameHits / max(1, self.frameHits + self.frameMisses),
+            "fftCacheHitRate": self.fftHits / max(1, self.fftHits + self.fftMisses),
+            "fftCacheEntries": sum(len(cache) for cache in self._fftCache.values()),
+            "fullSearches": self.fullSearches,
+            "nearbySearches": self.nearbySearches,
+            "nearbyHits": self.nearbyHits,
+            "locateLatencyNs": self.locateLatency.summary(),
+            "fullLocateLatencyNs": self.fullLocateLatency.summary(),
+        }
+
+
+class TemplateWatcher(Thread):
+    def __init__(self, matcher: TemplateMatcher, templates: List[Template], targetFunc, pollRate: float = 20.0, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # targetFunc(match) runs on this thread whenever the target changes: the match of the first template in the
+        # list that is on screen, or None once none of them is
+        self._matcher: TemplateMatcher = matcher
+        self._templates: List[Template] = templates
+        self._targetFunc = targetFunc
+        self._target: tuple = None
+
+        self._stopped: Event = Event()
+        self._scheduler: DeadlineScheduler = DeadlineScheduler(pollRate, spinNs=0, interrupt=self._stopped)
+        self.pollCost: LatencyHistogram = LatencyHistogram()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def getStats(self) -> dict:
+        stats: dict = self._matcher.getStats()
+        stats["polls"] = self._scheduler.getStats()["ticks"]
+        stats["targetPollRate"] = self._scheduler.rate
+        stats["pollRate"] = self._scheduler.achievedRate()
+        stats["pollCostNs"] = self.pollCost.summary()
+        return stats
+
+    def run(self) -> None:
+        wait = self._scheduler.wait
+        matcher: TemplateMatcher = self._matcher
+        self._scheduler.start()
+        while wait() != INTERRUPTED:
+            start: int = time.perf_counter_ns()
+            # An unchanged frame keeps every template where it was
+            if matcher.update():
+                target: Match = None
+                for template in self._templates:
+                    match: Match = matcher.locate(template)
+                    if match is not None and target is None:
+                        target = match
+                key: tuple = (target.center(), target.scale) if target is not None else None
+                if key != self._target:
+                    self._target = key
+                    self._targetFunc(target)
+            self.pollCost.record(time.perf_counter_ns() - start)
+
+        if self._target is not None:
+            self._target = None
+            self._targetFunc(None)
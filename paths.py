@@ -0,0 +1,127 @@
+from typing import List
+
+import numpy
+
+
+class ClickPath:
+    def __init__(self, xs: numpy.ndarray, ys: numpy.ndarray, clicks: numpy.ndarray = None) -> None:
+        # Points are stored as compact int32 columns; clicks marks the points that are clicked, the rest are only
+        # moved through (e.g. interpolated points between two targets)
+        self.xs: numpy.ndarray = numpy.ascontiguousarray(xs, dtype=numpy.int32)
+        self.ys: numpy.ndarray = numpy.ascontiguousarray(ys, dtype=numpy.int32)
+        self.clicks: numpy.ndarray = numpy.ones(len(self.xs), dtype=numpy.bool_) if clicks is None else numpy.ascontiguousarray(clicks, dtype=numpy.bool_)
+        if not len(self.xs) == len(self.ys) == len(self.clicks):
+            raise ValueError("Path columns must have the same length")
+        if len(self.clicks) == 0 or not self.clicks[0]:
+            raise ValueError("Path must start with a click target")
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+    def clickCount(self) -> int:
+        return int(self.clicks.sum())
+
+    def concatenate(self, other: "ClickPath") -> "ClickPath":
+        return ClickPath(numpy.concatenate((self.xs, other.xs)), numpy.concatenate((self.ys, other.ys)), numpy.concatenate((self.clicks, other.clicks)))
+
+    def interpolate(self, stepPx: float) -> "ClickPath":
+        # Adds move-only points so no jump between consecutive targets is longer than stepPx, including the jump
+        # from the last target back to the first when the path repeats
+        if stepPx <= 0:
+            raise ValueError("Interpolation step must be positive")
+        targets = numpy.flatnonzero(self.clicks)
+        xs = self.xs[targets].astype(numpy.float64)
+        ys = self.ys[targets].astype(numpy.float64)
+        dx = numpy.roll(xs, -1) - xs
+        dy = numpy.roll(ys, -1) - ys
+        steps = numpy.maximum(1, numpy.ceil(numpy.hypot(dx, dy) / stepPx)).astype(numpy.int64)
+
+        # Point k of segment i sits at fraction k / steps[i] from target i towards target i + 1
+        segment = numpy.repeat(numpy.arange(len(targets)), steps)
+        starts = numpy.concatenate(([0], numpy.cumsum(steps)[:-1]))
+        fraction = (numpy.arange(len(segment)) - starts[segment]) / steps[segment]
+        return ClickPath(
+            numpy.rint(xs[segment] + dx[segment] * fraction),
+            numpy.rint(ys[segment] + dy[segment] * fraction),
+            fraction == 0,
+        )
+
+    def iterationColumns(self) -> tuple:
+        # Lists for the click loop. Every coordinate refers to one shared int object per distinct value, so walking
+        # the path neither creates objects nor keeps tens of thousands of separate ints alive. Only the values that
+        # occur are interned, so a single far off point costs one entry instead of the whole span.
+        xs: list = self.xs.tolist()
+        ys: list = self.ys.tolist()
+        values: dict = dict.fromkeys(xs)
+        values.update(dict.fromkeys(ys))
+        for value in values:
+            values[value] = value
+        xs = [values[x] for x in xs]
+        ys = [values[y] for y in ys]
+        clicks: list = [1 if click else 0 for click in self.clicks.tolist()]
+        return xs, ys, clicks
+
+    def offsets(self, rate: float) -> list:
+        # Nanosecond offset of every point within one cycle: targets are 1 / rate apart and the moves between two
+        # targets are spread evenly over the interval
+        intervalNs: float = 1e9 / rate
+        targetIndex = numpy.cumsum(self.clicks) - 1
+        starts = numpy.flatnonzero(self.clicks)
+        following = numpy.append(starts[1:], len(self))
+        counts = (following - starts)[targetIndex]
+        position = numpy.arange(len(self)) - starts[targetIndex]
+        return ((targetIndex + position / counts) * intervalNs).astype(numpy.int64).tolist()
+
+    def cycleNs(self, rate: float) -> int:
+        return int(self.clickCount() * 1e9 / rate)
+
+
+def gridPath(left: int, top: int, columns: int, rows: int, stepX: int, stepY: int, snake: bool = False) -> ClickPath:
+    # Row by row; a snake grid reverses every other row so the cursor never jumps back across the grid
+    xs, ys = numpy.meshgrid(left + numpy.arange(columns) * stepX, top + numpy.arange(rows) * stepY)
+    if snake:
+        xs[1::2] = xs[1::2, ::-1]
+    return ClickPath(xs.ravel(), ys.ravel())
+
+
+def pointsPath(points: List[tuple]) -> ClickPath:
+    array = numpy.asarray(points, dtype=numpy.int32).reshape(-1, 2)
+    return ClickPath(array[:, 0], array[:, 1])
+
+
+def parsePath(text: str) -> ClickPath:
+    # One target per line as "x,y" or "x y", or a whole grid as "grid left top columns rows stepX stepY [snake]";
+    # "#" starts a comment
+    parts: List[ClickPath] = []
+    points: List[tuple] = []
+    for lineNumber, line in enumerate(text.splitlines(), 1):
+        words: List[str] = line.split("#", 1)[0].replace(",", " ").split()
+        if not words:
+            continue
+        try:
+            if words[0].lower() == "grid" and len(words) in (7, 8) and (len(words) == 7 or words[7].lower() == "snake"):
+                if points:
+                    parts.append(pointsPath(points))
+                    points = []
+                parts.append(gridPath(*[int(word) for word in words[1:7]], snake=len(words) == 8))
+            elif len(words) == 2:
+                points.append((int(words[0]), int(words[1])))
+            else:
+                raise ValueError(f"Unknown statement '{line.strip()}'")
+        except ValueError as e:
+            raise ValueError(f"Line {lineNumber}: {e}")
+    if points:
+        parts.append(pointsPath(points))
+    if not parts:
+        raise ValueError("Path has no points")
+
+    path: ClickPath = parts[0]
+    for part in parts[1:]:
+        path = path.concatenate(part)
+    return path
+
+
+def loadPath(path: str, interpolateStep: float = None) -> ClickPath:
+    with open(path, "r") as file:
+        clickPath: ClickPath = parsePath(file.read())
+    return clickPath.interpolate(interpolateStep) if interpolateStep else clickPath
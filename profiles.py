@@ -0,0 +1,244 @@
+import json
+import os
+import select
+import struct
+import sys
+from threading import Event, Thread
+from typing import Dict
+
+from backend import BUTTON_CODES
+from hotkey import parseHotkey
+
+if sys.platform == "win32":
+    import win32con
+    import win32event
+    import win32file
+else:
+    from ctypes import CDLL, c_char_p, c_int, c_uint, get_errno
+
+PROFILES_PATH: str = "profiles.json"
+
+# How often the profiles file is checked where there's no change notification to wait on
+POLL_INTERVAL: float = 0.5
+
+# inotify flags for a file being written and closed, or replaced by a rename
+IN_CLOSE_WRITE: int = 0x0008
+IN_MOVED_TO: int = 0x0080
+IN_CREATE: int = 0x0100
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class Profile:
+    __slots__ = ("name", "cps", "timeFormat", "button", "hold", "clickPos", "batchSize", "startKey", "stopKey", "toggleKey", "switchKey", "startArgs")
+
+    def __init__(self, name: str, cps: float, timeFormat: str, button: str, hold: bool, clickPos: tuple, batchSize: int, startKey: str, stopKey: str, toggleKey: str, switchKey: str) -> None:
+        self.name: str = name
+        self.cps: float = cps
+        self.timeFormat: str = timeFormat
+        self.button: str = button
+        self.hold: bool = hold
+        self.clickPos: tuple = clickPos
+        self.batchSize: int = batchSize
+        self.startKey: str = startKey
+        self.stopKey: str = stopKey
+        self.toggleKey: str = toggleKey
+        self.switchKey: str = switchKey
+        # Exactly what Clicker.startClicking takes, so running a profile needs no parsing or lookups
+        self.startArgs: tuple = (cps, button, clickPos, hold, batchSize)
+
+    def toDict(self) -> dict:
+        return {
+            "cps": self.cps,
+            "timeFormat": self.timeFormat,
+            "button": self.button,
+            "hold": self.hold,
+            "position": list(self.clickPos) if self.clickPos is not None else None,
+            "batchSize": self.batchSize,
+            "startKey": self.startKey,
+            "stopKey": self.stopKey,
+            "toggleKey": self.toggleKey,
+            "switchKey": self.switchKey,
+        }
+
+
+def parseProfile(name: str, data: dict) -> Profile:
+    if not isinstance(data, dict):
+        raise ValueError(f"Profile '{name}' must be an object")
+    cps = data.get("cps", 1)
+    if not isinstance(cps, (int, float)) or isinstance(cps, bool) or cps <= 0:
+        raise ValueError(f"Profile '{name}': cps must be a positive number")
+    timeFormat = data.get("timeFormat", "cps")
+    if timeFormat not in ("cps", "ms"):
+        raise ValueError(f"Profile '{name}': timeFormat must be 'cps' or 'ms'")
+    button = data.get("button", "left")
+    if button not in BUTTON_CODES:
+        raise ValueError(f"Profile '{name}': unknown mouse button '{button}'")
+    hold = data.get("hold", False)
+    if not isinstance(hold, bool):
+        raise ValueError(f"Profile '{name}': hold must be true or false")
+
+    position = data.get("position")
+    if position is not None:
+        if not isinstance(position, list) or len(position) != 2 or not all(isinstance(value, int) and not isinstance(value, bool) for value in position):
+            raise ValueError(f"Profile '{name}': position must be [x, y] or null")
+        position = (position[0], position[1])
+
+    batchSize = data.get("batchSize", 1)
+    if not isinstance(batchSize, int) or isinstance(batchSize, bool) or batchSize < 1:
+        raise ValueError(f"Profile '{name}': batchSize must be a positive whole number")
+
+    keys: Dict[str, str] = {}
+    for field, default in (("startKey", "g"), ("stopKey", "h"), ("toggleKey", "j"), ("switchKey", "")):
+        key = data.get(field, default)
+        if not isinstance(key, str):
+            raise ValueError(f"Profile '{name}': {field} must be a string")
+        if key != "":
+            try:
+                parseHotkey(key)
+            except ValueError as e:
+                raise ValueError(f"Profile '{name}': {e}")
+        keys[field] = key.lower()
+
+    return Profile(name, float(cps), timeFormat, button, hold, position, batchSize, keys["startKey"], keys["stopKey"], keys["toggleKey"], keys["switchKey"])
+
+
+class ProfileStore:
+    def __init__(self, path: str = PROFILES_PATH) -> None:
+        self.path: str = path
+        self.profiles: Dict[str, Profile] = {}
+        self.active: str = None
+        self._loadedStat: tuple = None
+
+    def _stat(self) -> tuple:
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    def isCurrent(self) -> bool:
+        # True when the file is still the one last loaded or saved, e.g. to ignore the watcher seeing our own save
+        return self._stat() == self._loadedStat
+
+    def load(self) -> bool:
+        # Every profile is parsed and validated here, once. A file that can't be read leaves the loaded profiles
+        # untouched, a single bad profile is skipped.
+        try:
+            with open(self.path, "r") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            self._loadedStat = None
+            return False
+        except (OSError, ValueError) as e:
+            print(f"Could not load profiles: {e}")
+            return False
+        if not isinstance(data, dict) or not isinstance(data.get("profiles"), dict):
+            print("Could not load profiles: the file needs a 'profiles' object")
+            return False
+
+        profiles: Dict[str, Profile] = {}
+        for name, profileData in data["profiles"].items():
+            try:
+                profiles[name] = parseProfile(name, profileData)
+            except ValueError as e:
+                print(e)
+        self.profiles = profiles
+        active = data.get("active")
+        self.active = active if active in profiles else next(iter(profiles), None)
+        self._loadedStat = self._stat()
+        return True
+
+    def save(self) -> None:
+        data: dict = {"active": self.active, "profiles": {name: profile.toDict() for name, profile in self.profiles.items()}}
+        # Written to a temporary file and renamed over the old one, so a reader never sees half a file
+        temporaryPath: str = self.path + ".tmp"
+        with open(temporaryPath, "w") as file:
+            json.dump(data, file, indent=4)
+        os.replace(temporaryPath, self.path)
+        self._loadedStat = self._stat()
+
+    def put(self, profile: Profile) -> None:
+        self.profiles[profile.name] = profile
+
+    def remove(self, name: str) -> None:
+        self.profiles.pop(name, None)
+        if self.active == name:
+            self.active = next(iter(self.profiles), None)
+
+
+class ProfileWatcher(Thread):
+    def __init__(self, path: str, changeFunc, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # changeFunc runs on this thread whenever the file is written, created or replaced
+        self._path: str = os.path.abspath(path)
+        self._changeFunc = changeFunc
+        self._running: bool = True
+        self._stopped: Event = Event()
+
+    def stop(self) -> None:
+        self._running = False
+        self._stopped.set()
+
+    def run(self) -> None:
+        if sys.platform == "win32":
+            self._watchWin32()
+        elif hasattr(CDLL(None), "inotify_init1"):
+            self._watchInotify()
+        else:
+            # macOS and the BSDs have no inotify
+            self._watchPolling()
+
+    def _watchPolling(self) -> None:
+        def fileStat() -> tuple:
+            try:
+                stat = os.stat(self._path)
+                return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                return None
+
+        last: tuple = fileStat()
+        while not self._stopped.wait(POLL_INTERVAL):
+            current: tuple = fileStat()
+            if current != last:
+                last = current
+                self._changeFunc()
+
+    def _watchInotify(self) -> None:
+        # The directory is watched rather than the file, so editors that save by renaming a new file over it work
+        libc = CDLL(None, use_errno=True)
+        libc.inotify_init1.argtypes = [c_int]
+        libc.inotify_add_watch.argtypes = [c_int, c_char_p, c_uint]
+        fd: int = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0 or libc.inotify_add_watch(fd, os.path.dirname(self._path).encode(), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE) < 0:
+            print(f"Could not watch profiles: {os.strerror(get_errno())}")
+            return
+
+        name: bytes = os.path.basename(self._path).encode()
+        try:
+            while self._running:
+                # Wakes up twice a second to notice stop()
+                if not select.select([fd], [], [], 0.5)[0]:
+                    continue
+                changed: bool = False
+                data: bytes = os.read(fd, 4096)
+                offset: int = 0
+                while offset < len(data):
+                    _, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                    eventName: bytes = data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b"\0")
+                    changed = changed or eventName == name
+                    offset += INOTIFY_EVENT.size + length
+                if changed:
+                    self._changeFunc()
+        finally:
+            os.close(fd)
+
+    def _watchWin32(self) -> None:
+        handle = win32file.FindFirstChangeNotification(os.path.dirname(self._path), False, win32con.FILE_NOTIFY_CHANGE_LAST_WRITE | win32con.FILE_NOTIFY_CHANGE_FILE_NAME)
+        try:
+            while self._running:
+                if win32event.WaitForSingleObject(handle, 500) == win32event.WAIT_OBJECT_0:
+                    # Directory notifications don't say which file changed, the store's stat check filters the rest
+                    self._changeFunc()
+                    win32file.FindNextChangeNotification(handle)
+        finally:
+            win32file.FindCloseChangeNotification(handle)
@@ -0,0 +1,147 @@
+from fractions import Fraction
+import sys
+from threading import Event
+import time
+
+from telemetry import ClickTelemetry
+
+# Time left before a deadline that is spent spinning instead of sleeping; Windows sleeps are much coarser
+DEFAULT_SPIN_NS: int = 2_000_000 if sys.platform == "win32" else 200_000
+
+# Returned instead of the lateness when a wait was cut short by the interrupt event
+INTERRUPTED: int = -1
+
+
+class DeadlineScheduler:
+    def __init__(self, rate: float, spinNs: int = DEFAULT_SPIN_NS, clicksPerTick: int = 1, interrupt: Event = None) -> None:
+        self._spinNs: int = spinNs
+        # Setting this event wakes any wait immediately, whether it is sleeping or spinning
+        self._interrupt: Event = interrupt if interrupt is not None else Event()
+        self._numerator: int = 1
+        self._denominator: int = 1
+        self.setRate(rate)
+
+        self._startNs: int = 0
+        self._ticks: int = 0
+
+        # Lateness, intervals and achieved rate go into fixed-size telemetry that is cheap enough to always keep on
+        self.telemetry: ClickTelemetry = ClickTelemetry()
+        self._clicksPerTick: int = clicksPerTick
+        self._totalTicks: int = 0
+        self._totalClicks: int = 0
+        self._firstWakeNs: int = 0
+        self._lastWakeNs: int = 0
+
+        # Limits are checked before every wait, so a bounded run ends on exactly its last click
+        self._clickLimit: int = sys.maxsize
+        self._durationNs: int = None
+        self._endNs: int = sys.maxsize
+        self.finished: bool = False
+
+    def setLimits(self, maxClicks: int = None, maxDurationNs: int = None) -> None:
+        # No more ticks once maxClicks clicks happened or at or after maxDurationNs from the first start()
+        self._clickLimit = maxClicks if maxClicks is not None else sys.maxsize
+        self._durationNs = maxDurationNs
+
+    def setRate(self, rate: float) -> None:
+        if rate <= 0:
+            raise ValueError("Rate must be positive")
+        # Keep the rate as an exact fraction so deadlines are integer nanoseconds without rounding drift
+        fraction: Fraction = Fraction(rate).limit_denominator(1_000_000)
+        self._numerator = fraction.numerator
+        self._denominator = fraction.denominator
+        self.rate: float = float(fraction)
+
+    def start(self, startNs: int = None) -> None:
+        self._startNs = time.perf_counter_ns() if startNs is None else startNs
+        self._ticks = 0
+        # A rebase starts again, but the duration keeps counting from the first start
+        if self._durationNs is not None and self._endNs == sys.maxsize:
+            self._endNs = self._startNs + self._durationNs
+
+    def deadline(self, tick: int) -> int:
+        return self._startNs + tick * 1_000_000_000 * self._denominator // self._numerator
+
+    def nextDeadline(self) -> int:
+        return self.deadline(self._ticks)
+
+    def rebase(self, rate: float) -> None:
+        # Changes the rate mid-run: the next deadline is one new interval after the last wake up
+        self.setRate(rate)
+        self.start(self._lastWakeNs if self._totalTicks else None)
+        self._ticks = 1 if self._totalTicks else 0
+
+    def wait(self) -> int:
+        deadline: int = self.deadline(self._ticks)
+        self._ticks += 1
+        lateness: int = self.waitUntil(deadline)
+        if lateness == INTERRUPTED:
+            # The tick didn't happen, so it is still due
+            self._ticks -= 1
+        return lateness
+
+    def waitUntil(self, deadline: int, clicks: int = None) -> int:
+        # clicks overrides how many clicks this wake counts for, e.g. 0 for a cursor move along a path
+        if clicks is None:
+            clicks = self._clicksPerTick
+        if self._totalClicks + clicks > self._clickLimit or self._totalClicks >= self._clickLimit or deadline >= self._endNs:
+            self.finished = True
+            return INTERRUPTED
+
+        # Sleep coarsely until shortly before the deadline, then spin for the rest
+        interrupt: Event = self._interrupt
+        remaining: int = deadline - time.perf_counter_ns()
+        if remaining > self._spinNs and interrupt.wait((remaining - self._spinNs) / 1e9):
+            return INTERRUPTED
+        now: int = time.perf_counter_ns()
+        while now < deadline:
+            if interrupt.is_set():
+                return INTERRUPTED
+            now = time.perf_counter_ns()
+        # A loop running behind never sleeps or spins, so it has to be checked here too
+        if interrupt.is_set():
+            return INTERRUPTED
+
+        lateness: int = now - deadline
+        self._record(now, lateness, clicks)
+        return lateness
+
+    def _record(self, now: int, lateness: int, clicks: int) -> None:
+        self.telemetry.record(now, lateness, clicks)
+        # Wakes that only move the cursor are in the lateness telemetry but aren't ticks of the click rate
+        if not clicks:
+            return
+        self._totalClicks += clicks
+        if self._totalTicks == 0:
+            self._firstWakeNs = now
+        self._lastWakeNs = now
+        self._totalTicks += 1
+
+    def clicks(self) -> int:
+        return self._totalClicks
+
+    def remainingClicks(self) -> int:
+        return self._clickLimit - self._totalClicks
+
+    def achievedRate(self) -> float:
+        elapsed: int = self._lastWakeNs - self._firstWakeNs
+        if self._totalTicks < 2 or elapsed <= 0:
+            return 0.0
+        return (self._totalTicks - 1) * 1e9 / elapsed
+
+    def getStats(self) -> dict:
+        snapshot: dict = self.telemetry.snapshot()
+        lateness: dict = snapshot["latenessNs"]
+        return {
+            "targetRate": self.rate,
+            "achievedRate": self.achievedRate(),
+            "ticks": self._totalTicks,
+            "clicks": self._totalClicks,
+            "finished": self.finished,
+            "meanLatenessNs": lateness["mean"],
+            "maxLatenessNs": lateness["max"],
+            "p50LatenessNs": lateness["p50"],
+            "p99LatenessNs": lateness["p99"],
+            "p999LatenessNs": lateness["p999"],
+            "telemetry": snapshot,
+        }
@@ -0,0 +1,274 @@
+from array import array
+import math
+from threading import Event, Thread
+import time
+from typing import List, Set
+
+from backend import BUTTON_CODES, BUTTON_NAMES, InputBackend, getDefaultBackend
+from scheduler import DeadlineScheduler
+
+# A timeline action is kind * 3 + button code, plus a separate cursor move action
+KIND_CLICK: int = 0
+KIND_PRESS: int = 1
+KIND_RELEASE: int = 2
+ACTION_MOVE: int = 9
+
+# Coordinate stored for actions that happen wherever the cursor currently is
+CURRENT: int = -(1 << 31)
+
+UNITS: dict = {"ns": 1, "us": 1_000, "ms": 1_000_000, "s": 1_000_000_000}
+
+
+def parseDuration(text: str) -> int:
+    for unit in ("ns", "us", "ms", "s"):
+        if text.endswith(unit):
+            duration: int = round(float(text[:-len(unit)]) * UNITS[unit])
+            # Time only moves forward, a negative gap or wait would put actions before the ones they follow
+            if duration < 0:
+                raise ValueError(f"Duration '{text}' can't be negative")
+            return duration
+    raise ValueError(f"Duration '{text}' needs a unit (ns, us, ms or s)")
+
+
+class Timeline:
+    def __init__(self) -> None:
+        self.offsets = array("q")
+        self.actions = array("b")
+        self.xs = array("i")
+        self.ys = array("i")
+        self.duration: int = 0
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def append(self, offset: int, action: int, x: int, y: int) -> None:
+        self.offsets.append(offset)
+        self.actions.append(action)
+        self.xs.append(x)
+        self.ys.append(y)
+
+    def clicks(self) -> int:
+        return sum(1 for action in self.actions if action < 3)
+
+
+class SequenceBuilder:
+    def __init__(self) -> None:
+        self._steps: List[tuple] = []
+
+    def button(self, name: str) -> "SequenceBuilder":
+        if name not in BUTTON_CODES:
+            raise ValueError(f"Unknown mouse button '{name}'")
+        self._steps.append(("button", name))
+        return self
+
+    def at(self, x: int, y: int) -> "SequenceBuilder":
+        self._steps.append(("at", x, y))
+        return self
+
+    def atCurrent(self) -> "SequenceBuilder":
+        self._steps.append(("at", CURRENT, CURRENT))
+        return self
+
+    def click(self, count: int = 1, gapNs: int = 0) -> "SequenceBuilder":
+        self._steps.append(("click", count, gapNs))
+        return self
+
+    def hold(self, durationNs: int) -> "SequenceBuilder":
+        self._steps.append(("hold", durationNs))
+        return self
+
+    def wait(self, durationNs: int) -> "SequenceBuilder":
+        self._steps.append(("wait", durationNs))
+        return self
+
+    def rate(self, cps: float, durationNs: int) -> "SequenceBuilder":
+        return self.ramp(cps, cps, durationNs)
+
+    def ramp(self, startCps: float, endCps: float, durationNs: int) -> "SequenceBuilder":
+        if startCps < 0 or endCps < 0 or startCps + endCps == 0:
+            raise ValueError("Click rates must be positive")
+        self._steps.append(("ramp", startCps, endCps, durationNs))
+        return self
+
+    def repeat(self, count: int, body: "SequenceBuilder") -> "SequenceBuilder":
+        self._steps.append(("repeat", count, body))
+        return self
+
+    def compile(self) -> Timeline:
+        timeline: Timeline = Timeline()
+        state: dict = {"button": "left", "x": CURRENT, "y": CURRENT, "moved": False}
+        timeline.duration = self._compileInto(timeline, 0, state)
+        return timeline
+
+    def _compileInto(self, timeline: Timeline, offset: int, state: dict) -> int:
+        for step in self._steps:
+            name: str = step[0]
+            if name == "button":
+                state["button"] = step[1]
+            elif name == "at":
+                state["x"], state["y"] = step[1], step[2]
+                state["moved"] = False
+            elif name == "wait":
+                offset += step[1]
+            elif name == "click":
+                # Every click takes up its gap, so the next statement starts one gap after the last click
+                for n in range(step[1]):
+                    self._emit(timeline, offset + n * step[2], KIND_CLICK, state)
+                offset += step[1] * step[2]
+            elif name == "hold":
+                self._emit(timeline, offset, KIND_PRESS, state)
+                offset += step[1]
+                self._emit(timeline, offset, KIND_RELEASE, state)
+            elif name == "ramp":
+                for clickOffset in self._rampOffsets(step[1], step[2], step[3]):
+                    self._emit(timeline, offset + clickOffset, KIND_CLICK, state)
+                offset += step[3]
+            elif name == "repeat":
+                for _ in range(step[1]):
+                    offset = step[2]._compileInto(timeline, offset, state)
+        return offset
+
+    @staticmethod
+    def _emit(timeline: Timeline, offset: int, kind: int, state: dict) -> None:
+        # A fixed position only needs a move before the first action after it was set
+        if state["x"] != CURRENT and not state["moved"]:
+            timeline.append(offset, ACTION_MOVE, state["x"], state["y"])
+            state["moved"] = True
+        timeline.append(offset, kind * 3 + BUTTON_CODES[state["button"]], state["x"], state["y"])
+
+    @staticmethod
+    def _rampOffsets(startCps: float, endCps: float, durationNs: int) -> List[int]:
+        # Click n happens when the integral of the linearly changing rate reaches n
+        seconds: float = durationNs / 1e9
+        a: float = (endCps - startCps) / (2 * seconds) if seconds > 0 else 0.0
+        offsets: List[int] = []
+        n: int = 0
+        while True:
+            if a == 0:
+                t: float = n / startCps
+            else:
+                discriminant: float = startCps * startCps + 4 * a * n
+                if discriminant < 0:
+                    return offsets
+                t = (-startCps + math.sqrt(discriminant)) / (2 * a)
+            if t >= seconds:
+                return offsets
+            offsets.append(round(t * 1e9))
+            n += 1
+
+
+def parseSequence(text: str) -> SequenceBuilder:
+    # One statement per line, "repeat N" opens a block closed by "end" and "#" starts a comment
+    stack: List[tuple] = [(None, SequenceBuilder())]
+    for lineNumber, line in enumerate(text.splitlines(), 1):
+        words: List[str] = line.split("#", 1)[0].split()
+        if not words:
+            continue
+        builder: SequenceBuilder = stack[-1][1]
+        command: str = words[0].lower()
+        try:
+            if command == "button" and len(words) == 2:
+                builder.button(words[1].lower())
+            elif command == "at" and len(words) == 2 and words[1].lower() == "current":
+                builder.atCurrent()
+            elif command == "at" and len(words) == 3:
+                builder.at(int(words[1]), int(words[2]))
+            elif command == "click" and len(words) in (1, 2):
+                builder.click(int(words[1]) if len(words) == 2 else 1)
+            elif command == "click" and len(words) == 4 and words[2] == "gap":
+                builder.click(int(words[1]), parseDuration(words[3]))
+            elif command == "hold" and len(words) == 2:
+                builder.hold(parseDuration(words[1]))
+            elif command == "wait" and len(words) == 2:
+                builder.wait(parseDuration(words[1]))
+            elif command == "rate" and len(words) == 4 and words[2] == "for":
+                builder.rate(float(words[1]), parseDuration(words[3]))
+            elif command == "ramp" and len(words) == 6 and words[2] == "to" and words[4] == "over":
+                builder.ramp(float(words[1]), float(words[3]), parseDuration(words[5]))
+            elif command == "repeat" and len(words) == 2:
+                stack.append((int(words[1]), SequenceBuilder()))
+            elif command == "end" and len(words) == 1 and len(stack) > 1:
+                count, body = stack.pop()
+                stack[-1][1].repeat(count, body)
+            else:
+                raise ValueError(f"Unknown statement '{line.strip()}'")
+        except ValueError as e:
+            raise ValueError(f"Line {lineNumber}: {e}")
+    if len(stack) > 1:
+        raise ValueError("Missing 'end' for 'repeat'")
+    return stack[0][1]
+
+
+def loadSequence(path: str) -> Timeline:
+    with open(path, "r") as file:
+        return parseSequence(file.read()).compile()
+
+
+class SequenceThread(Thread):
+    def __init__(self, timeline: Timeline, backend: InputBackend = None, loops: int = 1, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        if loops != 1 and len(timeline) and timeline.duration <= 0:
+            # Each loop would start where the last one did, so it would click as fast as it can
+            raise ValueError("A sequence that takes no time can't loop, add a wait or a click gap")
+        self._timeline: Timeline = timeline
+        self._backend: InputBackend = backend if backend is not None else getDefaultBackend()
+        self._loops: int = loops
+        self._running: bool = True
+        # Stopping interrupts the wait for the next event instead of letting it run out
+        self._stopped: Event = Event()
+        self._scheduler: DeadlineScheduler = DeadlineScheduler(1, interrupt=self._stopped)
+        self._heldButtons: Set[str] = set()
+
+    def stop(self) -> None:
+        self._running = False
+        self._stopped.set()
+
+    def getStats(self) -> dict:
+        return self._scheduler.getStats()
+
+    def _buildHandlers(self) -> list:
+        # One prebound function per action code, so executing a step is a single indexed call
+        backend: InputBackend = self._backend
+        held: Set[str] = self._heldButtons
+        handlers: list = [None] * (ACTION_MOVE + 1)
+        for code, button in enumerate(BUTTON_NAMES):
+            def click(x, y, button=button):
+                backend.press(button)
+                backend.release(button)
+
+            def press(x, y, button=button):
+                backend.press(button)
+                held.add(button)
+
+            def release(x, y, button=button):
+                backend.release(button)
+                held.discard(button)
+
+            handlers[KIND_CLICK * 3 + code] = click
+            handlers[KIND_PRESS * 3 + code] = press
+            handlers[KIND_RELEASE * 3 + code] = release
+        handlers[ACTION_MOVE] = backend.move
+        return handlers
+
+    def run(self) -> None:
+        handlers: list = self._buildHandlers()
+        waitUntil = self._scheduler.waitUntil
+        timeline: Timeline = self._timeline
+        offsets, actions, xs, ys = timeline.offsets, timeline.actions, timeline.xs, timeline.ys
+        count: int = len(timeline)
+        # Only clicks count towards the click stats, moves, presses and releases are wakes that count for nothing
+        clicks: bytes = bytes(1 if action < 3 else 0 for action in actions)
+
+        loop: int = 0
+        loopStart: int = time.perf_counter_ns()
+        while self._running and count and (self._loops == 0 or loop < self._loops):
+            for i in range(count):
+                waitUntil(loopStart + offsets[i], clicks[i])
+                if not self._running:
+                    break
+                handlers[actions[i]](xs[i], ys[i])
+            loopStart += timeline.duration
+            loop += 1
+
+        for button in self._heldButtons:
+            self._backend.release(button)
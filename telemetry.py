@@ -0,0 +1,164 @@
+from array import array
+import csv
+import json
+import time
+
+# Histogram buckets: exact below 2^SUB_BITS, then 2^(SUB_BITS - 1) buckets per power of two (about 3% precision)
+SUB_BITS: int = 6
+SUB_COUNT: int = 1 << SUB_BITS
+HALF_COUNT: int = SUB_COUNT >> 1
+
+
+class LatencyHistogram:
+    def __init__(self, maxValueBits: int = 42) -> None:
+        # 2^42 ns is over an hour; larger values land in the last bucket
+        self._maxShift: int = maxValueBits - SUB_BITS
+        self._counts = array("Q", bytes(8 * ((self._maxShift + 1) * HALF_COUNT + SUB_COUNT)))
+        self.count: int = 0
+        self.total: int = 0
+        self.max: int = 0
+
+    def record(self, value: int) -> None:
+        if value < 0:
+            value = 0
+        if value < SUB_COUNT:
+            index: int = value
+        else:
+            shift: int = value.bit_length() - SUB_BITS
+            if shift > self._maxShift:
+                index = len(self._counts) - 1
+            else:
+                index = shift * HALF_COUNT + (value >> shift)
+        self._counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def reset(self) -> None:
+        for i in range(len(self._counts)):
+            self._counts[i] = 0
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    @staticmethod
+    def bucketRange(index: int) -> tuple:
+        if index < SUB_COUNT:
+            return index, index
+        shift: int = index // HALF_COUNT - 1
+        low: int = (index - shift * HALF_COUNT) << shift
+        return low, low + (1 << shift) - 1
+
+    def percentile(self, percent: float) -> int:
+        if self.count == 0:
+            return 0
+        target: float = self.count * percent / 100
+        seen: int = 0
+        for index, bucketCount in enumerate(self._counts):
+            seen += bucketCount
+            if bucketCount and seen >= target:
+                return min(self.bucketRange(index)[1], self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def buckets(self) -> list:
+        return [(self.bucketRange(index)[0], count) for index, count in enumerate(self._counts) if count]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.mean(),
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "p999": self.percentile(99.9),
+            "max": self.max,
+        }
+
+
+class RateWindow:
+    def __init__(self, slotNs: int = 100_000_000, slots: int = 600) -> None:
+        # Counts per time slot in a ring, covering slotNs * slots (one minute by default)
+        self._slotNs: int = slotNs
+        self._slots: int = slots
+        self._counts = array("Q", bytes(8 * slots))
+        self._currentSlot: int = 0
+        self._firstSlot: int = None
+
+    def record(self, nowNs: int, count: int = 1) -> None:
+        slot: int = nowNs // self._slotNs
+        if slot != self._currentSlot:
+            # Clear the slots that were skipped since the last event
+            for skipped in range(self._currentSlot + 1, min(slot, self._currentSlot + self._slots) + 1):
+                self._counts[skipped % self._slots] = 0
+            if self._firstSlot is None:
+                self._firstSlot = slot
+            self._currentSlot = slot
+        self._counts[slot % self._slots] += count
+
+    def rate(self, windowNs: int, nowNs: int = None) -> float:
+        # Read only, so it can be called from another thread while clicks are recorded
+        if nowNs is None:
+            nowNs = time.perf_counter_ns()
+        if self._firstSlot is None:
+            return 0.0
+        slot: int = nowNs // self._slotNs
+        current: int = self._currentSlot
+
+        # The current slot is still filling, so the window ends at the last complete one
+        slots: int = min(max(1, windowNs // self._slotNs), self._slots - 1, slot - self._firstSlot)
+        if slots <= 0:
+            return 0.0
+        total: int = 0
+        for past in range(slot - slots, slot):
+            if current - self._slots < past <= current:
+                total += self._counts[past % self._slots]
+        return total * 1e9 / (slots * self._slotNs)
+
+
+class ClickTelemetry:
+    def __init__(self) -> None:
+        self.lateness: LatencyHistogram = LatencyHistogram()
+        self.intervals: LatencyHistogram = LatencyHistogram()
+        self.rates: RateWindow = RateWindow()
+        self._lastNs: int = 0
+
+    def record(self, nowNs: int, latenessNs: int, clicks: int = 1) -> None:
+        self.lateness.record(latenessNs)
+        if self._lastNs:
+            self.intervals.record(nowNs - self._lastNs)
+        self._lastNs = nowNs
+        self.rates.record(nowNs, clicks)
+
+    def snapshot(self) -> dict:
+        now: int = time.perf_counter_ns()
+        return {
+            "latenessNs": self.lateness.summary(),
+            "intervalNs": self.intervals.summary(),
+            "cps1s": self.rates.rate(1_000_000_000, now),
+            "cps10s": self.rates.rate(10_000_000_000, now),
+            "cps60s": self.rates.rate(60_000_000_000, now),
+        }
+
+    def exportJSON(self, path: str) -> None:
+        data: dict = self.snapshot()
+        data["latenessBuckets"] = self.lateness.buckets()
+        data["intervalBuckets"] = self.intervals.buckets()
+        with open(path, "w") as file:
+            json.dump(data, file, indent=2)
+
+    def exportCSV(self, path: str) -> None:
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["metric", "bucket_start_ns", "count"])
+            for name, histogram in (("lateness", self.lateness), ("interval", self.intervals)):
+                for start, count in histogram.buckets():
+                    writer.writerow([name, start, count])
+
+    def export(self, path: str) -> None:
+        if path.lower().endswith(".csv"):
+            self.exportCSV(path)
+        else:
+            self.exportJSON(path)
@@ -0,0 +1,10 @@
+import pytest
+
+import autoclicker
+
+
+def test_positionJitterNeedsAPosition(capsys):
+    with pytest.raises(SystemExit) as exit:
+        autoclicker.main(["run", "--backend", "recording", "--clicks", "1", "--pos-jitter", "3"])
+    assert exit.value.code == 2
+    assert "--pos-jitter needs --pos" in capsys.readouterr().err
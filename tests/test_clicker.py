@@ -0,0 +1,215 @@
+from collections import Counter
+import gc
+import sys
+from threading import current_thread
+import time
+import tracemalloc
+
+import pytest
+
+from backend import BUTTON_CODES, EVENT_PRESS, RecordingBackend
+from clicker import ClickEngine, ClickSession
+
+
+class CountingBackend(RecordingBackend):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: Counter = Counter()
+
+    def queryCursorInto(self, pos) -> None:
+        self.calls["queryCursorInto"] += 1
+        super().queryCursorInto(pos)
+
+    def move(self, x: int, y: int) -> None:
+        self.calls["move"] += 1
+        super().move(x, y)
+
+    def press(self, button: str) -> None:
+        self.calls["press"] += 1
+        super().press(button)
+
+    def release(self, button: str) -> None:
+        self.calls["release"] += 1
+        super().release(button)
+
+
+def test_fixedPositionOnlyMovesWhenTheCursorIsElsewhere():
+    backend = CountingBackend()
+    session = ClickSession(100_000, False, "left", (100, 200), backend, maxClicks=1000)
+    session.run()
+    assert backend.calls == Counter(queryCursorInto=1000, move=1, press=1000, release=1000)
+    assert session.getStats()["events"] == backend.eventCount() == 2001
+
+
+class WanderingBackend(RecordingBackend):
+    # Something else drags the cursor away after the 500th click
+    def release(self, button: str) -> None:
+        super().release(button)
+        if len(self.pressTimes()) == 500:
+            self._cursor.x, self._cursor.y = 0, 0
+
+
+def test_fixedPositionFollowsACursorMovedMidSession():
+    backend = WanderingBackend()
+    session = ClickSession(100_000, False, "left", (100, 200), backend, maxClicks=1000)
+    session.run()
+    presses: list = [event for event in backend.events() if event[1] == EVENT_PRESS]
+    assert all((x, y) == (100, 200) for _, _, _, x, y in presses)
+    assert session.getStats()["events"] == backend.eventCount() == 2002
+
+
+def test_inPlaceClickingOnlyPressesAndReleases():
+    backend = CountingBackend()
+    ClickSession(100_000, False, "left", None, backend, maxClicks=1000).run()
+    assert backend.calls == Counter(press=1000, release=1000)
+
+
+def runLimitedSession(clickPos: tuple, batchSize: int, clicks: int, traced: bool) -> tuple:
+    # Returns the blocks the session left allocated and, when traced, the most memory it held at once
+    session = ClickSession(10_000_000, False, "left", clickPos, RecordingBackend(), batchSize, maxClicks=clicks)
+    gc.collect()
+    blocks: int = sys.getallocatedblocks()
+    if traced:
+        tracemalloc.start()
+    session.run()
+    peak: int = tracemalloc.get_traced_memory()[1] if traced else 0
+    if traced:
+        tracemalloc.stop()
+    assert session.getStats()["clicks"] == clicks
+    return sys.getallocatedblocks() - blocks, peak
+
+
+@pytest.mark.parametrize("clickPos, batchSize", [(None, 1), ((100, 100), 1), ((100, 100), 16)])
+def test_clickLoopDoesNotAllocatePerClick(clickPos, batchSize):
+    # The first run warms up every cache the loop touches
+    runLimitedSession(clickPos, batchSize, 20_000, False)
+    retainedBlocks, _ = runLimitedSession(clickPos, batchSize, 20_000, False)
+    _, peakBytes = runLimitedSession(clickPos, batchSize, 20_000, True)
+    # A handful of one-off blocks, but nothing that grows with the clicks
+    assert retainedBlocks < 200
+    assert peakBytes < 16_384
+
+
+@pytest.mark.parametrize("clickPos, batchSize", [(None, 1), ((100, 100), 1), ((100, 100), 16), ((100, 100), 7)])
+def test_clickLimitIsExact(clickPos, batchSize):
+    backend = RecordingBackend()
+    session = ClickSession(100_000, False, "left", clickPos, backend, batchSize, maxClicks=1000)
+    session.run()
+    stats: dict = session.getStats()
+    assert stats["finished"] and stats["clicks"] == 1000
+    assert len(backend.pressTimes()) == 1000
+    assert stats["events"] == backend.eventCount()
+
+
+def test_durationLimitEndsOnItsLastClick():
+    backend = RecordingBackend()
+    session = ClickSession(200, False, "left", (100, 100), backend, maxDuration=0.25)
+    session.run()
+    stats: dict = session.getStats()
+    assert stats["finished"] and stats["clicks"] == 50
+    assert stats["events"] == backend.eventCount()
+
+
+def test_burstIsExact():
+    backend = RecordingBackend(1 << 16)
+    session = ClickSession(1, False, "left", None, backend, maxClicks=20_001, burst=True)
+    session.run()
+    stats: dict = session.getStats()
+    assert stats["clicks"] == 20_001 and len(backend.pressTimes()) == 20_001
+    assert stats["events"] == backend.eventCount()
+
+
+class FailingBackend(RecordingBackend):
+    def __init__(self) -> None:
+        super().__init__()
+        self.failures: int = 1
+
+    def press(self, button: str) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise OSError("backend went away")
+        super().press(button)
+
+
+def test_engineSurvivesAFailingSession():
+    backend = FailingBackend()
+    engine = ClickEngine(backend, daemon=True)
+    engine.start()
+    try:
+        engine.startSession(100_000, False, "left", maxClicks=10)
+        assert engine.waitIdle(5)
+        assert engine.lastError == "OSError: backend went away"
+
+        engine.startSession(100_000, False, "left", maxClicks=10)
+        assert engine.waitIdle(5)
+        assert engine.getStats()["clicks"] == 10
+        assert len(backend.pressTimes()) == 10
+    finally:
+        engine.shutdown()
+        engine.join(5)
+    assert not engine.is_alive()
+
+
+class ThreadRecordingBackend(RecordingBackend):
+    def __init__(self) -> None:
+        super().__init__()
+        self.threads: set = set()
+
+    def press(self, button: str) -> None:
+        self.threads.add(current_thread().name)
+        super().press(button)
+
+
+def test_engineRunsEverySessionOnItsOneWorker():
+    backend = ThreadRecordingBackend()
+    engine = ClickEngine(backend, name="Engine", daemon=True)
+    engine.start()
+    try:
+        for button in ("left", "right", "middle"):
+            engine.startSession(100_000, False, button, maxClicks=5)
+            assert engine.waitIdle(5)
+        assert backend.threads == {"Engine"}
+        assert len(backend.pressTimes()) == 15
+    finally:
+        engine.shutdown()
+        engine.join(5)
+
+
+def test_newSessionReplacesTheRunningOne():
+    backend = RecordingBackend()
+    engine = ClickEngine(backend, daemon=True)
+    engine.start()
+    try:
+        engine.startSession(1000, False, "left")
+        time.sleep(0.05)
+        engine.startSession(100_000, False, "right", maxClicks=10)
+        assert engine.waitIdle(5)
+        stats: dict = engine.getStats()
+        assert stats["finished"] and stats["clicks"] == 10
+        # The first session stopped before the second one clicked
+        buttons: list = [event[2] for event in backend.events() if event[1] == EVENT_PRESS]
+        assert buttons[-10:] == [BUTTON_CODES["right"]] * 10
+        assert BUTTON_CODES["right"] not in buttons[:-10]
+    finally:
+        engine.shutdown()
+        engine.join(5)
+
+
+def test_stopAndReconfigureReachTheRunningSession():
+    backend = RecordingBackend()
+    engine = ClickEngine(backend, daemon=True)
+    engine.start()
+    try:
+        engine.startSession(1000, False, "left", (10, 10))
+        time.sleep(0.05)
+        engine.reconfigure(1000, (20, 20))
+        time.sleep(0.05)
+        assert not engine.waitIdle(0)
+        engine.stopSession()
+        assert engine.waitIdle(5)
+        positions: list = [(event[3], event[4]) for event in backend.events() if event[1] == EVENT_PRESS]
+        assert positions[0] == (10, 10) and positions[-1] == (20, 20)
+    finally:
+        engine.shutdown()
+        engine.join(5)
+    assert not engine.is_alive()
@@ -0,0 +1,64 @@
+from commandbus import CommandBus
+
+
+class FakeTk:
+    # Collects scheduled callbacks instead of running a main loop
+    def __init__(self) -> None:
+        self.scheduled: list = []
+
+    def after(self, ms: int, func) -> None:
+        self.scheduled.append(func)
+
+    def after_idle(self, func) -> None:
+        self.scheduled.append(func)
+
+    def runPending(self) -> int:
+        ran: int = len(self.scheduled)
+        scheduled, self.scheduled = self.scheduled, []
+        for func in scheduled:
+            func()
+        return ran
+
+
+def test_idleBusSchedulesNothing():
+    tk = FakeTk()
+    bus = CommandBus(tk)
+    assert tk.runPending() == 1
+    assert tk.runPending() == 0
+
+
+def test_postsBeforeTheLoopRunAreDrainedByTheFirstPass():
+    tk = FakeTk()
+    bus = CommandBus(tk)
+    calls: list = []
+    bus.post(calls.append, 1)
+    bus.post(calls.append, 2)
+    assert len(tk.scheduled) == 1
+    tk.runPending()
+    assert calls == [1, 2]
+    assert bus.posted == bus.drained == 2
+
+
+def test_onePostArmsOneDrain():
+    tk = FakeTk()
+    bus = CommandBus(tk)
+    tk.runPending()
+    calls: list = []
+    for n in range(5):
+        bus.post(calls.append, n)
+    assert len(tk.scheduled) == 1
+    tk.runPending()
+    assert calls == [0, 1, 2, 3, 4]
+    assert tk.runPending() == 0
+
+
+def test_commandPostedDuringADrainIsNotLost():
+    tk = FakeTk()
+    bus = CommandBus(tk)
+    tk.runPending()
+    calls: list = []
+    bus.post(lambda: bus.post(calls.append, "later"))
+    tk.runPending()
+    tk.runPending()
+    assert calls == ["later"]
+    assert tk.runPending() == 0
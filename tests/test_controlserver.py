@@ -0,0 +1,53 @@
+import os
+import stat
+import tempfile
+
+from backend import RecordingBackend
+from clicker import Clicker
+from controlserver import ControlClient, ControlServer
+
+
+class FailingClicker(Clicker):
+    def reconfigure(self, interval: float, clickPos: tuple = None):
+        raise RuntimeError("engine went away")
+
+
+def test_handlerErrorsBecomeErrorReplies():
+    clicker = FailingClicker(RecordingBackend())
+    with tempfile.TemporaryDirectory() as directory:
+        server = ControlServer(clicker, os.path.join(directory, "control.sock"), daemon=True)
+        server.start()
+        server.waitReady(5)
+        client = ControlClient(os.path.join(directory, "control.sock"))
+        try:
+            assert client.request("start", cps=100, maxClicks=10)["ok"]
+            reply: dict = client.request("reconfigure", cps=50)
+            assert not reply["ok"] and "engine went away" in reply["error"]
+            # The connection survived the failure
+            assert client.request("status")["ok"]
+            assert not client.request("start", cps=-1)["ok"]
+        finally:
+            client.close()
+            server.stop()
+            server.join(5)
+            clicker.stopClicking()
+
+
+def test_socketIsPrivateFromTheMomentItIsBound():
+    clicker = Clicker(RecordingBackend())
+    oldUmask: int = os.umask(0)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            path: str = os.path.join(directory, "control.sock")
+            server = ControlServer(clicker, path, daemon=True)
+            server.start()
+            try:
+                assert server.waitReady(5)
+                assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+            finally:
+                server.stop()
+                server.join(5)
+    finally:
+        os.umask(oldUmask)
+    # The rest of the process keeps its own umask
+    assert os.umask(oldUmask) == oldUmask
@@ -0,0 +1,24 @@
+import inspect
+import struct
+
+import pytest
+
+import engineprocess
+from clicker import Clicker
+from engineprocess import BLOCK_SIZE, ControlBlock, ProcessClicker
+
+
+def test_readGivesUpOnAnUnfinishedWrite(monkeypatch):
+    monkeypatch.setattr(engineprocess, "READ_TIMEOUT", 0.05)
+    buffer = bytearray(BLOCK_SIZE)
+    block = ControlBlock(buffer)
+    block.writeControl(1, 0, True, False, False, False, 0, False, 10.0, 0, 0, 1, 0, 0.0, b"")
+    assert block.readControl()[0] == 1
+    # A writer that died after making the sequence odd
+    struct.pack_into("<Q", buffer, 0, 3)
+    with pytest.raises(TimeoutError):
+        block.readControl()
+
+
+def test_startClickingMatchesTheInProcessClicker():
+    assert inspect.signature(ProcessClicker.startClicking) == inspect.signature(Clicker.startClicking)
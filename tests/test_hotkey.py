@@ -0,0 +1,73 @@
+import pytest
+
+pytest.importorskip("keyboard")
+
+from hotkey import CHORD_TIMEOUT_NS, HotkeyDispatcher, HotkeyHandler
+
+
+def listen(*hotkeys: str, requireToggle: bool = False) -> tuple:
+    dispatcher = HotkeyDispatcher(installHook=False)
+    handler = HotkeyHandler(dispatcher)
+    fired: list = []
+    for hotkey in hotkeys:
+        handler.startListeningToKey(hotkey, lambda hotkey=hotkey: fired.append(hotkey), requireToggle)
+    return dispatcher, fired
+
+
+def tap(dispatcher: HotkeyDispatcher, *keys: str, receivedNs: int = None) -> None:
+    for key in keys:
+        dispatcher.feed(key, True, receivedNs)
+    for key in reversed(keys):
+        dispatcher.feed(key, False, receivedNs)
+
+
+def test_comboNeedsExactlyItsModifiers():
+    dispatcher, fired = listen("ctrl+g")
+    tap(dispatcher, "g")
+    tap(dispatcher, "left ctrl", "shift", "g")
+    assert fired == []
+    tap(dispatcher, "left ctrl", "g")
+    assert fired == ["ctrl+g"]
+
+
+def test_chordStepsFollowEachOther():
+    dispatcher, fired = listen("ctrl+k, g")
+    tap(dispatcher, "ctrl", "k")
+    tap(dispatcher, "x")
+    tap(dispatcher, "g")
+    assert fired == []
+    tap(dispatcher, "ctrl", "k")
+    tap(dispatcher, "g")
+    assert fired == ["ctrl+k, g"]
+
+
+def test_chordTimesOut():
+    dispatcher, fired = listen("ctrl+k, g")
+    tap(dispatcher, "ctrl", "k", receivedNs=0)
+    tap(dispatcher, "g", receivedNs=CHORD_TIMEOUT_NS + 1)
+    assert fired == []
+
+
+def test_repeatsOnlyRetriggerWithoutToggle():
+    dispatcher, fired = listen("f6")
+    dispatcher.feed("f6", True)
+    dispatcher.feed("f6", True)
+    dispatcher.feed("f6", False)
+    assert fired == ["f6", "f6"]
+
+    dispatcher, fired = listen("f6", requireToggle=True)
+    dispatcher.feed("f6", True)
+    dispatcher.feed("f6", True)
+    dispatcher.feed("f6", False)
+    assert fired == ["f6"]
+
+
+def test_bareModifierIsAHotkey():
+    dispatcher, fired = listen("shift", "ctrl+alt", "ctrl+g")
+    tap(dispatcher, "left shift")
+    tap(dispatcher, "right ctrl", "alt")
+    assert fired == ["shift", "ctrl+alt"]
+    # Held as modifiers of something else they don't fire, and still work as modifiers
+    tap(dispatcher, "ctrl", "shift")
+    tap(dispatcher, "ctrl", "g")
+    assert fired == ["shift", "ctrl+alt", "ctrl+g"]
@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+import numpy
+
+from jitter import INTERVAL_DISTRIBUTIONS, Jitter, SampleRing
+
+
+@pytest.mark.parametrize("kind", INTERVAL_DISTRIBUTIONS)
+def test_intervalsHaveTheConfiguredMeanAndSpread(kind):
+    timeline = Jitter(kind, 0.2, seed=1234).timeline(100, 100_000)
+    intervals = timeline[1:] - timeline[:-1]
+    assert abs(intervals.mean() / 1e7 - 1) < 0.01
+    assert abs(intervals.std() / intervals.mean() - 0.2) < 0.01
+
+
+@pytest.mark.parametrize("kind", INTERVAL_DISTRIBUTIONS)
+def test_seedReproducesTheTimeline(kind):
+    timeline = Jitter(kind, 0.2, seed=1234).timeline(100, 10_000)
+    rings: list = Jitter(kind, 0.2, seed=1234).createRings()
+    samples: list = [int(rings[0].take() * 1e7) for _ in range(9_999)]
+    assert samples == (timeline[1:] - timeline[:-1]).tolist()
+
+
+def test_failedRefillFallsBackToSynchronousSampling():
+    calls: list = [0]
+
+    def flaky(count: int):
+        calls[0] += 1
+        # The first background refill fails
+        if calls[0] == 2:
+            raise RuntimeError("sampler broke")
+        return numpy.full(count, calls[0])
+
+    ring = SampleRing(flaky, 4)
+    assert [ring.take() for _ in range(8)] == [1] * 4 + [3] * 4
+    # The refill thread survived and keeps serving other rings
+    other = SampleRing(lambda count: numpy.arange(count), 4)
+    assert [other.take() for _ in range(8)] == [0, 1, 2, 3] * 2
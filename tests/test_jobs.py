@@ -0,0 +1,50 @@
+import time
+
+from backend import RecordingBackend
+from jobs import JobScheduler
+
+
+class RightButtonBrokenBackend(RecordingBackend):
+    def press(self, button: str) -> None:
+        if button == "right":
+            raise OSError("right button unavailable")
+        super().press(button)
+
+
+def runJobs(scheduler: JobScheduler, seconds: float) -> None:
+    scheduler.start()
+    time.sleep(seconds)
+    scheduler.stop()
+    scheduler.join(5)
+
+
+def test_jobsKeepTheirRatesSideBySide():
+    scheduler = JobScheduler(RecordingBackend(), daemon=True)
+    fast: int = scheduler.addJob(200, "left")
+    slow: int = scheduler.addJob(50, "right")
+    runJobs(scheduler, 0.5)
+    fastClicks: int = scheduler.getJobStats(fast)["clicks"]
+    slowClicks: int = scheduler.getJobStats(slow)["clicks"]
+    assert 80 <= fastClicks <= 101 and 20 <= slowClicks <= 26
+
+
+def test_pausedJobStopsClicking():
+    scheduler = JobScheduler(RecordingBackend(), daemon=True)
+    jobId: int = scheduler.addJob(1000, "left")
+    scheduler.pauseJob(jobId)
+    runJobs(scheduler, 0.1)
+    assert scheduler.getJobStats(jobId)["clicks"] == 0
+
+
+def test_failingJobIsPausedAndTheOthersCarryOn():
+    backend = RightButtonBrokenBackend()
+    scheduler = JobScheduler(backend, daemon=True)
+    healthy: int = scheduler.addJob(200, "left")
+    broken: int = scheduler.addJob(200, "right")
+    runJobs(scheduler, 0.3)
+    assert not scheduler.is_alive()
+    brokenStats: dict = scheduler.getJobStats(broken)
+    assert brokenStats["paused"] and brokenStats["clicks"] == 0
+    assert brokenStats["error"] == "OSError: right button unavailable"
+    assert scheduler.getJobStats(healthy)["clicks"] > 30
+    assert len(backend.pressTimes()) == scheduler.getJobStats(healthy)["clicks"]
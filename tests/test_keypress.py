@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+from backend import EVENT_KEY_PRESS, EVENT_KEY_RELEASE, RecordingBackend
+from jobs import JobScheduler
+from keypress import KeySession, parseKeys
+
+
+def test_parseKeys():
+    assert parseKeys("a") == [(30,)]
+    assert parseKeys("a, b, ctrl+c") == [(30,), (48,), (29, 46)]
+    assert parseKeys("sc:57") == [(57,)]
+    with pytest.raises(ValueError):
+        parseKeys("a,,b")
+
+
+@pytest.mark.parametrize("keys, batchSize, burst", [("a", 1, False), ("a, b, ctrl+c", 4, False), ("a, b, ctrl+c", 2, False), ("a, b, ctrl+c", 1, True)])
+def test_pressLimitIsExact(keys, batchSize, burst):
+    steps: list = parseKeys(keys)
+    backend = RecordingBackend()
+    session = KeySession(100_000, steps, backend=backend, batchSize=batchSize, maxPresses=1001, burst=burst)
+    session.run()
+    stats: dict = session.getStats()
+    assert stats["finished"] and stats["presses"] == 1001
+    assert stats["events"] == backend.eventCount() == sum(2 * len(steps[i % len(steps)]) for i in range(1001))
+
+
+@pytest.mark.parametrize("batchSize", [1, 2, 3, 64])
+def test_sequenceKeepsItsOrder(batchSize):
+    backend = RecordingBackend()
+    KeySession(100_000, parseKeys("a, b, ctrl+c"), backend=backend, batchSize=batchSize, maxPresses=100).run()
+    events: list = [(event[1], event[3]) for event in backend.events()]
+    cycle: list = [(EVENT_KEY_PRESS, 30), (EVENT_KEY_RELEASE, 30), (EVENT_KEY_PRESS, 48), (EVENT_KEY_RELEASE, 48),
+                   (EVENT_KEY_PRESS, 29), (EVENT_KEY_PRESS, 46), (EVENT_KEY_RELEASE, 46), (EVENT_KEY_RELEASE, 29)]
+    expected: list = []
+    for step in range(100):
+        expected += cycle[[0, 2, 4][step % 3]:[2, 4, 8][step % 3]]
+    assert events == expected
+
+
+def test_holdPressesThenReleasesInReverse():
+    backend = RecordingBackend()
+    session = KeySession(1, parseKeys("shift+a"), hold=True, backend=backend, maxDuration=0.05)
+    session.run()
+    assert [(event[1], event[3]) for event in backend.events()] == [(EVENT_KEY_PRESS, 42), (EVENT_KEY_PRESS, 30), (EVENT_KEY_RELEASE, 30), (EVENT_KEY_RELEASE, 42)]
+    assert session.getStats()["finished"]
+
+
+def test_mixedJobsShareOneScheduler():
+    backend = RecordingBackend()
+    scheduler = JobScheduler(backend, daemon=True)
+    scheduler.start()
+    clickJob: int = scheduler.addJob(200, "left")
+    keyJob: int = scheduler.addKeyJob(200, parseKeys("a, b"))
+    time.sleep(0.3)
+    scheduler.stop()
+    scheduler.join()
+    assert scheduler.getJobStats(clickJob)["clicks"] > 0 and scheduler.getJobStats(keyJob)["presses"] > 0
+    assert len(backend.pressTimes()) == scheduler.getJobStats(clickJob)["clicks"]
+    assert len(backend.keyPressTimes()) == scheduler.getJobStats(keyJob)["presses"]
@@ -0,0 +1,41 @@
+import os
+
+from backend import EVENT_MOVE, EVENT_PRESS, EVENT_RELEASE, RecordingBackend
+from macro import HEADER, MACRO_MAGIC, RECORD, MacroFile, MacroPlayer, MacroRecorder
+
+
+def writeMacro(path: str, records: list) -> None:
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MACRO_MAGIC, RECORD.size))
+        for record in records:
+            file.write(RECORD.pack(*record))
+
+
+def test_playbackClosesTheFile(tmp_path):
+    path: str = os.path.join(tmp_path, "clicks.acm")
+    writeMacro(path, [(0, EVENT_MOVE, -1, 10, 20), (1_000, EVENT_PRESS, 0, 0, 0), (2_000, EVENT_RELEASE, 0, 0, 0)])
+    macro = MacroFile(path)
+    backend = RecordingBackend()
+    player = MacroPlayer(macro, backend)
+    player.run()
+    assert backend.eventCount() == 3
+    assert macro._file.closed and macro._map.closed
+
+
+def test_stoppedPlaybackClosesTheFile(tmp_path):
+    path: str = os.path.join(tmp_path, "long.acm")
+    writeMacro(path, [(0, EVENT_PRESS, 0, 0, 0), (60_000_000_000, EVENT_RELEASE, 0, 0, 0)])
+    macro = MacroFile(path)
+    backend = RecordingBackend()
+    player = MacroPlayer(macro, backend, daemon=True)
+    player.start()
+    player.stop()
+    player.join(1)
+    assert not player.is_alive()
+    assert macro._file.closed
+    # The held button was released
+    assert backend.events()[-1][1] == EVENT_RELEASE
+
+
+def test_stoppingAnUnstartedRecorderDoesNothing(tmp_path):
+    MacroRecorder(os.path.join(tmp_path, "unused.acm")).stop()
@@ -0,0 +1,57 @@
+import gc
+
+import pytest
+
+numpy = pytest.importorskip("numpy")
+
+import matching
+from matching import Template, TemplateMatcher
+from watcher import SyntheticFramebuffer
+
+
+def makeScreen():
+    rng = numpy.random.default_rng(3)
+    screen = SyntheticFramebuffer(320, 240)
+    screen.pixels[:] = rng.integers(0, 255, screen.pixels.shape, dtype=numpy.uint8)
+    return screen
+
+
+def test_foundTemplate():
+    screen = makeScreen()
+    matcher = TemplateMatcher(screen)
+    template = Template(screen.pixels[100:140, 60:120].copy())
+    matcher.update()
+    match = matcher.locate(template)
+    assert (match.x, match.y) == (60, 100)
+
+
+def test_fftCacheDropsGoneTemplates():
+    screen = makeScreen()
+    matcher = TemplateMatcher(screen)
+    matcher.update()
+    template = Template(screen.pixels[10:42, 10:42].copy())
+    matcher.locate(template)
+    assert matcher.getStats()["fftCacheEntries"] > 0
+    del template
+    gc.collect()
+    assert matcher.getStats()["fftCacheEntries"] == 0
+
+
+def test_fftCacheIsBounded(monkeypatch):
+    monkeypatch.setattr(matching, "FFT_CACHE_SIZE", 4)
+    screen = makeScreen()
+    matcher = TemplateMatcher(screen)
+    matcher.update()
+    template = Template(screen.pixels[10:42, 10:42].copy())
+    # Every search area size needs its own FFT shape
+    for size in range(20, 200, 10):
+        matcher._searchLevel(template, 1.0, 0, 0, 0, size, size)
+    assert matcher.getStats()["fftCacheEntries"] == 4
+
+
+def test_noScalesFindsNothing():
+    screen = makeScreen()
+    matcher = TemplateMatcher(screen)
+    matcher.update()
+    template = Template(screen.pixels[10:42, 10:42].copy(), scales=())
+    assert matcher.locate(template) is None
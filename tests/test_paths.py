@@ -0,0 +1,37 @@
+import tracemalloc
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from paths import gridPath, pointsPath
+
+
+def test_columnsShareOneIntPerValue():
+    xs, ys, clicks = gridPath(0, 0, 30, 20, 5, 5).iterationColumns()
+    assert xs[:3] == [0, 5, 10] and ys[30] == 5
+    assert len({id(value) for value in xs + ys}) == len(set(xs + ys))
+    assert clicks == [1] * 600
+
+
+def test_outlierDoesNotAllocateTheSpan():
+    path = pointsPath([(0, 0), (10, 10), (2_000_000_000, 5)])
+    tracemalloc.start()
+    xs, ys, _ = path.iterationColumns()
+    peak: int = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert (xs, ys) == ([0, 10, 2_000_000_000], [0, 10, 5])
+    assert peak < 65_536
+
+
+def test_sessionClicksTargetsInOrder():
+    from backend import EVENT_PRESS, RecordingBackend
+    from clicker import ClickSession
+
+    path = gridPath(0, 0, 20, 10, 5, 5, snake=True).interpolate(3)
+    backend = RecordingBackend(1 << 16)
+    ClickSession(1_000_000, False, "left", None, backend, path=path, maxClicks=500).run()
+    presses: list = [(event[3], event[4]) for event in backend.events() if event[1] == EVENT_PRESS]
+    targets: list = list(zip(path.xs[path.clicks].tolist(), path.ys[path.clicks].tolist()))
+    assert len(presses) == 500
+    assert presses == [targets[i % len(targets)] for i in range(500)]
@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+from threading import Event
+import time
+
+import pytest
+
+pytest.importorskip("keyboard")
+
+import profiles
+from profiles import ProfileStore, ProfileWatcher, parseProfile
+
+
+def watchWhileWriting(directory: str, watchFunc=None) -> bool:
+    path: str = os.path.join(directory, "profiles.json")
+    changed: Event = Event()
+    watcher = ProfileWatcher(path, changed.set, daemon=True)
+    if watchFunc is not None:
+        watcher.run = lambda: watchFunc(watcher)
+    watcher.start()
+    try:
+        # Gives the watcher time to start watching before the file appears
+        time.sleep(0.2)
+        with open(path, "w") as file:
+            file.write("{}")
+        return changed.wait(5)
+    finally:
+        watcher.stop()
+        watcher.join(5)
+        assert not watcher.is_alive()
+
+
+def test_watcherSeesTheFileWritten():
+    with tempfile.TemporaryDirectory() as directory:
+        assert watchWhileWriting(directory)
+
+
+def test_pollingWatcherSeesTheFileWritten(monkeypatch):
+    # What runs where there's no inotify, e.g. macOS
+    monkeypatch.setattr(profiles, "POLL_INTERVAL", 0.05)
+    with tempfile.TemporaryDirectory() as directory:
+        assert watchWhileWriting(directory, ProfileWatcher._watchPolling)
+
+
+def test_parseProfileValidatesEveryField():
+    profile = parseProfile("fast", {"cps": 20, "button": "right", "position": [5, 6], "batchSize": 4, "switchKey": "Ctrl+1"})
+    assert profile.startArgs == (20.0, "right", (5, 6), False, 4)
+    assert profile.switchKey == "ctrl+1"
+    for data in ({"cps": 0}, {"cps": True}, {"button": "thumb"}, {"position": [1]}, {"batchSize": 0}, {"timeFormat": "hz"}, {"startKey": "ctrl+"}):
+        with pytest.raises(ValueError):
+            parseProfile("bad", data)
+
+
+def test_storeRoundTripsAndSkipsBadProfiles(capsys):
+    with tempfile.TemporaryDirectory() as directory:
+        store = ProfileStore(os.path.join(directory, "profiles.json"))
+        assert not store.load()
+        store.put(parseProfile("a", {"cps": 5}))
+        store.put(parseProfile("b", {"cps": 50, "position": [1, 2]}))
+        store.active = "b"
+        store.save()
+        assert store.isCurrent()
+
+        loaded = ProfileStore(store.path)
+        assert loaded.load()
+        assert loaded.active == "b"
+        assert {name: profile.startArgs for name, profile in loaded.profiles.items()} == {name: profile.startArgs for name, profile in store.profiles.items()}
+
+        with open(store.path, "w") as file:
+            json.dump({"active": "gone", "profiles": {"ok": {"cps": 1}, "broken": {"cps": -1}}}, file)
+        assert not store.isCurrent()
+        assert store.load()
+        assert list(store.profiles) == ["ok"] and store.active == "ok"
+        assert "broken" in capsys.readouterr().out
+
+        # A file that can't be parsed keeps what was loaded
+        with open(store.path, "w") as file:
+            file.write("{")
+        assert not store.load()
+        assert list(store.profiles) == ["ok"]
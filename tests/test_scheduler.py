@@ -0,0 +1,88 @@
+from threading import Event, Timer
+import time
+
+import pytest
+
+from scheduler import INTERRUPTED, DeadlineScheduler
+
+
+def test_deadlinesAreExactOffsetsFromTheStart():
+    scheduler = DeadlineScheduler(3)
+    scheduler.start(1_000)
+    # A third of a second never rounds, however many ticks in
+    assert [scheduler.deadline(tick) for tick in range(4)] == [1_000, 333_334_333, 666_667_666, 1_000_001_000]
+    assert scheduler.deadline(3_000_000) == 1_000 + 1_000_000 * 1_000_000_000
+
+
+def test_waitNeverWakesBeforeItsDeadline():
+    scheduler = DeadlineScheduler(500)
+    scheduler.start()
+    for tick in range(20):
+        lateness: int = scheduler.wait()
+        assert lateness >= 0
+        assert time.perf_counter_ns() >= scheduler.deadline(tick)
+    assert scheduler.clicks() == 20
+    assert scheduler.getStats()["telemetry"]["latenessNs"]["count"] == 20
+
+
+def test_lateLoopCatchesUpWithoutDrifting():
+    scheduler = DeadlineScheduler(1000)
+    scheduler.start()
+    time.sleep(0.02)
+    # The ticks that were missed are due straight away, the rate over the run stays the same
+    for _ in range(10):
+        assert scheduler.wait() > 0
+    assert scheduler.nextDeadline() == scheduler.deadline(10)
+
+
+def test_interruptCutsAWaitShortAndKeepsTheTickDue():
+    interrupt: Event = Event()
+    scheduler = DeadlineScheduler(0.1, interrupt=interrupt)
+    scheduler.start()
+    scheduler.wait()
+    Timer(0.05, interrupt.set).start()
+    start: float = time.perf_counter()
+    assert scheduler.wait() == INTERRUPTED
+    assert time.perf_counter() - start < 1
+    assert scheduler.nextDeadline() == scheduler.deadline(1)
+    assert scheduler.clicks() == 1
+
+
+def test_clickLimitRefusesTheTickPastIt():
+    scheduler = DeadlineScheduler(100_000, clicksPerTick=4)
+    scheduler.setLimits(maxClicks=10)
+    scheduler.start()
+    assert scheduler.wait() != INTERRUPTED and scheduler.wait() != INTERRUPTED
+    assert scheduler.remainingClicks() == 2
+    assert scheduler.wait() == INTERRUPTED and scheduler.finished
+    assert scheduler.clicks() == 8
+
+
+def test_durationLimitCountsFromTheFirstStart():
+    scheduler = DeadlineScheduler(100)
+    scheduler.setLimits(maxDurationNs=50_000_000)
+    scheduler.start()
+    ticks: int = 0
+    while scheduler.wait() != INTERRUPTED:
+        ticks += 1
+        if ticks == 2:
+            scheduler.rebase(200)
+    assert scheduler.finished
+    # Two at 100 CPS, then every 5 ms from the second until 50 ms after the first start
+    assert 8 <= ticks <= 9
+
+
+def test_moveWakesAreNotClicks():
+    scheduler = DeadlineScheduler(1000)
+    scheduler.start()
+    scheduler.waitUntil(time.perf_counter_ns(), 0)
+    scheduler.wait()
+    stats: dict = scheduler.getStats()
+    assert stats["clicks"] == stats["ticks"] == 1
+    assert stats["telemetry"]["latenessNs"]["count"] == 2
+
+
+@pytest.mark.parametrize("rate", [0, -1])
+def test_rateMustBePositive(rate):
+    with pytest.raises(ValueError):
+        DeadlineScheduler(rate)
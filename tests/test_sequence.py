@@ -0,0 +1,45 @@
+import pytest
+
+from backend import RecordingBackend
+from sequence import SequenceThread, parseSequence
+
+
+def compileText(text: str):
+    return parseSequence(text).compile()
+
+
+def test_clickStatementsFollowEachOther():
+    timeline = compileText("click 2 gap 50ms\nclick 2 gap 50ms")
+    assert list(timeline.offsets) == [0, 50_000_000, 100_000_000, 150_000_000]
+    assert timeline.duration == 200_000_000
+
+
+def test_repeatedClicksTakeTime():
+    timeline = compileText("repeat 3\nclick 1 gap 10ms\nend")
+    assert list(timeline.offsets) == [0, 10_000_000, 20_000_000]
+    assert timeline.duration == 30_000_000
+
+
+def test_zeroDurationSequenceCantLoop():
+    timeline = compileText("click\nclick")
+    assert timeline.duration == 0
+    with pytest.raises(ValueError):
+        SequenceThread(timeline, RecordingBackend(), 0)
+    # Played once it is fine
+    backend = RecordingBackend()
+    SequenceThread(timeline, backend, 1).run()
+    assert len(backend.pressTimes()) == 2
+
+
+def test_negativeDurationsAreRejected():
+    for text in ("click 2 gap -5ms", "wait -1s", "hold -10us"):
+        with pytest.raises(ValueError):
+            compileText(text)
+
+
+def test_onlyClicksCountAsClicks():
+    timeline = compileText("at 10 10\nclick 3 gap 1ms\nhold 1ms\nbutton right\nclick")
+    assert timeline.clicks() == 4
+    thread = SequenceThread(timeline, RecordingBackend(), 1)
+    thread.run()
+    assert thread.getStats()["clicks"] == 4
@@ -0,0 +1,21 @@
+import json
+import os
+import subprocess
+import sys
+
+# Modules the headless entry point must never load
+GUI_MODULES: tuple = ("tkinter", "PIL", "pystray", "pygame")
+
+SCRIPT: str = """
+import json, sys
+import autoclicker
+autoclicker.main(["run", "--backend", "recording", "--cps", "1000", "--clicks", "10"])
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def test_headlessRunLoadsNoGuiModules():
+    root: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.run([sys.executable, "-c", SCRIPT], capture_output=True, text=True, cwd=root, check=True)
+    modules: list = json.loads(process.stdout.strip().splitlines()[-1])
+    assert not [name for name in modules if name.split(".")[0] in GUI_MODULES]
@@ -0,0 +1,80 @@
+import csv
+import json
+import os
+import tempfile
+
+from telemetry import SUB_COUNT, ClickTelemetry, LatencyHistogram, RateWindow
+
+
+def test_smallValuesAreExact():
+    histogram = LatencyHistogram()
+    for value in range(SUB_COUNT):
+        histogram.record(value)
+    assert histogram.percentile(50) == SUB_COUNT // 2 - 1
+    assert histogram.percentile(100) == histogram.max == SUB_COUNT - 1
+    assert histogram.buckets() == [(value, 1) for value in range(SUB_COUNT)]
+
+
+def test_largeValuesAreWithinThreePercent():
+    histogram = LatencyHistogram()
+    for value in (1_000, 123_456, 9_876_543, 2_000_000_000):
+        histogram.reset()
+        histogram.record(value)
+        histogram.record(value + 1)
+        start, count = histogram.buckets()[0]
+        # Both land in the bucket that starts just below them, which reports no more than its largest value seen
+        assert value * 0.97 <= start <= value and count == 2
+        assert histogram.percentile(50) == value + 1
+
+
+def test_bucketRangesCoverEveryValueOnce():
+    histogram = LatencyHistogram(20)
+    previousHigh: int = -1
+    for index in range(len(histogram._counts)):
+        low, high = LatencyHistogram.bucketRange(index)
+        assert low == previousHigh + 1 and high >= low
+        previousHigh = high
+
+
+def test_percentilesAndSummary():
+    histogram = LatencyHistogram()
+    for value in range(1, 1001):
+        histogram.record(value * 1000)
+    summary: dict = histogram.summary()
+    assert summary["count"] == 1000 and summary["max"] == 1_000_000
+    assert summary["mean"] == 500_500
+    assert 500_000 <= summary["p50"] <= 500_000 * 1.03
+    assert 990_000 <= summary["p99"] <= 990_000 * 1.03
+    # Negative lateness can't happen, a clock quirk counts as on time
+    histogram.record(-5)
+    assert histogram.percentile(0.01) == 0
+
+
+def test_rateWindowCountsCompleteSlots():
+    window = RateWindow(slotNs=100, slots=10)
+    for now in range(0, 1000, 10):
+        window.record(now, 2)
+    # 20 clicks per 100 ns slot
+    assert window.rate(500, 1000) == 20 * 1e9 / 100
+    # Slots that saw nothing since count as nothing
+    assert window.rate(500, 1500) == 0.0
+    assert RateWindow().rate(1_000_000_000, 0) == 0.0
+
+
+def test_exports():
+    telemetry = ClickTelemetry()
+    for n in range(100):
+        telemetry.record((n + 1) * 1_000_000, n)
+    with tempfile.TemporaryDirectory() as directory:
+        jsonPath: str = os.path.join(directory, "stats.json")
+        csvPath: str = os.path.join(directory, "stats.csv")
+        telemetry.export(jsonPath)
+        telemetry.export(csvPath)
+        with open(jsonPath) as file:
+            data: dict = json.load(file)
+        assert data["latenessNs"]["count"] == 100 and data["intervalNs"]["count"] == 99
+        assert sum(count for _, count in data["latenessBuckets"]) == 100
+        with open(csvPath, newline="") as file:
+            rows: list = list(csv.reader(file))
+        assert rows[0] == ["metric", "bucket_start_ns", "count"]
+        assert sum(int(row[2]) for row in rows[1:] if row[0] == "interval") == 99
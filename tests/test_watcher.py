@@ -0,0 +1,34 @@
+import time
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from watcher import ColorCondition, PixelWatcher, SyntheticFramebuffer, clipRegion
+
+
+def test_regionIsClippedToTheScreen():
+    screen = SyntheticFramebuffer(100, 80, (0, 200, 0))
+    condition = ColorCondition((90, 70, 40, 40), (0, 200, 0), screenSize=screen.size())
+    assert condition.region == (90, 70, 10, 10)
+    assert condition.evaluate(screen.grab(*condition.region))
+
+
+def test_regionOffScreenIsRejected():
+    with pytest.raises(ValueError):
+        clipRegion((200, 0, 10, 10), (100, 80))
+
+
+def test_failingRegionDoesNotStopTheWatcher():
+    screen = SyntheticFramebuffer(100, 80, (0, 200, 0))
+    # Sized for 40x40 pixels but only 10x10 of them exist
+    broken = ColorCondition((90, 70, 40, 40), (0, 200, 0))
+    triggers: list = []
+    watcher = PixelWatcher(screen, [broken], lambda: triggers.append(1), pollRate=200, daemon=True)
+    watcher.start()
+    time.sleep(0.1)
+    assert watcher.is_alive()
+    watcher.stop()
+    watcher.join(1)
+    stats: dict = watcher.getStats()
+    assert stats["errors"] > 0 and not triggers
@@ -1,12 +1,20 @@
 # Copyright © 2021 rdbende <rdbende@gmail.com>
 
-source [file join [file dirname [info script]] theme light.tcl]
-source [file join [file dirname [info script]] theme dark.tcl]
+# Each theme's sprites are only loaded the first time that theme is used
+set azure_theme_dir [file join [file dirname [info script]] theme]
 
 option add *tearOff 0
 
+proc load_theme {mode} {
+	global azure_theme_dir
+	if {[lsearch -exact [ttk::style theme names] "azure-$mode"] < 0} {
+		source [file join $azure_theme_dir $mode.tcl]
+	}
+}
+
 proc set_theme {mode} {
 	if {$mode == "dark"} {
+		load_theme dark
 		ttk::style theme use "azure-dark"
 
 		array set colors {
@@ -46,6 +54,7 @@ proc set_theme {mode} {
         option add *Menu.selectcolor $colors(-fg)
     
 	} elseif {$mode == "light"} {
+		load_theme light
 		ttk::style theme use "azure-light"
 
         array set colors {
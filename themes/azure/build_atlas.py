@@ -0,0 +1,109 @@
+import glob
+import os
+import struct
+import sys
+import zlib
+
+# Packs every sprite of a theme folder into one atlas.png plus an atlas.txt index of "name x y width height",
+# so the theme loads one image instead of a file per sprite. Only 8-bit RGBA, non-interlaced PNGs are supported.
+
+PNG_SIGNATURE: bytes = b"\x89PNG\r\n\x1a\n"
+ATLAS_WIDTH: int = 512
+
+
+def readPNG(path: str) -> tuple:
+    with open(path, "rb") as file:
+        data: bytes = file.read()
+    if data[:8] != PNG_SIGNATURE:
+        raise ValueError(f"'{path}' is not a PNG")
+
+    pos: int = 8
+    idat: bytearray = bytearray()
+    width = height = 0
+    while pos < len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        body: bytes = data[pos + 8:pos + 8 + length]
+        if kind == b"IHDR":
+            width, height, depth, colorType, _, _, interlace = struct.unpack(">IIBBBBB", body)
+            if depth != 8 or colorType != 6 or interlace != 0:
+                raise ValueError(f"'{path}' is not an 8-bit RGBA PNG")
+        elif kind == b"IDAT":
+            idat += body
+        pos += 12 + length
+
+    raw: bytes = zlib.decompress(bytes(idat))
+    stride: int = width * 4
+    rows: list = []
+    previous: bytearray = bytearray(stride)
+    for y in range(height):
+        start: int = y * (stride + 1)
+        rows.append(unfilter(raw[start], bytearray(raw[start + 1:start + 1 + stride]), previous))
+        previous = rows[-1]
+    return width, height, rows
+
+
+def unfilter(kind: int, row: bytearray, previous: bytearray) -> bytearray:
+    for i in range(len(row)):
+        left: int = row[i - 4] if i >= 4 else 0
+        up: int = previous[i]
+        upLeft: int = previous[i - 4] if i >= 4 else 0
+        if kind == 1:
+            row[i] = (row[i] + left) & 0xFF
+        elif kind == 2:
+            row[i] = (row[i] + up) & 0xFF
+        elif kind == 3:
+            row[i] = (row[i] + (left + up) // 2) & 0xFF
+        elif kind == 4:
+            p: int = left + up - upLeft
+            pa, pb, pc = abs(p - left), abs(p - up), abs(p - upLeft)
+            predictor: int = left if pa <= pb and pa <= pc else (up if pb <= pc else upLeft)
+            row[i] = (row[i] + predictor) & 0xFF
+    return row
+
+
+def writePNG(path: str, width: int, height: int, rows: list) -> None:
+    def chunk(kind: bytes, body: bytes) -> bytes:
+        return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body) & 0xFFFFFFFF)
+
+    raw: bytes = b"".join(b"\x00" + bytes(row) for row in rows)
+    with open(path, "wb") as file:
+        file.write(PNG_SIGNATURE)
+        file.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)))
+        file.write(chunk(b"IDAT", zlib.compress(raw, 9)))
+        file.write(chunk(b"IEND", b""))
+
+
+def buildAtlas(folder: str) -> None:
+    sprites: list = []
+    for path in sorted(glob.glob(os.path.join(folder, "*.png"))):
+        name: str = os.path.splitext(os.path.basename(path))[0]
+        if name != "atlas":
+            sprites.append((name,) + readPNG(path))
+
+    # Shelf packing, tallest sprites first
+    sprites.sort(key=lambda sprite: (-sprite[2], sprite[0]))
+    placements: list = []
+    x = y = shelfHeight = 0
+    for name, width, height, rows in sprites:
+        if x + width > ATLAS_WIDTH:
+            x, y, shelfHeight = 0, y + shelfHeight, 0
+        placements.append((name, x, y, width, height, rows))
+        x += width
+        shelfHeight = max(shelfHeight, height)
+    atlasHeight: int = y + shelfHeight
+
+    atlas: list = [bytearray(ATLAS_WIDTH * 4) for _ in range(atlasHeight)]
+    for name, x, y, width, height, rows in placements:
+        for row in range(height):
+            atlas[y + row][x * 4:(x + width) * 4] = rows[row]
+
+    writePNG(os.path.join(folder, "atlas.png"), ATLAS_WIDTH, atlasHeight, atlas)
+    with open(os.path.join(folder, "atlas.txt"), "w") as index:
+        for name, x, y, width, height, _ in sorted(placements):
+            index.write(f"{name} {x} {y} {width} {height}\n")
+
+
+if __name__ == "__main__":
+    themeDir: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "theme")
+    for mode in sys.argv[1:] or ["dark", "light"]:
+        buildAtlas(os.path.join(themeDir, mode))
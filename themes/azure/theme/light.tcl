@@ -11,9 +11,23 @@ namespace eval ttk::theme::azure-light {
     ttk::style theme create azure-light -parent clam -settings {
         proc load_images {imgdir} {
             variable I
-            foreach file [glob -directory $imgdir *.png] {
-                set img [file tail [file rootname $file]]
-                set I($img) [image create photo -file $file -format png]
+            set atlas [file join $imgdir atlas.png]
+            set index [file join $imgdir atlas.txt]
+            if {[file exists $atlas] && [file exists $index] && (![info exists ::azure_use_atlas] || $::azure_use_atlas)} {
+                # Decode the prebuilt sprite sheet once and cut every sprite out of it
+                set sheet [image create photo -file $atlas -format png]
+                set f [open $index]
+                foreach {img x y w h} [read $f] {
+                    set I($img) [image create photo -width $w -height $h]
+                    $I($img) copy $sheet -from $x $y [expr {$x + $w}] [expr {$y + $h}] -compositingrule set
+                }
+                close $f
+                image delete $sheet
+            } else {
+                foreach file [glob -directory $imgdir *.png] {
+                    set img [file tail [file rootname $file]]
+                    set I($img) [image create photo -file $file -format png]
+                }
             }
         }
 
@@ -0,0 +1,243 @@
+from collections import deque
+import math
+from threading import Event, Lock, Thread
+import time
+from typing import List
+
+import numpy
+
+from scheduler import INTERRUPTED, DeadlineScheduler
+from telemetry import LatencyHistogram
+
+
+def parseColor(text: str) -> tuple:
+    # "#RRGGBB", "RRGGBB" or "r,g,b"
+    try:
+        if "," in text:
+            color: tuple = tuple(int(value) for value in text.split(","))
+        else:
+            value: int = int(text.lstrip("#"), 16)
+            if len(text.lstrip("#")) != 6:
+                raise ValueError
+            color = (value >> 16, (value >> 8) & 0xFF, value & 0xFF)
+    except ValueError:
+        raise ValueError(f"Color must look like #00ff00 or 0,255,0, got '{text}'")
+    if len(color) != 3 or not all(0 <= channel <= 255 for channel in color):
+        raise ValueError(f"Color must look like #00ff00 or 0,255,0, got '{text}'")
+    return color
+
+
+def parseRegion(text: str) -> tuple:
+    try:
+        left, top, width, height = (int(value) for value in text.split(","))
+    except ValueError:
+        raise ValueError(f"Region must look like left,top,width,height, got '{text}'")
+    if width <= 0 or height <= 0:
+        raise ValueError("Region must be at least one pixel wide and high")
+    return (left, top, width, height)
+
+
+def clipRegion(region: tuple, screenSize: tuple) -> tuple:
+    # The part of the region on a screen of (width, height); grabbing beyond the edge returns fewer pixels
+    left, top = max(0, region[0]), max(0, region[1])
+    right, bottom = min(screenSize[0], region[0] + region[2]), min(screenSize[1], region[1] + region[3])
+    if right <= left or bottom <= top:
+        raise ValueError(f"Region {region} is outside the {screenSize[0]}x{screenSize[1]} screen")
+    return (left, top, right - left, bottom - top)
+
+
+def _overlaps(a: tuple, b: tuple) -> bool:
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+class FrameGrabber:
+    def grab(self, left: int, top: int, width: int, height: int) -> numpy.ndarray:
+        # The region's pixels as a (height, width, 3) RGB uint8 array
+        raise NotImplementedError
+
+    def grabFrame(self) -> numpy.ndarray:
+        # The whole screen
+        raise NotImplementedError
+
+    def dirtySince(self, version: int) -> tuple:
+        # (current version, regions changed since version). None instead of a list means the grabber can't tell,
+        # so every region has to be checked.
+        return version, None
+
+    def size(self) -> tuple:
+        # (width, height) of the screen
+        raise NotImplementedError
+
+
+class ScreenGrabber(FrameGrabber):
+    def __init__(self) -> None:
+        # Pillow is only loaded once the real screen is watched
+        from PIL import ImageGrab
+        self._imageGrab = ImageGrab
+
+    def grab(self, left: int, top: int, width: int, height: int) -> numpy.ndarray:
+        image = self._imageGrab.grab(bbox=(left, top, left + width, top + height))
+        return numpy.asarray(image.convert("RGB"))
+
+    def grabFrame(self) -> numpy.ndarray:
+        return numpy.asarray(self._imageGrab.grab().convert("RGB"))
+
+    def size(self) -> tuple:
+        return self._imageGrab.grab().size
+
+
+class SyntheticFramebuffer(FrameGrabber):
+    def __init__(self, width: int, height: int, color: tuple = (0, 0, 0), history: int = 64) -> None:
+        # An in-memory screen that records which regions were drawn to, for tests and benchmarks
+        self.pixels: numpy.ndarray = numpy.empty((height, width, 3), dtype=numpy.uint8)
+        self.pixels[:] = color
+        self._lock: Lock = Lock()
+        self._version: int = 0
+        self._dirty: deque = deque(maxlen=history)
+
+    def fill(self, left: int, top: int, width: int, height: int, color: tuple) -> None:
+        with self._lock:
+            self.pixels[top:top + height, left:left + width] = color
+            self._version += 1
+            self._dirty.append((self._version, (left, top, width, height)))
+
+    def grab(self, left: int, top: int, width: int, height: int) -> numpy.ndarray:
+        return self.pixels[top:top + height, left:left + width]
+
+    def grabFrame(self) -> numpy.ndarray:
+        return self.pixels
+
+    def size(self) -> tuple:
+        return (self.pixels.shape[1], self.pixels.shape[0])
+
+    def dirtySince(self, version: int) -> tuple:
+        with self._lock:
+            # Once more changes happened than the history holds, it can't say what changed
+            if version < 0 or (self._dirty and self._dirty[0][0] > version + 1):
+                return self._version, None
+            return self._version, [region for changed, region in self._dirty if changed > version]
+
+
+class ColorCondition:
+    def __init__(self, region: tuple, color: tuple, tolerance: int = 0, fraction: float = 1.0, sampleStep: int = 1, screenSize: tuple = None) -> None:
+        # Holds when at least fraction of the region's pixels are within tolerance of color on every channel.
+        # A sampleStep above 1 only looks at every sampleStep-th pixel in each direction. With a (width, height)
+        # screenSize, a region partly off screen is clipped to the part that can be grabbed.
+        if not 0 < fraction <= 1:
+            raise ValueError("Fraction must be above 0 and at most 1")
+        if sampleStep < 1:
+            raise ValueError("Sample step must be at least 1")
+        if not 0 <= tolerance <= 255:
+            raise ValueError("Tolerance must be between 0 and 255")
+        if screenSize is not None:
+            region = clipRegion(region, screenSize)
+        self.region: tuple = region
+        self._color: numpy.ndarray = numpy.array(color, dtype=numpy.uint8)
+        self._tolerance: int = tolerance
+        self._sampleStep: int = sampleStep
+        self.result: bool = False
+
+        # Work buffers sized for the sampled pixels, so evaluating a frame allocates nothing
+        rows: int = -(-region[3] // sampleStep)
+        columns: int = -(-region[2] // sampleStep)
+        self._high: numpy.ndarray = numpy.empty((rows, columns, 3), dtype=numpy.uint8)
+        self._low: numpy.ndarray = numpy.empty((rows, columns, 3), dtype=numpy.uint8)
+        self._distance: numpy.ndarray = numpy.empty((rows, columns), dtype=numpy.uint8)
+        self._matches: numpy.ndarray = numpy.empty((rows, columns), dtype=numpy.bool_)
+        self._needed: int = math.ceil(fraction * rows * columns)
+
+    def evaluate(self, pixels: numpy.ndarray) -> bool:
+        # |pixel - color| as max - min stays in uint8, and the largest channel difference is two elementwise
+        # maximums instead of a reduction over the last axis, which is several times slower
+        step: int = self._sampleStep
+        sampled: numpy.ndarray = pixels[::step, ::step]
+        high, low, distance = self._high, self._low, self._distance
+        numpy.maximum(sampled, self._color, out=high)
+        numpy.minimum(sampled, self._color, out=low)
+        numpy.subtract(high, low, out=high)
+        numpy.maximum(high[..., 0], high[..., 1], out=distance)
+        numpy.maximum(distance, high[..., 2], out=distance)
+        numpy.less_equal(distance, self._tolerance, out=self._matches)
+        self.result = int(numpy.count_nonzero(self._matches)) >= self._needed
+        return self.result
+
+
+class PixelWatcher(Thread):
+    def __init__(self, grabber: FrameGrabber, conditions: List[ColorCondition], triggerFunc, releaseFunc=None, pollRate: float = 60.0, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # triggerFunc runs on this thread when all conditions start to hold, releaseFunc when they stop holding
+        self._grabber: FrameGrabber = grabber
+        self._conditions: List[ColorCondition] = conditions
+        self._triggerFunc = triggerFunc
+        self._releaseFunc = releaseFunc
+        self._holding: bool = False
+
+        # Polls don't need sub-millisecond precision, so the scheduler only sleeps
+        self._stopped: Event = Event()
+        self._scheduler: DeadlineScheduler = DeadlineScheduler(pollRate, spinNs=0, interrupt=self._stopped)
+
+        self.pollCost: LatencyHistogram = LatencyHistogram()
+        self.triggerLatency: LatencyHistogram = LatencyHistogram()
+        self._triggers: int = 0
+        self._errors: int = 0
+        self._checked: int = 0
+        self._skipped: int = 0
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def isHolding(self) -> bool:
+        return self._holding
+
+    def getStats(self) -> dict:
+        return {
+            "polls": self._scheduler.getStats()["ticks"],
+            "targetPollRate": self._scheduler.rate,
+            "pollRate": self._scheduler.achievedRate(),
+            "pollCostNs": self.pollCost.summary(),
+            "regionsChecked": self._checked,
+            "regionsSkipped": self._skipped,
+            "triggers": self._triggers,
+            "errors": self._errors,
+            # From the start of the poll that saw the change until triggerFunc returned
+            "triggerLatencyNs": self.triggerLatency.summary(),
+        }
+
+    def run(self) -> None:
+        wait = self._scheduler.wait
+        grabber: FrameGrabber = self._grabber
+        conditions: List[ColorCondition] = self._conditions
+        version: int = -1
+        self._scheduler.start()
+        while wait() != INTERRUPTED:
+            start: int = time.perf_counter_ns()
+            # Regions nothing was drawn over since the last poll keep their last result without being grabbed
+            version, dirty = grabber.dirtySince(version)
+            for condition in conditions:
+                if dirty is None or any(_overlaps(condition.region, region) for region in dirty):
+                    try:
+                        condition.evaluate(grabber.grab(*condition.region))
+                    except Exception as e:
+                        # A failed grab or a region the screen no longer covers doesn't hold, but keeps the watcher
+                        # running; only the first failure is reported
+                        if not self._errors:
+                            print(f"Couldn't check region {condition.region}: {e}")
+                        self._errors += 1
+                        condition.result = False
+                    self._checked += 1
+                else:
+                    self._skipped += 1
+
+            holding: bool = all(condition.result for condition in conditions)
+            if holding != self._holding:
+                self._holding = holding
+                if holding:
+                    self._triggerFunc()
+                    self._triggers += 1
+                    self.triggerLatency.record(time.perf_counter_ns() - start)
+                elif self._releaseFunc is not None:
+                    self._releaseFunc()
+            self.pollCost.record(time.perf_counter_ns() - start)
+
+        if self._holding and self._releaseFunc is not None:
+            self._releaseFunc()